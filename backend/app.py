@@ -1,7 +1,11 @@
 from flask import Flask
 from flask_cors import CORS
 from models import db
-from config import Config
+from config import Config, database_settings
+from utils.db import configure_engines
+from utils.events import init_events
+from utils.log import init_logging
+from utils.metrics import init_metrics
 from routes.auth import auth_bp
 from routes.wallet import wallet_bp
 from routes.transactions import transactions_bp
@@ -11,13 +15,19 @@ from routes.admin import admin_bp
 from routes.meal_skip import meal_skip_bp
 import os
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if test_config:
+        if 'SQLALCHEMY_DATABASE_URI' in test_config:
+            # Engine options and the read bind follow the database actually used
+            app.config.update(database_settings(test_config['SQLALCHEMY_DATABASE_URI']))
+        app.config.update(test_config)
     
-    CORS(app)
+    CORS(app, expose_headers=['X-Next-Cursor'])
     
     db.init_app(app)
+    init_events(app)
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(wallet_bp, url_prefix='/wallet')
@@ -27,7 +37,11 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(meal_skip_bp, url_prefix='/meal')
     
+    init_logging(app)
+
     with app.app_context():
+        configure_engines(app, db)
+        init_metrics(app, db)
         db.create_all()
         
     return app
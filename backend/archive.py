@@ -0,0 +1,50 @@
+"""
+Archive a closed term: move its settled transactions into transactions_archive.
+
+Every user keeps one opening-balance row at the cutoff carrying the archived
+sum forward, so wallet checks and projections only read the hot table, while
+/transactions still pages through the full history.
+
+Usage:
+    python archive.py <term> <cutoff>        # e.g. python archive.py 2025-odd 2026-01-01
+    python archive.py --list
+"""
+import sys
+from datetime import datetime
+from app import create_app
+from models import ArchiveTerm
+from utils.archive import archive_term
+
+
+def main(argv):
+    app = create_app()
+    if argv == ['--list']:
+        with app.app_context():
+            for record in ArchiveTerm.query.order_by(ArchiveTerm.cutoff):
+                print(f"{record.term}: before {record.cutoff.isoformat()}, "
+                      f"{record.transactions} transaction(s), archived {record.archived_at.isoformat()}")
+        return 0
+
+    if len(argv) != 2:
+        print(__doc__)
+        return 1
+
+    term, cutoff = argv
+    try:
+        cutoff = datetime.fromisoformat(cutoff)
+    except ValueError:
+        print(f"Invalid cutoff {cutoff}; use YYYY-MM-DD or an ISO timestamp")
+        return 1
+
+    with app.app_context():
+        try:
+            report = archive_term(term, cutoff)
+        except ValueError as e:
+            print(e)
+            return 1
+    print(f"{term}: archived {report['archived']} transaction(s), carried forward {report['users']} balance(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
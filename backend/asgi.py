@@ -0,0 +1,152 @@
+"""
+ASGI entry point: the same Flask app behind an async server.
+
+    uvicorn asgi:app --workers 4
+    WORKER_PROFILE=uvicorn gunicorn -c gunicorn.conf.py
+
+The event loop owns the sockets, so idle keep-alive connections from open
+dashboards cost nothing. Each request still runs the sync Flask view, on
+this worker's thread pool (ASGI_THREADS threads, default min(32, CPUs + 4)).
+The views keep their sync database access: the drivers (sqlite3, psycopg2)
+block, and an async SQLite driver only moves the same calls onto a thread.
+"""
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from app import app as flask_app
+
+class PooledWsgiApp:
+    """
+    Serve a WSGI app over ASGI HTTP, running each request on a thread pool.
+
+    Response chunks are handed back to the event loop as they are produced,
+    so streamed exports and /wallet/stream work unchanged.
+
+    Args:
+        wsgi_app: The WSGI callable
+        threads: Pool size; None for the ThreadPoolExecutor default
+    """
+
+    def __init__(self, wsgi_app, threads=None):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope {scope['type']!r}")
+
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            # Servers drop sends after a disconnect; a stream stops at its next chunk
+            disconnected = threading.Event()
+
+            async def watch():
+                while (await receive())['type'] != 'http.disconnect':
+                    pass
+                disconnected.set()
+
+            watcher = asyncio.ensure_future(watch())
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self.executor, self._run, scope, body, loop, send, disconnected)
+            finally:
+                watcher.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run(self, scope, body, loop, send, disconnected):
+        # On a pool thread; every message goes out through the event loop
+        def sync_send(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start['message'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+            }
+
+        def send_start():
+            if not start.get('sent'):
+                start['sent'] = True
+                sync_send(start['message'])
+
+        response = self.wsgi_app(_environ(scope, body), start_response)
+        try:
+            for chunk in response:
+                if disconnected.is_set():
+                    return
+                if chunk:
+                    send_start()
+                    sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_start()
+            sync_send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+def _environ(scope, body):
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The body is fully buffered, so chunked uploads read without a length
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin1'), value.decode('latin1')
+        if name in ('content-type', 'content-length'):
+            key = name.upper().replace('-', '_')
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        # Repeated headers are joined, as WSGI servers do
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def create_asgi_app(wsgi_app):
+    """Wrap a Flask app on a pool of its ASGI_THREADS threads."""
+    return PooledWsgiApp(wsgi_app, threads=wsgi_app.config['ASGI_THREADS'] or None)
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,54 @@
+"""
+QR generation throughput per worker: PNG vs SVG vs payload-only.
+
+Measures the uncached render cost of each format and the cached
+/qr/generate path a student hits when refreshing inside the 5-minute window.
+
+Usage:
+    python benchmarks/bench_qr.py [--seconds 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import qr
+
+
+def measure(fn, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn(calls)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=3.0, help='time budget per case')
+    args = parser.parse_args()
+
+    def payload(i):
+        # Distinct user ids so nothing is served from the cache
+        return qr.encode_qr_token(i, time.time() + qr.QR_VALIDITY_SECONDS, 'bench-key')
+
+    cases = {
+        'png (render)': lambda i: qr._render(payload(i), 'png'),
+        'svg (render)': lambda i: qr._render(payload(i), 'svg'),
+        'payload only': payload,
+    }
+
+    cached = payload(0), time.time() + qr.QR_VALIDITY_SECONDS
+    cases['png (cached refresh)'] = lambda i: qr.render_qr(*cached, 'png')
+
+    print(f"{'case':<24}{'ops/sec':>12}")
+    for name, fn in cases.items():
+        print(f"{name:<24}{measure(fn, args.seconds):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
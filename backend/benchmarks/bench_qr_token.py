@@ -0,0 +1,65 @@
+"""
+Signed QR token micro-benchmark.
+
+Reports payload size and resulting QR version for the legacy JSON payload
+and the signed token, plus pure-CPU verify throughput at the POS.
+
+Usage:
+    python benchmarks/bench_qr_token.py [--seconds 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import qrcode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.qr import encode_qr_token, verify_qr_token
+
+KEY = 'bench-secret-key'
+
+
+def qr_version(data):
+    code = qrcode.QRCode()
+    code.add_data(data)
+    code.make(fit=True)
+    return code.version
+
+
+def throughput(fn, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=3.0, help='time budget per case')
+    args = parser.parse_args()
+
+    expires = time.time() + 300
+    legacy = json.dumps({'user_id': 123456, 'expires': expires})
+    token = encode_qr_token(123456, expires, KEY)
+    forged = encode_qr_token(123456, expires, 'wrong-key')
+
+    print(f"{'payload':<10}{'chars':>8}{'QR version':>12}")
+    print(f"{'legacy':<10}{len(legacy):>8}{qr_version(legacy):>12}")
+    print(f"{'signed':<10}{len(token):>8}{qr_version(token):>12}")
+    print()
+
+    print(f"{'case':<16}{'ops/sec':>12}")
+    print(f"{'encode':<16}{throughput(lambda: encode_qr_token(123456, expires, KEY), args.seconds):>12.0f}")
+    print(f"{'verify (valid)':<16}{throughput(lambda: verify_qr_token(token, KEY), args.seconds):>12.0f}")
+    print(f"{'verify (forged)':<16}{throughput(lambda: verify_qr_token(forged, KEY), args.seconds):>12.0f}")
+    print(f"{'verify (junk)':<16}{throughput(lambda: verify_qr_token('NOT-A-TOKEN', KEY), args.seconds):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Payment hot-path benchmark suite with JSON results for comparing commits.
+
+Seeds a synthetic campus into a scratch SQLite file (seed.generate_campus),
+then drives /meal/deduct, /wallet/topup, /wallet/balance, /transactions and
+/admin/reports, first in-process through the Flask test client and then
+over HTTP against a local gunicorn. Each scenario reports throughput and
+p50/p95/p99 latency.
+
+Usage:
+    python benchmarks/bench_suite.py [--students 20000] [--days 30] [--output results.json]
+    python benchmarks/bench_suite.py --db /tmp/campus.db          # reuse a seeded file
+    python benchmarks/bench_suite.py --compare old.json new.json  # diff two runs
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from load_test import start_server, percentile
+
+SCENARIOS = ('deduct', 'topup', 'balance', 'transactions', 'reports')
+
+
+class Campus:
+    """Accounts and request builders shared by both drivers."""
+
+    def __init__(self, app, rng_seed):
+        from models import db, User
+        from utils.utils import create_token
+
+        self.rng = random.Random(rng_seed)
+        with app.app_context():
+            student_ids = [i for (i,) in db.session.query(User.id).filter(User.role == 'student')]
+            vendor = User.query.filter_by(role='vendor').first()
+            admin = User.query.filter_by(role='admin').first()
+            if vendor is None:
+                vendor = User(email='bench-vendor@campus.test', password_hash='x', role='vendor')
+                admin = admin or User(email='bench-admin@campus.test', password_hash='x', role='admin')
+                db.session.add_all([vendor, admin])
+                db.session.commit()
+            self.student_ids = student_ids
+            self.tokens = {}
+            self.vendor_token = create_token(vendor.id, 'vendor')
+            self.admin_token = create_token(admin.id, 'admin')
+            self.qr_key = app.config['QR_SECRET_KEY']
+            # Polling students: a fixed sample, with their tokens minted up front
+            for user_id in self.rng.sample(student_ids, min(len(student_ids), 2000)):
+                self.tokens[user_id] = create_token(user_id, 'student')
+        self.token_ids = list(self.tokens)
+
+    def request(self, scenario):
+        """(method, path, json body or None, bearer token) for one request."""
+        from utils.qr import encode_qr_token
+
+        user_id = self.rng.choice(self.token_ids)
+        if scenario == 'deduct':
+            payload = encode_qr_token(user_id, time.time() + 300, self.qr_key)
+            return 'POST', '/meal/deduct', {'qr_payload': payload, 'meal_cost': 30, 'venue': 'Mess 1'}, self.vendor_token
+        if scenario == 'topup':
+            return 'POST', '/wallet/topup', {'amount': 100}, self.tokens[user_id]
+        if scenario == 'balance':
+            return 'GET', '/wallet/balance', None, self.tokens[user_id]
+        if scenario == 'transactions':
+            return 'GET', '/transactions?limit=50', None, self.tokens[user_id]
+        return 'GET', '/admin/reports', None, self.admin_token
+
+
+def summarize(latencies, elapsed, errors):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_test_client(app, campus, scenario, requests):
+    client = app.test_client()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        method, path, body, token = campus.request(scenario)
+        began = time.perf_counter()
+        res = client.open(path, method=method, json=body, headers={'Authorization': f'Bearer {token}'})
+        latencies.append(time.perf_counter() - began)
+        if res.status_code != 200:
+            errors += 1
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def run_http(port, campus, scenario, seconds, concurrency):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            # Built per request: every deduction needs a fresh QR code
+            method, path, body, token = campus.request(scenario)
+            headers = {'Authorization': f'Bearer {token}'}
+            data = None
+            if body is not None:
+                data = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            began = time.perf_counter()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                res = conn.getresponse()
+                res.read()
+                failed += res.status != 200
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                continue
+            local.append(time.perf_counter() - began)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - start, errors[0])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'driver':<12}{'scenario':<14}{'rps':>16}{'p99 ms':>18}")
+    for driver, scenarios in new['results'].items():
+        for scenario, result in scenarios.items():
+            before = old['results'].get(driver, {}).get(scenario)
+            if not before:
+                continue
+            rps = f"{before['throughput_rps']:.0f}->{result['throughput_rps']:.0f}"
+            p99 = f"{before['p99_ms']:.1f}->{result['p99_ms']:.1f}"
+            print(f"{driver:<12}{scenario:<14}{rps:>16}{p99:>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=20000, help='students to seed')
+    parser.add_argument('--days', type=int, default=30, help='days of history per student')
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed for data and requests')
+    parser.add_argument('--db', help='SQLite file to use; seeded only if it does not exist yet')
+    parser.add_argument('--requests', type=int, default=500, help='test-client requests per scenario')
+    parser.add_argument('--seconds', type=float, default=10.0, help='gunicorn load duration per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='gunicorn client connections')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--profile', default='sync', help='gunicorn WORKER_PROFILE')
+    parser.add_argument('--drivers', default='testclient,gunicorn', help='comma-separated drivers to run')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenarios')
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='campuseats-bench-'), 'campus.db')
+    fresh = not os.path.exists(db_path)
+    db_url = f'sqlite:///{db_path}'
+    # Config reads these at import, so set them before importing the app
+    os.environ.update(DATABASE_URL=db_url, BCRYPT_POOL_SIZE='0', LOG_SAMPLE_RATE='0')
+    from seed import app, generate_campus
+    from models import db, Transaction
+
+    dataset = {'db': db_path, 'students': args.students, 'days': args.days, 'seed': args.seed}
+    with app.app_context():
+        db.create_all()
+        if fresh:
+            began = time.perf_counter()
+            generate_campus(args.students, args.days, rng_seed=args.seed)
+            dataset['seed_seconds'] = round(time.perf_counter() - began, 1)
+            print(f"seeded {db_path} in {dataset['seed_seconds']}s", file=sys.stderr)
+        dataset['transactions'] = db.session.query(db.func.count(Transaction.id)).scalar()
+
+    campus = Campus(app, args.seed)
+    scenarios = args.scenarios.split(',')
+    drivers = args.drivers.split(',')
+    results = {}
+
+    if 'testclient' in drivers:
+        results['testclient'] = {}
+        for scenario in scenarios:
+            results['testclient'][scenario] = run_test_client(app, campus, scenario, args.requests)
+            print(f"testclient {scenario}: {results['testclient'][scenario]}", file=sys.stderr)
+
+    if 'gunicorn' in drivers:
+        results['gunicorn'] = {}
+        env = dict(os.environ)
+        proc = start_server(args.profile, args.port, args.workers, env)
+        try:
+            for scenario in scenarios:
+                results['gunicorn'][scenario] = run_http(args.port, campus, scenario, args.seconds, args.concurrency)
+                print(f"gunicorn {scenario}: {results['gunicorn'][scenario]}", file=sys.stderr)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'config': {'requests': args.requests, 'seconds': args.seconds, 'concurrency': args.concurrency,
+                   'workers': args.workers, 'profile': args.profile},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
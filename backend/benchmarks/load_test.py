@@ -0,0 +1,146 @@
+"""
+Dashboard polling load test: requests/sec and latency per gunicorn worker profile.
+
+Seeds a throwaway database with students, starts gunicorn once per
+WORKER_PROFILE (sync, gevent, uvicorn) and hammers /wallet/balance and
+/wallet/projection from keep-alive client threads, the way open student
+dashboards do. Profiles whose worker package isn't installed are skipped.
+
+Usage:
+    python benchmarks/load_test.py [--seconds 10] [--concurrency 64] [--workers 2]
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+PROFILES = {'sync': None, 'gevent': 'gevent', 'uvicorn': 'uvicorn'}
+PATHS = ('/wallet/balance', '/wallet/projection')
+
+
+def seed(db_url, students):
+    # Config reads DATABASE_URL at import, so set it before importing the app
+    os.environ['DATABASE_URL'] = db_url
+    from app import create_app
+    from models import db, User, Transaction
+    from utils.utils import create_token
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        users = [User(email=f'load{i}@test.com', password_hash='x', role='student', balance=500)
+                 for i in range(students)]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all([Transaction(user_id=u.id, amount=500, transaction_type='top-up', source='self')
+                            for u in users])
+        db.session.commit()
+        return [create_token(u.id, 'student') for u in users]
+
+
+def start_server(profile, port, workers, env):
+    env = dict(env, WORKER_PROFILE=profile, WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{port}')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                            cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/wallet/balance')
+            conn.getresponse().read()
+            conn.close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'{profile} server did not start')
+
+
+def run_load(port, tokens, seconds, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            headers = {'Authorization': f'Bearer {rng.choice(tokens)}'}
+            start = time.perf_counter()
+            try:
+                conn.request('GET', rng.choice(PATHS), headers=headers)
+                res = conn.getresponse()
+                res.read()
+                if res.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return latencies, errors[0], elapsed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0, help='load duration per profile')
+    parser.add_argument('--concurrency', type=int, default=64, help='concurrent client connections')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers per profile')
+    parser.add_argument('--students', type=int, default=500, help='seeded students to poll as')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='comma-separated worker profiles')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='campuseats-load-')
+    db_url = f"sqlite:///{os.path.join(tmpdir, 'load.db')}"
+    tokens = seed(db_url, args.students)
+    env = dict(os.environ, DATABASE_URL=db_url, BCRYPT_POOL_SIZE='0')
+
+    print(f"{'profile':<10}{'requests':>10}{'req/sec':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for profile in args.profiles.split(','):
+        module = PROFILES[profile]
+        if module and importlib.util.find_spec(module) is None:
+            print(f"{profile:<10}  skipped ({module} not installed)")
+            continue
+
+        proc = start_server(profile, args.port, args.workers, env)
+        try:
+            latencies, errors, elapsed = run_load(args.port, tokens, args.seconds, args.concurrency)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        print(f"{profile:<10}{len(latencies):>10}{len(latencies) / elapsed:>10.0f}"
+              f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Bulk provisioning from CSV or NDJSON files (semester onboarding).
+
+    users:   email,password[,role]
+    topups:  email (or user_id),amount[,source,reference]
+
+Files are streamed and committed in chunks, so size is not a concern;
+rows that fail are listed at the end and don't stop the import.
+
+Usage:
+    python bulk_import.py users <file>
+    python bulk_import.py topups <file>
+"""
+import json
+import sys
+from app import create_app
+from utils.bulk_import import read_rows, detect_format, import_users, import_topups
+
+IMPORTERS = {
+    'users': import_users,
+    'topups': import_topups,
+}
+
+
+def main(argv):
+    if len(argv) != 2 or argv[0] not in IMPORTERS:
+        print(__doc__)
+        return 1
+
+    kind, path = argv
+    app = create_app()
+    with app.app_context(), open(path, 'rb') as stream:
+        report = IMPORTERS[kind](read_rows(stream, detect_format(path)))
+
+    errors = report.pop('errors')
+    print(json.dumps(report))
+    for error in errors:
+        who = f" ({error['email']})" if error.get('email') else ''
+        print(f"line {error['line']}{who}: {error['message']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
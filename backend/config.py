@@ -7,9 +7,128 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+def _sqlite_file(uri):
+    # Path of a file-backed SQLite URI, None for in-memory or other databases
+    if not uri.startswith('sqlite:///') or uri in ('sqlite:///', 'sqlite:///:memory:'):
+        return None
+    return uri[len('sqlite:///'):].split('?')[0]
+
+def _engine_options(uri):
+    # In-memory SQLite runs on a single StaticPool connection; nothing to tune
+    if uri.startswith('sqlite') and _sqlite_file(uri) is None:
+        return {}
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+    }
+    if not uri.startswith('sqlite'):
+        # Server databases drop idle connections behind our back
+        options.update(pool_pre_ping=True, pool_recycle=1800)
+    return options
+
+def _read_uri(uri):
+    # Default read engine: the same SQLite file opened read-only. Under WAL its
+    # readers never block the primary's writers.
+    path = _sqlite_file(uri)
+    return f"sqlite:///file:{path}?mode=ro&uri=true" if path else None
+
+def database_settings(uri, read_uri=None):
+    """Engine options and read bind that go with a database URI."""
+    replica = bool(read_uri)
+    read_uri = read_uri or _read_uri(uri)
+    return {
+        'SQLALCHEMY_ENGINE_OPTIONS': _engine_options(uri),
+        'READ_DATABASE_URL': read_uri,
+        'READ_REPLICA': replica,
+        'SQLALCHEMY_BINDS': {'read': read_uri} if read_uri else {},
+    }
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-dev-secret-key')
+    # Signs the payment QR tokens checked at the POS
+    QR_SECRET_KEY = os.getenv('QR_SECRET_KEY', 'qr-dev-secret-key')
+    # Accept the old unsigned {"user_id", "expires"} JSON payloads (forgeable)
+    QR_ACCEPT_LEGACY_PAYLOAD = os.getenv('QR_ACCEPT_LEGACY_PAYLOAD', 'false').lower() == 'true'
+    # How old an offline POS scan may be when it is settled (seconds)
+    OFFLINE_SETTLEMENT_WINDOW = int(os.getenv('OFFLINE_SETTLEMENT_WINDOW', 24 * 60 * 60))
     # Use absolute path to ensure DB is always in the root backend folder
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f"sqlite:///{os.path.join(basedir, 'campuseats.db')}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # Reports and listings (@read_only views) read through this engine; point
+    # it at a streaming replica of DATABASE_URL to take them off the primary
+    READ_DATABASE_URL = os.getenv('READ_DATABASE_URL') or _read_uri(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = {'read': READ_DATABASE_URL} if READ_DATABASE_URL else {}
+    # A separate READ_DATABASE_URL may lag behind the primary; the default
+    # read-only handle on the same SQLite file never does
+    READ_REPLICA = bool(os.getenv('READ_DATABASE_URL'))
+    # After writing, a user reads from the primary for this long (replica lag
+    # budget); only tracked when READ_REPLICA is set
+    READ_YOUR_WRITES_WINDOW = int(os.getenv('READ_YOUR_WRITES_WINDOW', 5))
+    # Applied to every SQLite connection: WAL lets readers run alongside the
+    # writer, NORMAL sync is durable under WAL, and busy_timeout makes writers
+    # queue instead of failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 64 * 1024)), # negative means KiB
+        'temp_store': 'MEMORY',
+    }
+    # Password hashing: bcrypt cost and the per-worker process pool. Only
+    # gevent and uvicorn workers (and offline jobs) use the pool; sync workers
+    # serve one request at a time and hash inline. That is at most
+    # BCRYPT_POOL_SIZE x WEB_CONCURRENCY bcrypt processes; once a worker has
+    # BCRYPT_QUEUE_SIZE hashes queued, further logins get 429
+    # (pool size 0 hashes inline; queue size 0 means 4 jobs per pool process)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', 2))
+    BCRYPT_QUEUE_SIZE = int(os.getenv('BCRYPT_QUEUE_SIZE', 0))
+    # Wallet push events (/wallet/stream): 'memory' reaches this worker's
+    # streams only; 'database' relays through the wallet_events table so
+    # every worker sees every event
+    EVENT_BROKER = os.getenv('EVENT_BROKER', 'memory')
+    EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 0.5))
+    EVENT_RETENTION = int(os.getenv('EVENT_RETENTION', 300))
+    EVENT_STREAM_KEEPALIVE = int(os.getenv('EVENT_STREAM_KEEPALIVE', 15))
+    # Serve /wallet/stream; off by default and dashboards poll instead. An open
+    # stream holds a sync worker (or a uvicorn executor thread) for its whole
+    # life, so it needs WORKER_PROFILE=gevent, and EVENT_BROKER=database (or a
+    # real broker) once there is more than one worker
+    WALLET_STREAM_ENABLED = os.getenv('WALLET_STREAM_ENABLED', 'false').lower() == 'true'
+    # Lifetime of the stream-only token EventSource passes as ?token= (seconds)
+    STREAM_TOKEN_TTL = int(os.getenv('STREAM_TOKEN_TTL', 60))
+    # Exported by gunicorn.conf.py; the dev server is a single process
+    WORKER_PROFILE = os.getenv('WORKER_PROFILE', 'sync')
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+    # Threads per uvicorn worker running the Flask views (asgi.py);
+    # 0 means min(32, CPUs + 4)
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', 0))
+    # Users one POST /admin/reconcile call checks (and the largest ?limit=);
+    # `python migrate.py wallet_checkpoints` sweeps everyone in pages this size
+    RECONCILE_PAGE_SIZE = int(os.getenv('RECONCILE_PAGE_SIZE', 1000))
+    # Rows one /admin/bulk/topups upload may carry; bulk_import.py has no limit
+    BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', 5000))
+    # /admin/bulk/users hashes every password inside the request: at cost 12,
+    # inline on a sync worker, 50 rows take ~12 s of the 30 s worker timeout.
+    # Larger cohorts go through bulk_import.py
+    BULK_IMPORT_USERS_MAX_ROWS = int(os.getenv('BULK_IMPORT_USERS_MAX_ROWS', 50))
+    # /admin/export/transactions on a sync worker: larger ranges are refused
+    # (export.py has no limit). ~35k rows/s, so well inside the 30 s timeout
+    EXPORT_SYNC_MAX_ROWS = int(os.getenv('EXPORT_SYNC_MAX_ROWS', 200000))
+    # Structured logs: level and the share of routine events (payments) kept
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.1))
+    # Bearer token required by /metrics; unset leaves it open to the scraper
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Weight of the newest meal in the per-slot spend averages (0-1)
+    SPEND_EWMA_ALPHA = float(os.getenv('SPEND_EWMA_ALPHA', 0.3))
+    # Meal slots, skip dates and the forecast follow this zone's wall clock;
+    # timestamps are stored in UTC
+    CAMPUS_TIMEZONE = os.getenv('CAMPUS_TIMEZONE', 'Asia/Kolkata')
+    # Kitchen demand forecast (/meal/forecast)
+    FORECAST_CACHE_TTL = int(os.getenv('FORECAST_CACHE_TTL', 300))
+    FORECAST_LOOKBACK_DAYS = int(os.getenv('FORECAST_LOOKBACK_DAYS', 28))
@@ -0,0 +1,54 @@
+"""
+Write the finance export to a file, outside the web workers.
+
+Same rows and settlement as GET /admin/export/transactions, without a worker
+timeout: use it for windows over EXPORT_SYNC_MAX_ROWS on sync workers, or any long one.
+The format follows the file name: .csv, or .ndjson.gz for gzipped NDJSON.
+
+Usage:
+    python export.py ledger-2026-odd.csv --from 2026-01-01 --to 2026-04-30
+    python export.py mess1.ndjson.gz --venue "Mess 1"
+"""
+import argparse
+import sys
+import time
+from app import create_app
+from utils.export import EXPORT_FORMATS, Settlement, ledger_rows, parse_range
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='output file (.csv or .ndjson.gz)')
+    parser.add_argument('--from', dest='start', help='first day (YYYY-MM-DD) or ISO timestamp')
+    parser.add_argument('--to', dest='end', help='last day, inclusive, or ISO timestamp')
+    parser.add_argument('--venue', help='only rows from this venue')
+    args = parser.parse_args(argv)
+
+    fmt = next((name for name, (_, _, extension) in EXPORT_FORMATS.items()
+                if args.path.endswith('.' + extension)), None)
+    if fmt is None:
+        print(f"Unknown format for {args.path}; use a .csv or .ndjson.gz file name")
+        return 1
+    try:
+        start, end = parse_range(args.start, args.end)
+    except ValueError:
+        print("Invalid range; use YYYY-MM-DD or ISO timestamps, with --from before --to")
+        return 1
+
+    export = EXPORT_FORMATS[fmt][0]
+    settlement = Settlement()
+    began = time.perf_counter()
+    app = create_app()
+    out = open(args.path, 'w', newline='') if fmt == 'csv' else open(args.path, 'wb')
+    with app.app_context(), out:
+        for chunk in export(ledger_rows(start, end, args.venue), settlement):
+            out.write(chunk)
+
+    meals = sum(meals for meals, _ in settlement.venues.values())
+    print(f"Wrote {args.path}: {meals} meal(s) across {len(settlement.venues)} venue(s) "
+          f"in {time.perf_counter() - began:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
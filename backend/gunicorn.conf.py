@@ -0,0 +1,34 @@
+"""
+Gunicorn settings. WORKER_PROFILE picks how each worker serves requests:
+
+    sync     one request per worker process at a time (the old default)
+    gevent   cooperative greenlets; thousands of idle dashboard polls per worker
+    uvicorn  the ASGI entry point (asgi:app) on uvicorn workers
+
+Usage:
+    WORKER_PROFILE=gevent gunicorn -c gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+profile = os.getenv('WORKER_PROFILE', 'sync')
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+timeout = 30
+wsgi_app = 'app:app'
+
+if profile == 'gevent':
+    worker_class = 'gevent'
+    # Open connections per worker; most are dashboards waiting on a poll
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+elif profile == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:app'
+elif profile != 'sync':
+    raise ValueError(f"Unknown WORKER_PROFILE {profile!r}; expected sync, gevent or uvicorn")
+
+# The app checks these before it agrees to serve /wallet/stream
+os.environ['WORKER_PROFILE'] = profile
+os.environ['WEB_CONCURRENCY'] = str(workers)
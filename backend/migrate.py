@@ -0,0 +1,191 @@
+"""
+One-off data migrations for existing databases.
+
+New tables are created by ``db.create_all()`` on app start; the steps here
+backfill them from data that predates the table.
+
+Usage:
+    python migrate.py <step> [<step> ...]
+    python migrate.py all
+"""
+import re
+import sys
+from flask import current_app
+from sqlalchemy.schema import CreateTable
+from app import create_app
+from models import db, Transaction, ArchivedTransaction, QrRedemption, WalletCheckpoint, DailyStat, SpendStat
+from utils.utils import reconcile_wallets
+from utils.stats import rebuild_daily_stats, rebuild_spend_stats
+
+QR_TAG = re.compile(r'\[QR:([0-9a-f]{16})\]')
+
+# Float rupee columns that became integer paise
+MONEY_COLUMNS = {
+    'users': ('balance',),
+    'transactions': ('amount',),
+}
+
+
+def convert_money_to_paise():
+    """Convert float rupee balances and amounts to integer paise."""
+    columns = {c['name']: c['type'] for c in db.inspect(db.engine).get_columns('transactions')}
+    if isinstance(columns['amount'], db.Integer):
+        print("integer_money: already stored as paise")
+        return
+
+    with db.engine.begin() as conn:
+        for table_name, money_columns in MONEY_COLUMNS.items():
+            table = db.metadata.tables[table_name]
+            if conn.dialect.name == 'postgresql':
+                for col in money_columns:
+                    conn.exec_driver_sql(
+                        f'ALTER TABLE {table_name} ALTER COLUMN {col} TYPE BIGINT USING ROUND({col} * 100)'
+                    )
+            else:
+                _rebuild_sqlite_table(conn, table, money_columns)
+
+        # Derived tables hold float sums as well; they are rebuilt below
+        for model in (WalletCheckpoint, DailyStat):
+            model.__table__.drop(conn, checkfirst=True)
+            model.__table__.create(conn)
+
+    db.session.remove()
+    print("integer_money: converted users.balance and transactions.amount to paise")
+    rebuild_wallet_checkpoints()
+    backfill_daily_stats()
+
+
+def _rebuild_sqlite_table(conn, table, money_columns):
+    # SQLite cannot change a column type in place: copy into a fresh table and swap
+    new_name = f'{table.name}__new'
+    ddl = str(CreateTable(table).compile(conn)).replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {new_name} ', 1)
+    conn.exec_driver_sql(ddl)
+
+    existing = {c['name'] for c in db.inspect(conn).get_columns(table.name)}
+    names = [c.name for c in table.columns if c.name in existing]
+    select = ', '.join(
+        f'CAST(ROUND({n} * 100) AS INTEGER)' if n in money_columns else n for n in names
+    )
+    conn.exec_driver_sql(f'INSERT INTO {new_name} ({", ".join(names)}) SELECT {select} FROM {table.name}')
+    conn.exec_driver_sql(f'DROP TABLE {table.name}')
+    conn.exec_driver_sql(f'ALTER TABLE {new_name} RENAME TO {table.name}')
+    for index in table.indexes:
+        index.create(conn)
+
+
+def never_reuse_transaction_ids():
+    """Rebuild SQLite's transactions table with AUTOINCREMENT, past every archived id."""
+    if db.engine.dialect.name != 'sqlite':
+        print("transaction_ids: ids come from a sequence, nothing to do")
+        return
+
+    with db.engine.begin() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'").scalar()
+        if 'AUTOINCREMENT' not in ddl.upper():
+            _rebuild_sqlite_table(conn, Transaction.__table__, ())
+        last_id = max(
+            conn.execute(db.select(db.func.coalesce(db.func.max(model.id), 0))).scalar()
+            for model in (Transaction, ArchivedTransaction)
+        )
+        issued = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").scalar() or 0
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'transactions'")
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)",
+                             (max(last_id, issued),))
+    print(f"transaction_ids: new transactions start after id {max(last_id, issued)}")
+
+
+def create_indexes():
+    """Create indexes added to existing tables (``create_all`` skips those)."""
+    created = 0
+    for table in db.metadata.sorted_tables:
+        existing = {ix['name'] for ix in db.inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created += 1
+    print(f"indexes: created {created} index(es)")
+
+
+def backfill_qr_redemptions():
+    """Create redemption tokens for deductions tagged ``[QR:<hash>]``."""
+    known = {h for (h,) in db.session.query(QrRedemption.qr_hash)}
+    created = 0
+
+    # One-time scan; every later duplicate check goes through the unique index
+    rows = db.session.query(Transaction.id, Transaction.user_id, Transaction.description, Transaction.timestamp)\
+        .filter(Transaction.transaction_type == 'deduction', Transaction.description.like('%[QR:%'))\
+        .order_by(Transaction.id)
+    for tx_id, user_id, description, timestamp in rows:
+        match = QR_TAG.search(description or '')
+        if not match or match.group(1) in known:
+            continue
+        known.add(match.group(1))
+        db.session.add(QrRedemption(
+            qr_hash=match.group(1),
+            user_id=user_id,
+            transaction_id=tx_id,
+            created_at=timestamp
+        ))
+        created += 1
+
+    db.session.commit()
+    print(f"qr_redemptions: backfilled {created} token(s)")
+
+
+def rebuild_wallet_checkpoints():
+    """Seed per-user checkpoints from a full ledger sweep (balances untouched)."""
+    checked, mismatches, after = 0, [], 0
+    while after is not None:
+        report = reconcile_wallets(fix=False, after=after, limit=current_app.config['RECONCILE_PAGE_SIZE'])
+        checked += report['users_checked']
+        mismatches += report['mismatches']
+        after = report['next_after']
+    print(f"wallet_checkpoints: {checked} user(s) checked, {len(mismatches)} mismatch(es)")
+    for m in mismatches:
+        print(f"  user {m['user_id']}: balance={m['balance']} ledger_sum={m['ledger_sum']}")
+
+
+def backfill_daily_stats():
+    """Rebuild the daily_stats rollup from the full ledger."""
+    print(f"daily_stats: wrote {rebuild_daily_stats()} rollup row(s)")
+
+
+def backfill_spend_stats():
+    """Replay the ledger into the per-user spend stats behind /wallet/projection."""
+    columns = {c['name'] for c in db.inspect(db.engine).get_columns('spend_stats')}
+    if 'pending_topup_paise' in columns:
+        # Pending top-ups are now summed per request; the stats are rebuilt anyway
+        SpendStat.__table__.drop(db.engine)
+        SpendStat.__table__.create(db.engine)
+    print(f"spend_stats: wrote stats for {rebuild_spend_stats()} user(s)")
+
+
+STEPS = {
+    'integer_money': convert_money_to_paise,
+    'transaction_ids': never_reuse_transaction_ids,
+    'indexes': create_indexes,
+    'qr_redemptions': backfill_qr_redemptions,
+    'wallet_checkpoints': rebuild_wallet_checkpoints,
+    'daily_stats': backfill_daily_stats,
+    'spend_stats': backfill_spend_stats,
+}
+
+
+def main(argv):
+    names = list(STEPS) if argv == ['all'] else argv
+    unknown = [n for n in names if n not in STEPS]
+    if not names or unknown:
+        print(__doc__)
+        print("Available steps: " + ", ".join(STEPS))
+        return 1
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for name in names:
+            STEPS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from utils.money import to_paise, to_rupees
+from utils.db import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -9,11 +11,20 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(20), nullable=False) # student, vendor, admin
-    balance = db.Column(db.Float, default=0.0)
+    balance_paise = db.Column('balance', db.BigInteger, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     transactions = db.relationship('Transaction', backref='user', lazy=True)
 
+    # Rupee view of balance_paise for the API; do arithmetic on balance_paise
+    @property
+    def balance(self):
+        return to_rupees(self.balance_paise)
+
+    @balance.setter
+    def balance(self, rupees):
+        self.balance_paise = to_paise(rupees)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -26,8 +37,8 @@ class Transaction(db.Model):
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    transaction_type = db.Column(db.String(20), nullable=False) # top-up, deduction, refund
+    amount_paise = db.Column('amount', db.BigInteger, nullable=False)
+    transaction_type = db.Column(db.String(20), nullable=False) # top-up, deduction, refund, opening-balance
     description = db.Column(db.String(200))
     venue = db.Column(db.String(100))
     source = db.Column(db.String(20)) # self, parent, admin
@@ -35,6 +46,32 @@ class Transaction(db.Model):
     skipped = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Incremental wallet verification sums rows past a per-user checkpoint id
+        db.Index('ix_transactions_user_id_id', 'user_id', 'id'),
+        # Keyset pagination of a user's history, newest first
+        db.Index('ix_transactions_user_ts_id', 'user_id', db.desc('timestamp'), db.desc('id')),
+        # Wallet projection: a user's latest deductions
+        db.Index('ix_transactions_user_type_ts', 'user_id', 'transaction_type', 'timestamp'),
+        # Wallet projection: a user's pending top-ups
+        db.Index('ix_transactions_user_status_type', 'user_id', 'status', 'transaction_type'),
+        # Date-range reads (rollup rebuilds, trends)
+        db.Index('ix_transactions_timestamp', 'timestamp'),
+        db.Index('ix_transactions_venue', 'venue'),
+        # SQLite would otherwise hand out the ids of rows archived from the top
+        # of the table again; archived rows keep their ids
+        {'sqlite_autoincrement': True},
+    )
+
+    # Rupee view of amount_paise for the API; do arithmetic on amount_paise
+    @property
+    def amount(self):
+        return to_rupees(self.amount_paise)
+
+    @amount.setter
+    def amount(self, rupees):
+        self.amount_paise = to_paise(rupees)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -48,6 +85,48 @@ class Transaction(db.Model):
             'skipped': self.skipped,
             'timestamp': self.timestamp.isoformat()
         }
+
+class ArchivedTransaction(db.Model):
+    """Ledger rows of closed terms, moved out of the hot transactions table by archive.py."""
+    __tablename__ = 'transactions_archive'
+    # Ids are kept from the transactions table, so cursors stay valid
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    term = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    amount_paise = db.Column('amount', db.BigInteger, nullable=False)
+    transaction_type = db.Column(db.String(20), nullable=False)
+    description = db.Column(db.String(200))
+    venue = db.Column(db.String(100))
+    source = db.Column(db.String(20))
+    status = db.Column(db.String(20))
+    skipped = db.Column(db.Boolean, default=False)
+    timestamp = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Keyset pagination of a user's history, newest first
+        db.Index('ix_transactions_archive_user_ts_id', 'user_id', db.desc('timestamp'), db.desc('id')),
+        db.Index('ix_transactions_archive_term', 'term'),
+        # Date-range finance exports
+        db.Index('ix_transactions_archive_timestamp', 'timestamp'),
+    )
+
+    @property
+    def amount(self):
+        return to_rupees(self.amount_paise)
+
+    def to_dict(self):
+        data = Transaction.to_dict(self)
+        data['term'] = self.term
+        return data
+
+class ArchiveTerm(db.Model):
+    """One row per archived term; rows before `cutoff` live in transactions_archive."""
+    __tablename__ = 'archive_terms'
+    term = db.Column(db.String(20), primary_key=True)
+    cutoff = db.Column(db.DateTime, nullable=False)
+    transactions = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class MealSkip(db.Model):
     __tablename__ = 'meal_skips'
     id = db.Column(db.Integer, primary_key=True)
@@ -57,7 +136,11 @@ class MealSkip(db.Model):
     reason = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'meal_slot', 'skip_date', name='_user_meal_skip_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'meal_slot', 'skip_date', name='_user_meal_skip_uc'),
+        # Vendor skip forecast by date and slot
+        db.Index('ix_meal_skips_date_slot', 'skip_date', 'meal_slot'),
+    )
 
     def to_dict(self):
         return {
@@ -68,3 +151,62 @@ class MealSkip(db.Model):
             'reason': self.reason,
             'created_at': self.created_at.isoformat()
         }
+
+class QrRedemption(db.Model):
+    __tablename__ = 'qr_redemptions'
+    id = db.Column(db.Integer, primary_key=True)
+    qr_hash = db.Column(db.String(16), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    transaction = db.relationship('Transaction')
+
+    __table_args__ = (
+        # A user's latest redemption, which the current QR code is derived from
+        db.Index('ix_qr_redemptions_user_id_id', 'user_id', 'id'),
+    )
+
+class WalletCheckpoint(db.Model):
+    __tablename__ = 'wallet_checkpoints'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    ledger_sum_paise = db.Column('ledger_sum', db.BigInteger, nullable=False, default=0)
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    verified_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SpendStat(db.Model):
+    """Rolling per-user spend figures behind /wallet/projection."""
+    __tablename__ = 'spend_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # EWMA of the meal price per slot, in paise; NULL until the first meal in that slot
+    breakfast_ewma_paise = db.Column(db.Float)
+    lunch_ewma_paise = db.Column(db.Float)
+    dinner_ewma_paise = db.Column(db.Float)
+    deduction_count = db.Column(db.Integer, nullable=False, default=0)
+
+class RecentWrite(db.Model):
+    """When each user last wrote; @read_only views read their data from the primary for a while after."""
+    __tablename__ = 'recent_writes'
+    user_id = db.Column(db.Integer, primary_key=True)
+    written_at = db.Column(db.DateTime, nullable=False)
+
+class WalletEvent(db.Model):
+    """Outbox read by every worker when EVENT_BROKER is 'database'."""
+    __tablename__ = 'wallet_events'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False) # JSON event body
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class DailyStat(db.Model):
+    """Per-day ledger rollup backing the admin reports."""
+    __tablename__ = 'daily_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    stat_date = db.Column(db.Date, nullable=False)
+    venue = db.Column(db.String(100), nullable=False, default='') # '' when the transaction has none
+    transaction_type = db.Column(db.String(20), nullable=False)
+    source = db.Column(db.String(20), nullable=False, default='') # '' when the transaction has none
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_sum_paise = db.Column('amount_sum', db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('stat_date', 'venue', 'transaction_type', 'source', name='_daily_stat_uc'),)
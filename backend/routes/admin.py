@@ -1,56 +1,70 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Transaction
-from utils.utils import require_auth, require_role
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from models import db, User, DailyStat
+from utils.wallet import credit, UserNotFound
+from utils.money import positive_paise, to_rupees
+from utils.forecast import get_forecast, forecast_cache_stats
+from utils.utils import require_auth, require_role, reconcile_wallets, token_cache_stats
+from utils.qr import qr_cache_stats
+from utils.db import read_only
+from utils.events import wallet_event, publish_wallet_event
+from utils.log import log_event
+from utils.bulk_import import read_rows, detect_format, limit_rows, import_users, import_topups
+from utils.export import count_rows, EXPORT_FORMATS, Settlement, ledger_rows, parse_range
 from sqlalchemy import func
-from datetime import datetime
+from datetime import datetime, timedelta
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/reports', methods=['GET'])
 @require_auth
 @require_role('admin')
+@read_only
 def get_reports():
-    # Total transactions
-    total_tx = Transaction.query.count()
-    
+    # All ledger figures come from the daily_stats rollup, never the raw ledger
+    totals = db.session.query(
+        DailyStat.venue, DailyStat.transaction_type, DailyStat.source,
+        func.sum(DailyStat.tx_count), func.sum(DailyStat.amount_sum_paise)
+    ).group_by(DailyStat.venue, DailyStat.transaction_type, DailyStat.source).all()
+
+    total_tx = 0
+    net_paise = 0
+    venue_report = {}
+    source_report = {}
+    for venue, tx_type, source, count, amount in totals:
+        total_tx += count
+        net_paise += amount or 0
+        # Meal counts by venue
+        if tx_type == 'deduction':
+            venue_report[venue or None] = venue_report.get(venue or None, 0) + count
+        # Top-up sources
+        elif tx_type == 'top-up':
+            source_report[source or None] = source_report.get(source or None, 0) + count
+
     # Total volume
-    total_volume = db.session.query(func.abs(func.sum(Transaction.amount))).one()[0] or 0
-    
-    # Waste Reduction Calculation (Simulated)
-    total_students = User.query.filter_by(role='student').count()
-    waste_reduction = 45.5 # Base mock value
-    
-    # Meal counts by venue
-    venue_data = db.session.query(
-        Transaction.venue, func.count(Transaction.id)
-    ).filter(Transaction.transaction_type == 'deduction').group_by(Transaction.venue).all()
-    
-    venue_report = {v: c for v, c in venue_data}
-    
-    # Top-up sources
-    sources = db.session.query(
-        Transaction.source, func.count(Transaction.id)
-    ).filter(Transaction.transaction_type == 'top-up').group_by(Transaction.source).all()
-    source_report = {s: c for s, c in sources}
+    total_volume = to_rupees(abs(net_paise))
 
     # Daily Growth Trend (Last 7 Days)
-    from datetime import timedelta
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
+    seven_days_ago = (datetime.utcnow() - timedelta(days=7)).date()
+
     growth_data = db.session.query(
-        func.date(Transaction.timestamp), func.abs(func.sum(Transaction.amount))
-    ).filter(Transaction.timestamp >= seven_days_ago)\
-     .group_by(func.date(Transaction.timestamp))\
-     .order_by(func.date(Transaction.timestamp)).all()
-    
-    growth_trend = [{"date": d, "volume": v} for d, v in growth_data]
-    
+        DailyStat.stat_date, func.abs(func.sum(DailyStat.amount_sum_paise))
+    ).filter(DailyStat.stat_date >= seven_days_ago)\
+     .group_by(DailyStat.stat_date)\
+     .order_by(DailyStat.stat_date).all()
+
+    growth_trend = [{"date": d.isoformat(), "volume": to_rupees(v)} for d, v in growth_data]
+
     # Entity Distribution
     roles_data = db.session.query(
         User.role, func.count(User.id)
     ).group_by(User.role).all()
     entity_distribution = {role: count for role, count in roles_data}
 
+    total_students = entity_distribution.get('student', 0)
+
+    # Waste Reduction: share of next week's forecast headcount covered by registered skips
+    waste_reduction = get_forecast(7)['waste_reduction_pct']
+
     return jsonify({
         'total_transactions': total_tx,
         'total_volume': total_volume,
@@ -65,6 +79,7 @@ def get_reports():
 @admin_bp.route('/users', methods=['GET'])
 @require_auth
 @require_role('admin')
+@read_only
 def list_users():
     users = User.query.all()
     return jsonify([u.to_dict() for u in users]), 200
@@ -77,35 +92,120 @@ def refund_balance():
     user_id = data.get('user_id')
     amount = data.get('amount')
     
-    if not amount or amount <= 0:
+    amount_paise = positive_paise(amount)
+    if amount_paise is None:
         return jsonify({'message': 'Invalid refund amount'}), 400
     
-    if amount > 10000:
+    if amount_paise > 10000 * 100:
         return jsonify({'message': 'Maximum refund amount is ₹10000. Contact system administrator for larger refunds.'}), 400
 
-    # Use pessimistic locking
-    user = User.query.with_for_update().get(user_id)
-    if not user:
+    try:
+        transaction, _ = credit(
+            user_id,
+            amount_paise,
+            transaction_type='refund',
+            description='Administrative Refund',
+            source='admin'
+        )
+    except UserNotFound:
         return jsonify({'message': 'User not found'}), 404
     
-    print(f"DEBUG: Admin refund for user {user_id}, balance before: {user.balance}, refunding: {amount}")
-
-    user.balance += amount
-    
-    transaction = Transaction(
-        user_id=user_id,
-        amount=amount,
-        transaction_type='refund',
-        description='Administrative Refund',
-        source='admin'
-    )
-    db.session.add(transaction)
-    db.session.commit()
-    
-    # Verify wallet consistency
+    # Verify wallet consistency (advances the checkpoint in the same commit)
     from utils.utils import verify_wallet_consistency
     verified_balance = verify_wallet_consistency(user_id)
-    
-    print(f"DEBUG: Refund complete. New balance: {verified_balance}")
+    event = wallet_event(verified_balance, [transaction])
+    db.session.commit()
+    publish_wallet_event(user_id, event)
+    # Refunds are rare and audited: never sampled out
+    log_event('admin.refund', sample_rate=1.0, admin_id=request.user['user_id'],
+              user_id=user_id, amount=amount, balance=verified_balance)
 
     return jsonify({'message': 'Refund processed', 'new_balance': verified_balance}), 200
+
+@admin_bp.route('/bulk/users', methods=['POST'])
+@require_auth
+@require_role('admin')
+def bulk_users():
+    # CSV/NDJSON of email,password[,role]; bad rows are reported, not fatal
+    report = import_users(_bulk_rows(current_app.config['BULK_IMPORT_USERS_MAX_ROWS']))
+    return jsonify(report), 200
+
+@admin_bp.route('/bulk/topups', methods=['POST'])
+@require_auth
+@require_role('admin')
+def bulk_topups():
+    # Bank-transfer CSV/NDJSON of email (or user_id),amount[,source,reference]
+    report = import_topups(_bulk_rows(current_app.config['BULK_IMPORT_MAX_ROWS']))
+    return jsonify(report), 200
+
+def _bulk_rows(max_rows):
+    # Multipart upload ('file') or the raw request body, parsed as it streams in
+    upload = request.files.get('file')
+    if upload:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(content_type=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    return limit_rows(read_rows(stream, fmt), max_rows)
+
+@admin_bp.route('/export/transactions', methods=['GET'])
+@require_auth
+@require_role('admin')
+@read_only
+def export_transactions():
+    # Finance audit export: streamed from server-side cursors, ends with the
+    # per-venue settlement computed in the same pass
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"Unknown format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start, end = parse_range(request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        return jsonify({'message': 'Invalid range. Use from=YYYY-MM-DD&to=YYYY-MM-DD (to is inclusive)'}), 400
+    venue = request.args.get('venue')
+
+    # A sync worker is killed at its 30 s timeout and the download silently
+    # ends early; larger exports need a gevent/uvicorn worker or export.py
+    max_rows = current_app.config['EXPORT_SYNC_MAX_ROWS']
+    if current_app.config['WORKER_PROFILE'] == 'sync' and count_rows(start, end, venue) > max_rows:
+        return jsonify({'message': f'Exports over {max_rows} rows need a narrower range on this server; '
+                                   'run export.py on the server for the full range'}), 400
+
+    export, mimetype, extension = EXPORT_FORMATS[fmt]
+    log_event('admin.export', sample_rate=1.0, admin_id=request.user['user_id'], format=fmt,
+              start=start, end=end, venue=venue)
+    filename = f"transactions-{request.args.get('from') or 'start'}-{request.args.get('to') or 'now'}.{extension}"
+    body = export(ledger_rows(start, end, venue), Settlement())
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@admin_bp.route('/reconcile', methods=['POST'])
+@require_auth
+@require_role('admin')
+def reconcile():
+    # Ledger sweep one page of users at a time (?after=<user id>, next page in
+    # X-Next-Cursor); per-write checks only look at rows since the last checkpoint
+    fix = request.args.get('fix', 'false').lower() == 'true'
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', current_app.config['RECONCILE_PAGE_SIZE'], type=int)
+    if limit <= 0:
+        return jsonify({'message': 'limit must be a positive integer'}), 400
+    limit = min(limit, current_app.config['RECONCILE_PAGE_SIZE'])
+
+    report = reconcile_wallets(fix=fix, after=after, limit=limit)
+    next_after = report.pop('next_after')
+    response = jsonify(report)
+    if next_after is not None:
+        response.headers['X-Next-Cursor'] = str(next_after)
+    return response, 200
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+@require_auth
+@require_role('admin')
+def cache_stats():
+    # Hit/miss counters of this worker's in-process caches
+    return jsonify({
+        'tokens': token_cache_stats(),
+        'qr': qr_cache_stats(),
+        'forecast': forecast_cache_stats()
+    }), 200
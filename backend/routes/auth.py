@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models import db, User
-from utils.utils import hash_password, check_password, create_token
+from utils.utils import hash_password, check_password, create_token, busy_response, HashingBusy
+from utils.passwords import needs_rehash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -14,7 +15,10 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'message': 'User already exists'}), 400
 
-    hashed_pw = hash_password(password)
+    try:
+        hashed_pw = hash_password(password)
+    except HashingBusy as e:
+        return busy_response(e)
     new_user = User(email=email, password_hash=hashed_pw, role=role)
     db.session.add(new_user)
     db.session.commit()
@@ -28,8 +32,19 @@ def login():
     password = data.get('password')
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password(password, user.password_hash):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    try:
+        if not user or not check_password(password, user.password_hash):
+            return jsonify({'message': 'Invalid credentials'}), 401
+    except HashingBusy as e:
+        return busy_response(e)
+
+    # Upgrade hashes made with a different cost while we have the plaintext
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(password)
+            db.session.commit()
+        except HashingBusy:
+            pass # Try again on a later login
 
     token = create_token(user.id, user.role)
     
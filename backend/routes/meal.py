@@ -1,97 +1,276 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Transaction
+from flask import Blueprint, request, jsonify, current_app
+from models import db, QrRedemption
+from utils.money import positive_paise, to_rupees
+from utils.wallet import debit, UserNotFound, InsufficientBalance
 from utils.utils import require_auth, require_role
+from utils.qr import verify_qr_token
+from utils.events import wallet_event, publish_wallet_event
+from utils.log import log_event
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import hashlib
+import time
 
 meal_bp = Blueprint('meal', __name__)
 
+MAX_BATCH_SCANS = 500
+# Tolerated drift between a terminal's clock and ours
+MAX_CLOCK_SKEW = 60
+
 @meal_bp.route('/deduct', methods=['POST'])
 @require_auth
 @require_role('vendor')
 def deduct_meal():
     data = request.json
-    qr_payload = data.get('qr_payload') # JSON from QR: {"user_id": 1, "expires": TIMESTAMP}
+    qr_payload = data.get('qr_payload') # Signed token string from the QR
     meal_cost = data.get('meal_cost')
     description = data.get('description', 'Meal')
     venue = data.get('venue', 'Unknown Venue')
 
     if not qr_payload or not meal_cost:
         return jsonify({'message': 'Missing data'}), 400
-    
-    # Validate QR payload structure
-    if not isinstance(qr_payload, dict):
-        return jsonify({'message': 'Invalid QR payload format'}), 400
-    
-    try:
-        user_id = qr_payload.get('user_id')
-        expires = qr_payload.get('expires')
-        
-        if not user_id or not expires:
-            return jsonify({'message': 'QR payload missing required fields'}), 400
-    except (AttributeError, TypeError) as e:
-        return jsonify({'message': 'Malformed QR code'}), 400
+    meal_paise = positive_paise(meal_cost)
+    if meal_paise is None:
+        return jsonify({'message': 'Invalid meal_cost'}), 400
 
-    # Security: Check QR expiry
-    if datetime.utcnow().timestamp() > expires:
-        return jsonify({'message': 'QR code expired. Please generate a new QR code.'}), 400
-    
-    # Generate QR hash for idempotency (prevent duplicate scans)
-    qr_hash = hashlib.sha256(
-        f"{user_id}:{expires}".encode()
-    ).hexdigest()[:16]
-    
-    # Check if this QR has already been used
-    existing = Transaction.query.filter(
-        Transaction.user_id == user_id,
-        Transaction.transaction_type == 'deduction',
-        Transaction.description.like(f'%QR:{qr_hash}%')
-    ).first()
+    # Pure-CPU check: forged, expired or malformed codes never reach the DB
+    scan = _validate_qr(qr_payload)
+    if isinstance(scan, str):
+        return jsonify({'message': scan}), 400
+    user_id = scan['user_id']
+    qr_hash = scan['qr_hash']
     
+    # Check if this QR has already been used (indexed lookup on the redemption token)
+    existing = QrRedemption.query.filter_by(qr_hash=qr_hash).first()
     if existing:
-        return jsonify({
-            'message': 'This QR code has already been used for payment',
-            'previous_transaction': existing.timestamp.isoformat(),
-            'previous_amount': abs(existing.amount)
-        }), 409
-
-    # Use pessimistic locking to prevent race conditions
-    user = User.query.with_for_update().get(user_id)
-    if not user:
-        return jsonify({'message': 'User not found'}), 404
+        return _duplicate_scan_response(existing)
 
-    if user.balance < meal_cost:
+    # Balance check and deduction are one conditional UPDATE, so two
+    # terminals charging the same wallet can't overdraw it or lose an update
+    try:
+        transaction, _ = debit(
+            user_id,
+            meal_paise,
+            transaction_type='deduction',
+            description=f'{description} [QR:{qr_hash}]', # QR hash kept for audit
+            venue=venue
+        )
+    except UserNotFound:
+        return jsonify({'message': 'User not found'}), 404
+    except InsufficientBalance as e:
         return jsonify({
             'message': 'Insufficient balance',
-            'current_balance': user.balance,
+            'current_balance': to_rupees(e.balance_paise),
             'required': meal_cost
         }), 400
-    
-    print(f"DEBUG: Meal deduction for user {user_id}, balance before: {user.balance}, deducting: {meal_cost}")
 
-    # Deduct balance
-    user.balance -= meal_cost
-    
-    # Create transaction with QR hash in description
-    transaction = Transaction(
-        user_id=user_id,
-        amount=-meal_cost, # Store as negative for deductions
-        transaction_type='deduction',
-        description=f'{description} [QR:{qr_hash}]',
-        venue=venue
-    )
-    db.session.add(transaction)
-    db.session.commit()
-    
-    # Verify wallet consistency
-    from utils.utils import verify_wallet_consistency
-    verified_balance = verify_wallet_consistency(user_id)
-    
-    print(f"DEBUG: Meal deduction complete. New balance: {verified_balance}")
+    # Redemption token is written in the same commit; the unique index on
+    # qr_hash rejects a concurrent scan of the same QR from another terminal
+    db.session.add(QrRedemption(qr_hash=qr_hash, user_id=user_id, transaction=transaction))
+    try:
+        # Verify wallet consistency (advances the checkpoint in the same commit)
+        from utils.utils import verify_wallet_consistency
+        verified_balance = verify_wallet_consistency(user_id)
+        event = wallet_event(verified_balance, [transaction])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        existing = QrRedemption.query.filter_by(qr_hash=qr_hash).first()
+        if not existing:
+            raise
+        return _duplicate_scan_response(existing)
+
+    publish_wallet_event(user_id, event)
+    log_event('meal.deduct', user_id=user_id, amount=meal_cost, venue=venue, balance=verified_balance)
 
     return jsonify({
         'message': 'Payment successful',
         'new_balance': verified_balance,
-        'user_id': user.id,
+        'user_id': user_id,
         'amount_deducted': meal_cost
     }), 200
+
+@meal_bp.route('/deduct/batch', methods=['POST'])
+@require_auth
+@require_role('vendor')
+def deduct_meal_batch():
+    # Settles scans a POS terminal captured while offline, in one transaction
+    data = request.json or {}
+    scans = data.get('scans')
+    default_venue = data.get('venue', 'Unknown Venue')
+
+    if not isinstance(scans, list) or not scans:
+        return jsonify({'message': 'scans must be a non-empty list'}), 400
+    if len(scans) > MAX_BATCH_SCANS:
+        return jsonify({'message': f'A batch can settle at most {MAX_BATCH_SCANS} scans'}), 400
+
+    # A concurrent single scan can redeem one of our codes between the
+    # duplicate check and commit; the retry then reports it as a duplicate
+    for attempt in range(2):
+        try:
+            results, settled_users, events = _settle_batch(scans, default_venue)
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+
+    for user_id in settled_users:
+        publish_wallet_event(user_id, events[user_id])
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    log_event('meal.deduct_batch', venue=default_venue, scans=len(scans), **summary)
+
+    return jsonify({'results': results, 'summary': summary}), 200
+
+def _settle_batch(scans, default_venue):
+    """
+    Apply a batch of offline scans inside the current session, without committing.
+
+    Returns:
+        tuple: per-scan results (in request order), the ids of users charged
+        and each charged user's wallet event
+    """
+    now = time.time()
+    window = current_app.config['OFFLINE_SETTLEMENT_WINDOW']
+    results = [None] * len(scans)
+    accepted = []
+
+    # Pure-CPU validation of every scan before touching the DB
+    for index, item in enumerate(scans):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'status': 'invalid', 'message': 'Invalid scan'}
+            continue
+
+        meal_cost = item.get('meal_cost')
+        scanned_at = item.get('scanned_at', now)
+        meal_paise = positive_paise(meal_cost)
+        if meal_paise is None:
+            results[index] = {'index': index, 'status': 'invalid', 'message': 'Invalid meal_cost'}
+            continue
+        if not isinstance(scanned_at, (int, float)) or scanned_at > now + MAX_CLOCK_SKEW:
+            results[index] = {'index': index, 'status': 'invalid', 'message': 'Invalid scanned_at'}
+            continue
+        if scanned_at < now - window:
+            results[index] = {'index': index, 'status': 'invalid', 'message': 'Scan is too old to settle'}
+            continue
+
+        # Expiry is judged at capture time, not upload time
+        scan = _validate_qr(item.get('qr_payload'), now=scanned_at)
+        if isinstance(scan, str):
+            results[index] = {'index': index, 'status': 'invalid', 'message': scan}
+            continue
+
+        scan.update(index=index, meal_cost=meal_cost, meal_paise=meal_paise, scanned_at=scanned_at,
+                    description=item.get('description', 'Meal'),
+                    venue=item.get('venue', default_venue))
+        accepted.append(scan)
+
+    # One indexed IN query for codes redeemed before this batch
+    hashes = [scan['qr_hash'] for scan in accepted]
+    redeemed = {h for (h,) in db.session.query(QrRedemption.qr_hash).filter(QrRedemption.qr_hash.in_(hashes))} if hashes else set()
+
+    by_user = {}
+    for scan in accepted:
+        if scan['qr_hash'] in redeemed:
+            results[scan['index']] = {'index': scan['index'], 'status': 'duplicate',
+                                      'message': 'This QR code has already been used for payment'}
+            continue
+        redeemed.add(scan['qr_hash'])
+        by_user.setdefault(scan['user_id'], []).append(scan)
+
+    settled_users = []
+    events = {}
+    # Charge users in id order: on Postgres the first UPDATE locks the user's
+    # row until commit, and a fixed order keeps concurrent batches deadlock-free
+    for user_id in sorted(by_user):
+        user_scans = sorted(by_user[user_id], key=lambda s: s['scanned_at'])
+
+        charged = []
+        for scan in user_scans:
+            try:
+                transaction, _ = debit(
+                    user_id,
+                    scan['meal_paise'],
+                    transaction_type='deduction',
+                    description=f"{scan['description']} [QR:{scan['qr_hash']}]",
+                    venue=scan['venue'],
+                    timestamp=datetime.utcfromtimestamp(scan['scanned_at'])
+                )
+            except UserNotFound:
+                for missing in user_scans:
+                    results[missing['index']] = {'index': missing['index'], 'status': 'not_found', 'message': 'User not found'}
+                break
+            except InsufficientBalance as e:
+                results[scan['index']] = {'index': scan['index'], 'status': 'insufficient',
+                                          'message': 'Insufficient balance',
+                                          'current_balance': to_rupees(e.balance_paise), 'required': scan['meal_cost']}
+                continue
+
+            db.session.add(QrRedemption(qr_hash=scan['qr_hash'], user_id=user_id, transaction=transaction))
+            charged.append((scan, transaction))
+
+        if not charged:
+            continue
+
+        # Verify wallet consistency once per user (advances the checkpoint)
+        from utils.utils import verify_wallet_consistency
+        verified_balance = verify_wallet_consistency(user_id)
+        settled_users.append(user_id)
+        events[user_id] = wallet_event(verified_balance, [transaction for _, transaction in charged])
+        for scan, transaction in charged:
+            results[scan['index']] = {'index': scan['index'], 'status': 'success',
+                                      'transaction_id': transaction.id,
+                                      'amount_deducted': scan['meal_cost'],
+                                      'new_balance': verified_balance}
+
+    return results, settled_users, events
+
+def _validate_qr(qr_payload, now=None):
+    """
+    Validate a scanned QR payload.
+
+    Args:
+        qr_payload: Signed token string, or a legacy JSON payload
+        now: UTC unix timestamp to judge expiry against, defaults to time.time()
+
+    Returns:
+        dict: user_id, expires and qr_hash, or an error message string
+    """
+    if now is None:
+        now = time.time()
+
+    if isinstance(qr_payload, str):
+        return verify_qr_token(qr_payload, current_app.config['QR_SECRET_KEY'], now=now)
+
+    # Legacy unsigned JSON payload: {"user_id": 1, "expires": TIMESTAMP}
+    if not isinstance(qr_payload, dict) or not current_app.config['QR_ACCEPT_LEGACY_PAYLOAD']:
+        return 'Invalid QR payload format'
+
+    user_id = qr_payload.get('user_id')
+    expires = qr_payload.get('expires')
+    if not user_id or not expires:
+        return 'QR payload missing required fields'
+    if not isinstance(expires, (int, float)):
+        return 'Malformed QR code'
+
+    # Security: Check QR expiry
+    if now > expires:
+        return 'QR code expired. Please generate a new QR code.'
+
+    # Generate QR hash for idempotency (prevent duplicate scans)
+    qr_hash = hashlib.sha256(
+        f"{user_id}:{expires}".encode()
+    ).hexdigest()[:16]
+    return {'user_id': user_id, 'expires': expires, 'qr_hash': qr_hash}
+
+def _duplicate_scan_response(redemption):
+    previous = redemption.transaction
+    return jsonify({
+        'message': 'This QR code has already been used for payment',
+        'previous_transaction': previous.timestamp.isoformat(),
+        'previous_amount': abs(previous.amount)
+    }), 409
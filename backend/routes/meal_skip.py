@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from models import db, MealSkip, User
 from utils.utils import require_auth, require_role
+from utils.forecast import campus_today, get_forecast, invalidate_forecast
+from utils.db import read_only
+from sqlalchemy import func
 from datetime import datetime, date, timedelta
 
 meal_skip_bp = Blueprint('meal_skip', __name__)
@@ -25,7 +28,7 @@ def skip_meal():
 
     # Policy: Must be at least 24 hours away
     # For simplicity, we check if skip_date is at least tomorrow
-    tomorrow = date.today() + timedelta(days=1)
+    tomorrow = campus_today() + timedelta(days=1)
     if skip_date < tomorrow:
         return jsonify({'message': 'Skips must be scheduled at least 24 hours in advance'}), 400
 
@@ -42,6 +45,7 @@ def skip_meal():
     )
     db.session.add(new_skip)
     db.session.commit()
+    invalidate_forecast()
 
     return jsonify({'message': 'Meal skip recorded', 'skip': new_skip.to_dict()}), 201
 
@@ -54,7 +58,7 @@ def get_user_skips():
     
     query = MealSkip.query.filter_by(user_id=user_id)
     if upcoming:
-        query = query.filter(MealSkip.skip_date >= date.today())
+        query = query.filter(MealSkip.skip_date >= campus_today())
     
     skips = query.order_by(MealSkip.skip_date.asc()).all()
     return jsonify([s.to_dict() for s in skips]), 200
@@ -72,17 +76,19 @@ def cancel_skip(skip_id):
     # Policy: Cancel up to 12 hours before. 
     # For simplicity, if skip_date is today or in past, we don't allow cancellation 
     # (assuming 24h advance was required, so cancelling a future date is fine)
-    if skip.skip_date <= date.today():
+    if skip.skip_date <= campus_today():
         # More precise check could be done here if we had meal slot times
         return jsonify({'message': 'Cannot cancel skips for today or past dates'}), 400
 
     db.session.delete(skip)
     db.session.commit()
+    invalidate_forecast()
     return jsonify({'message': 'Meal skip cancelled'}), 200
 
 @meal_skip_bp.route('/skips/upcoming', methods=['GET'])
 @require_auth
 @require_role('vendor', 'admin')
+@read_only
 def get_upcoming_skips():
     date_str = request.args.get('date')
     meal_slot = request.args.get('meal_slot')
@@ -93,34 +99,54 @@ def get_upcoming_skips():
         except ValueError:
             return jsonify({'message': 'Invalid date format'}), 400
     else:
-        target_date = date.today() + timedelta(days=1)
+        target_date = campus_today() + timedelta(days=1)
 
-    query = MealSkip.query.filter_by(skip_date=target_date)
+    filters = [MealSkip.skip_date == target_date]
     if meal_slot:
-        query = query.filter_by(meal_slot=meal_slot)
+        filters.append(MealSkip.meal_slot == meal_slot)
 
-    skips = query.all()
-    
     # Summary count
     summary = {
         'BREAKFAST': 0,
         'LUNCH': 0,
         'DINNER': 0
     }
-    
-    detailed_skips = []
-    for s in skips:
-        summary[s.meal_slot] += 1
-        user = User.query.get(s.user_id)
-        detailed_skips.append({
-            'id': s.id,
-            'user_email': user.email if user else 'Unknown',
-            'meal_slot': s.meal_slot,
-            'reason': s.reason
-        })
-
-    return jsonify({
+    slot_counts = db.session.query(
+        MealSkip.meal_slot, func.count(MealSkip.id)
+    ).filter(*filters).group_by(MealSkip.meal_slot).all()
+    for slot, count in slot_counts:
+        summary[slot] = count
+
+    response = {
         'date': target_date.isoformat(),
-        'summary': summary,
-        'skips': detailed_skips
-    }), 200
+        'summary': summary
+    }
+
+    # Kitchens mostly need the counts; skip the per-student detail when asked
+    if request.args.get('summary_only', 'false').lower() == 'true':
+        return jsonify(response), 200
+
+    # Emails come from the same query instead of one lookup per skip
+    rows = db.session.query(
+        MealSkip.id, MealSkip.meal_slot, MealSkip.reason, User.email
+    ).outerjoin(User, User.id == MealSkip.user_id).filter(*filters).all()
+
+    response['skips'] = [{
+        'id': skip_id,
+        'user_email': email if email else 'Unknown',
+        'meal_slot': slot,
+        'reason': reason
+    } for skip_id, slot, reason, email in rows]
+
+    return jsonify(response), 200
+
+@meal_skip_bp.route('/forecast', methods=['GET'])
+@require_auth
+@require_role('vendor', 'admin')
+@read_only
+def get_meal_forecast():
+    days = request.args.get('days', 3, type=int)
+    if days is None or not 1 <= days <= 14:
+        return jsonify({'message': 'days must be between 1 and 14'}), 400
+
+    return jsonify(get_forecast(days)), 200
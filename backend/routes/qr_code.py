@@ -1,10 +1,6 @@
-from flask import Blueprint, request, jsonify, send_file
-import qrcode
-import json
-import io
-import base64
-import time
+from flask import Blueprint, request, jsonify
 from utils.utils import require_auth
+from utils.qr import QR_FORMATS, get_qr_payload, render_qr
 
 qr_bp = Blueprint('qr', __name__)
 
@@ -12,22 +8,19 @@ qr_bp = Blueprint('qr', __name__)
 @require_auth
 def generate_qr():
     user_id = request.user['user_id']
-    
-    # Payload with 5-minute expiry
-    # CRITICAL: Use time.time() for correct UTC timestamp
-    payload = {
-        'user_id': user_id,
-        'expires': time.time() + (5 * 60)  # Current UTC time + 5 minutes
+    fmt = request.args.get('format', 'png').lower()
+    if fmt not in QR_FORMATS:
+        return jsonify({'message': f"Unsupported format. Use one of: {', '.join(QR_FORMATS)}"}), 400
+
+    # Payload with 5-minute expiry, reused across refreshes until redeemed
+    qr_data, expires = get_qr_payload(user_id)
+
+    response = {
+        'qr_payload': qr_data,
+        'expires_at': expires
     }
-    
-    qr_data = json.dumps(payload)
-    img = qrcode.make(qr_data)
-    
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    
-    return jsonify({
-        'qr_image': f"data:image/png;base64,{img_str}",
-        'expires_at': payload['expires']
-    }), 200
+    # 'payload' leaves rendering to the client
+    if fmt != 'payload':
+        response['qr_image'] = render_qr(qr_data, expires, fmt)
+
+    return jsonify(response), 200
@@ -1,26 +1,104 @@
-from flask import Blueprint, request, jsonify
-from models import Transaction
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from models import Transaction, ArchivedTransaction
 from utils.utils import require_auth
+from utils.db import read_only
+from utils.archive import archive_cutoff, OPENING_BALANCE
+from sqlalchemy import and_, or_
+from datetime import datetime
+import heapq
+import json
 
 transactions_bp = Blueprint('transactions', __name__)
 
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
+def _parse_cursor(value):
+    # Cursor format: "<ISO timestamp>,<id>" of the last row already seen
+    timestamp, _, tx_id = value.rpartition(',')
+    return datetime.fromisoformat(timestamp), int(tx_id)
+
+def _encode_cursor(transaction):
+    return f"{transaction.timestamp.isoformat()},{transaction.id}"
+
+def _sort_key(transaction):
+    return transaction.timestamp, transaction.id
+
+def _history(model, user_id, venue, type_, cursor):
+    """A user's rows in `model` (hot or archived ledger), newest first."""
+    query = model.query.filter_by(user_id=user_id)
+    if venue:
+        query = query.filter_by(venue=venue)
+    if type_:
+        query = query.filter_by(transaction_type=type_)
+    if cursor:
+        before_ts, before_id = cursor
+        query = query.filter(or_(
+            model.timestamp < before_ts,
+            and_(model.timestamp == before_ts, model.id < before_id)
+        ))
+    return query.order_by(model.timestamp.desc(), model.id.desc())
+
 @transactions_bp.route('', methods=['GET'])
 @require_auth
+@read_only
 def list_transactions():
     user_id = request.user['user_id']
     role = request.user['role']
     
     # If admin, they could potentially see all, but for MVP keep it user-scoped 
     # unless specified. However, for audit, we'll keep it user-scoped.
-    query = Transaction.query.filter_by(user_id=user_id)
-    
     venue = request.args.get('venue')
     type_ = request.args.get('type')
-    
-    if venue:
-        query = query.filter_by(venue=venue)
-    if type_:
-        query = query.filter_by(transaction_type=type_)
-        
-    transactions = query.order_by(Transaction.timestamp.desc()).all()
-    return jsonify([t.to_dict() for t in transactions]), 200
+
+    cursor = None
+    before = request.args.get('before')
+    if before:
+        try:
+            cursor = _parse_cursor(before)
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor. Use before=<timestamp>,<id>'}), 400
+
+    query = _history(Transaction, user_id, venue, type_, cursor)
+    if not type_:
+        # Carry-forward rows stand in for archived history, which is listed instead
+        query = query.filter(Transaction.transaction_type != OPENING_BALANCE)
+    cutoff = archive_cutoff()
+
+    # Full-history export: stream rows from a server-side cursor
+    if request.args.get('format') == 'ndjson':
+        rows = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+        if cutoff is not None:
+            archived = _history(ArchivedTransaction, user_id, venue, type_, cursor)\
+                .execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+            rows = heapq.merge(rows, archived, key=_sort_key, reverse=True)
+
+        def generate():
+            for t in rows:
+                yield json.dumps(t.to_dict()) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        transactions = query.all()
+        if cutoff is not None:
+            archived = _history(ArchivedTransaction, user_id, venue, type_, cursor).all()
+            transactions = list(heapq.merge(transactions, archived, key=_sort_key, reverse=True))
+        return jsonify([t.to_dict() for t in transactions]), 200
+
+    if limit <= 0:
+        return jsonify({'message': 'limit must be a positive integer'}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    # Fetch one extra row to know whether another page exists
+    transactions = query.limit(limit + 1).all()
+    # Archived rows are all older than the cutoff, and only unsettled rows
+    # that old stay hot, so the archive is read once the page reaches it
+    if cutoff is not None and (len(transactions) <= limit or transactions[-1].timestamp < cutoff):
+        archived = _history(ArchivedTransaction, user_id, venue, type_, cursor).limit(limit + 1).all()
+        transactions = list(heapq.merge(transactions, archived, key=_sort_key, reverse=True))[:limit + 1]
+    response = jsonify([t.to_dict() for t in transactions[:limit]])
+    if len(transactions) > limit:
+        response.headers['X-Next-Cursor'] = _encode_cursor(transactions[limit - 1])
+    return response, 200
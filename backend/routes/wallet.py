@@ -1,16 +1,20 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Transaction
-from utils.utils import require_auth
-from sqlalchemy import desc
-from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, current_app
+from models import db, SpendStat, Transaction
+from utils.wallet import credit, UserNotFound
+from utils.utils import require_auth, get_current_user, decode_token, create_stream_token, STREAM_SCOPE
+from utils.events import get_broker, wallet_event, publish_wallet_event, format_sse
+from utils.money import positive_paise, to_rupees
+from utils.forecast import MEAL_SLOTS, campus_time, get_slot_costs, meal_slot_for_hour
+from utils.stats import slot_column
+from utils.log import log_event
+import queue
 
 wallet_bp = Blueprint('wallet', __name__)
 
 @wallet_bp.route('/balance', methods=['GET'])
 @require_auth
 def get_balance():
-    user_id = request.user['user_id']
-    user = User.query.get(user_id)
+    user = get_current_user()
     return jsonify({'balance': user.balance}), 200
 
 @wallet_bp.route('/topup', methods=['POST'])
@@ -21,42 +25,92 @@ def topup():
     amount = data.get('amount')
     source = data.get('source', 'self') # self, parent
 
-    if not amount or amount <= 0:
+    amount_paise = positive_paise(amount)
+    if amount_paise is None:
         return jsonify({'message': 'Invalid amount'}), 400
     
     # Maximum top-up validation (prevent unrealistic balances)
-    if amount > 5000:
+    if amount_paise > 5000 * 100:
         return jsonify({'message': 'Maximum top-up amount is ₹5000'}), 400
 
-    # Use pessimistic locking to prevent race conditions
-    user = User.query.with_for_update().get(user_id)
-    if not user:
+    # Single conditional UPDATE plus ledger row (no read-modify-write)
+    try:
+        transaction, _ = credit(
+            user_id,
+            amount_paise,
+            transaction_type='top-up',
+            description=f'Top-up via {source}',
+            source=source
+        )
+    except UserNotFound:
         return jsonify({'message': 'User not found'}), 404
     
-    print(f"DEBUG: Topup for user {user_id}, initial balance: {user.balance}, amount to add: {amount}")
-    
-    # Update balance
-    user.balance += amount
-
-    # Create transaction record
-    transaction = Transaction(
-        user_id=user_id,
-        amount=amount,
-        transaction_type='top-up',
-        description=f'Top-up via {source}',
-        source=source
-    )
-    db.session.add(transaction)
-    db.session.commit()
-    
-    # Verify wallet consistency after commit
+    # Verify wallet consistency (advances the checkpoint in the same commit)
     from utils.utils import verify_wallet_consistency
     verified_balance = verify_wallet_consistency(user_id)
-    
-    print(f"DEBUG: Topup complete. New balance: {verified_balance}")
+    event = wallet_event(verified_balance, [transaction])
+    db.session.commit()
+    publish_wallet_event(user_id, event)
+    log_event('wallet.topup', user_id=user_id, amount=amount, source=source, balance=verified_balance)
 
     return jsonify({'message': 'Top-up successful', 'new_balance': verified_balance}), 200
 
+@wallet_bp.route('/stream/token', methods=['POST'])
+@require_auth
+def stream_token():
+    # 404 tells the dashboard to poll instead
+    if not current_app.config['WALLET_STREAM_ENABLED']:
+        return jsonify({'message': 'Wallet streaming is disabled'}), 404
+    return jsonify({
+        'token': create_stream_token(request.user['user_id']),
+        'expires_in': current_app.config['STREAM_TOKEN_TTL']
+    }), 200
+
+@wallet_bp.route('/stream', methods=['GET'])
+def stream():
+    # Server-Sent Events: the balance now, then every committed wallet change.
+    # EventSource can't set headers, so it passes a stream token from
+    # POST /wallet/stream/token as ?token= (never the login token)
+    if not current_app.config['WALLET_STREAM_ENABLED']:
+        return jsonify({'message': 'Wallet streaming is disabled'}), 404
+    token = request.args.get('token')
+    if not token:
+        return jsonify({'message': 'Token is missing'}), 401
+    decoded = decode_token(token)
+    if isinstance(decoded, str):
+        return jsonify({'message': decoded}), 401
+    if decoded.get('scope') != STREAM_SCOPE:
+        return jsonify({'message': 'Invalid token'}), 401
+    request.user = decoded
+
+    user = get_current_user()
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    user_id = user.id
+    initial = wallet_event(user.balance, [])
+    keepalive = current_app.config['EVENT_STREAM_KEEPALIVE']
+    broker = get_broker()
+    events = broker.subscribe(user_id)
+
+    # Runs after the request context is gone; it only reads the queue, so a
+    # stream never holds a DB connection
+    def generate():
+        try:
+            yield format_sse(initial)
+            while True:
+                try:
+                    event = events.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(user_id, events)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @wallet_bp.route('/share', methods=['GET'])
 @require_auth
 def share_link():
@@ -72,44 +126,45 @@ def share_link():
 @wallet_bp.route('/projection', methods=['GET'])
 @require_auth
 def get_projection():
-    user_id = request.user['user_id']
-    user = User.query.get(user_id)
-    
-    # Determine next meal slot and cost
-    now = datetime.now()
-    hour = now.hour
-    
-    next_meal_cost = 70 # Default to Lunch
-    if 0 <= hour < 10:
-        next_meal_cost = 30 # Breakfast
-    elif 10 <= hour < 15:
-        next_meal_cost = 70 # Lunch
-    elif 15 <= hour < 21:
-        next_meal_cost = 60 # Dinner
-    else:
-        next_meal_cost = 30 # Late night -> next Breakfast
-        
-    # Calculate suggestion amount based on last 5 deductions
-    last_transactions = Transaction.query.filter_by(user_id=user_id, transaction_type='deduction')\
-                        .order_by(desc(Transaction.timestamp)).limit(5).all()
-    
-    # Account for pending parental top-ups
-    pending_topups = Transaction.query.filter_by(user_id=user_id, status='processing', transaction_type='top-up').all()
-    pending_amount = sum([t.amount for t in pending_topups])
+    user = get_current_user()
+    # Rolling stats are kept up to date by every ledger write: one row, no history scan
+    stat = db.session.get(SpendStat, user.id)
+    slot_costs = get_slot_costs()
+
+    def slot_estimate(slot):
+        # The student's own average for the slot, else the campus-wide one
+        personal = getattr(stat, slot_column(slot)) if stat else None
+        return personal if personal is not None else slot_costs[slot]
 
-    suggestion_amount = 0
-    if last_transactions:
-        avg_cost = sum([t.amount for t in last_transactions]) / len(last_transactions)
+    next_slot = _next_meal_slot(campus_time().hour)
+    next_meal_paise = round(slot_estimate(next_slot))
+    # Summed on each call: a top-up stops counting as soon as it settles
+    pending_paise = db.session.query(db.func.coalesce(db.func.sum(Transaction.amount_paise), 0)).filter(
+        Transaction.user_id == user.id, Transaction.status == 'processing',
+        Transaction.transaction_type == 'top-up'
+    ).scalar()
+    meal_count = stat.deduction_count if stat else 0
+
+    if meal_count:
+        avg_cost = to_rupees(sum(slot_estimate(slot) for slot in MEAL_SLOTS) / len(MEAL_SLOTS))
         # Round to nearest 50
         suggestion_amount = max(100, round(avg_cost / 50) * 50)
     else:
         suggestion_amount = 200 # Baseline suggestion
-        
-    confidence_score = min(0.95, 0.5 + (len(last_transactions) * 0.1))
-    
+
+    confidence_score = min(0.95, 0.5 + (meal_count * 0.1))
+
     return jsonify({
-        "projected_balance": (user.balance + pending_amount) - next_meal_cost,
-        "next_meal_cost": float(next_meal_cost),
+        "projected_balance": to_rupees(user.balance_paise + pending_paise - next_meal_paise),
+        "next_meal_slot": next_slot,
+        "next_meal_cost": to_rupees(next_meal_paise),
+        "slot_costs": {slot: to_rupees(round(slot_estimate(slot))) for slot in MEAL_SLOTS},
         "suggestion_amount": float(suggestion_amount),
         "confidence_score": float(confidence_score)
     }), 200
+
+def _next_meal_slot(hour):
+    # After dinner service closes, the next meal is tomorrow's breakfast
+    if hour >= 21:
+        return 'BREAKFAST'
+    return meal_slot_for_hour(hour)
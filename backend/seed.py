@@ -1,86 +1,342 @@
-from app import create_app
-from models import db, User, Transaction
-from utils.utils import hash_password
+"""
+Seed the database with demo accounts and, optionally, a synthetic campus.
+
+Usage:
+    python seed.py                                   # demo accounts only
+    python seed.py --students 50000 --days 100       # ~10M transactions
+    python seed.py --reset --students 2000 --venues 5 --meals-per-day 0:0.1,1:0.3,2:0.4,3:0.2
+"""
+import argparse
+import bisect
+import itertools
+import math
+import random
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from flask import current_app
+from app import create_app
+from models import db, User, Transaction, SpendStat
+from utils.utils import reconcile_wallets
+from utils.forecast import campus_today, campus_to_utc
+from utils.stats import record_daily_stat, record_spend, slot_column
 
 app = create_app()
 
-def seed():
+# bcrypt hashes of the demo passwords (admin123, vendor123, student123) at the
+# default cost of 12, so seeding never waits on bcrypt. Synthetic accounts
+# share the hash of their role.
+PASSWORD_HASHES = {
+    'admin': '$2b$12$dR/InrVj5nhfY0DKqguReOsEpwa/2UaqA8ZXDuktdPsG3OKDeSrV.',
+    'vendor': '$2b$12$5ZrHcuu4FEx8HwnbK54CSOIKPVBzGzfH3DUe7cKGOq1hITUyw4kjy',
+    'student': '$2b$12$EJo0psjCP9MBgRRQQEsagujZ/s8IAxoF9K4ztz1y/DSouSEFLe1mS',
+}
+
+SYNTHETIC_VENUES = ['Mess 1', 'Mess 2', 'Night Canteen']
+# slot: (serving hour, base price in rupees, relative popularity)
+SYNTHETIC_MEALS = {
+    'Breakfast': (8, 30, 0.5),
+    'Lunch': (13, 70, 0.9),
+    'Dinner': (20, 60, 0.8),
+}
+# Meals a student eats per day: count -> probability
+MEALS_PER_DAY = {0: 0.05, 1: 0.2, 2: 0.5, 3: 0.25}
+TOPUP_AMOUNT = 2000
+TOPUP_BELOW = 200
+
+# transactions and users columns written by the generator, in table order
+LEDGER_COLUMNS = ('user_id', 'amount', 'transaction_type', 'description', 'venue', 'source', 'status',
+                  'skipped', 'timestamp')
+USER_COLUMNS = ('id', 'email', 'password_hash', 'role', 'balance', 'created_at')
+
+def _campus_hour(day, hour=0):
+    # Naive UTC timestamp of an hour on a campus calendar day
+    return campus_to_utc(datetime(day.year, day.month, day.day, hour))
+
+def seed_demo():
+    """
+    Create the three demo accounts and a week of history for the student.
+
+    Returns:
+        bool: False when the demo accounts already exist
+    """
+    if User.query.filter_by(email='admin@test.com').first():
+        return False
+
+    print("Creating users...")
+    admin = User(email='admin@test.com', password_hash=PASSWORD_HASHES['admin'], role='admin', balance=10000.0)
+    vendor = User(email='vendor@test.com', password_hash=PASSWORD_HASHES['vendor'], role='vendor', balance=5000.0)
+    # Balance calculation: ₹2000 (initial top-up) - ₹650 (5x₹70 lunch + 5x₹60 dinner) = ₹1350
+    student = User(email='student@test.com', password_hash=PASSWORD_HASHES['student'], role='student', balance=1350.0)
+    db.session.add_all([admin, vendor, student])
+    db.session.commit()
+
+    print("Creating sample transactions...")
+    # Some mock transactions over the last 7 days, meals at campus lunch and dinner time
+    now = datetime.utcnow()
+    transactions = [Transaction(user_id=student.id, amount=2000, transaction_type='top-up', description='Initial Deposit',
+                                source='parent', timestamp=now - timedelta(days=6))]
+    for i in range(5):
+        day = campus_today() - timedelta(days=i)
+        transactions.append(Transaction(
+            user_id=student.id, amount=-70, transaction_type='deduction', description='Meal: Lunch',
+            venue=SYNTHETIC_VENUES[i % len(SYNTHETIC_VENUES)], timestamp=_campus_hour(day, 13)
+        ))
+        transactions.append(Transaction(
+            user_id=student.id, amount=-60, transaction_type='deduction', description='Meal: Dinner',
+            venue=SYNTHETIC_VENUES[(i + 1) % len(SYNTHETIC_VENUES)], timestamp=_campus_hour(day, 20)
+        ))
+
+    db.session.add_all(transactions)
+    for transaction in sorted(transactions, key=lambda t: t.timestamp):
+        record_daily_stat(transaction)
+        record_spend(transaction)
+    db.session.commit()
+    return True
+
+def venue_names(count):
+    return SYNTHETIC_VENUES[:count] + [f'Canteen {n}' for n in range(len(SYNTHETIC_VENUES) + 1, count + 1)]
+
+def parse_distribution(text):
+    """Parse '0:0.05,1:0.2,2:0.5,3:0.25' into {meals: probability}."""
+    distribution = {}
+    for part in text.split(','):
+        meals, _, weight = part.partition(':')
+        distribution[int(meals)] = float(weight)
+    if not distribution or min(distribution) < 0 or max(distribution) > len(SYNTHETIC_MEALS):
+        raise ValueError(f'Meal counts must be between 0 and {len(SYNTHETIC_MEALS)}')
+    if sum(distribution.values()) <= 0:
+        raise ValueError('Meal probabilities must add up to more than 0')
+    return distribution
+
+def _day_plans(meals_per_day):
+    """
+    Flatten the meals-per-day distribution into (cumulative weights, slot
+    tuples): a day's meal count is drawn from the distribution, then which
+    slots by their popularity. One random draw then picks a whole day.
+    """
+    slots = list(enumerate(SYNTHETIC_MEALS.items()))
+    total = sum(meals_per_day.values())
+    plans, weights = [], []
+    for count, probability in sorted(meals_per_day.items()):
+        combos = list(itertools.combinations(slots, count))
+        popularity = [math.prod(meal[2] for _, (_, meal) in combo) for combo in combos]
+        for combo, weight in zip(combos, popularity):
+            plans.append(tuple((index, name, meal[0]) for index, (name, meal) in combo))
+            weights.append(probability / total * weight / sum(popularity))
+    return list(itertools.accumulate(weights)), plans
+
+def _insert_rows(conn, table, columns, rows):
+    # executemany straight on the driver: at millions of rows Core's per-row
+    # parameter handling costs more than the insert itself. Values must
+    # already be in driver form.
+    compiled = table.insert().compile(dialect=conn.dialect, column_keys=list(columns))
+    if compiled.positional:
+        order = [columns.index(name) for name in compiled.positiontup]
+        if order != list(range(len(columns))):
+            rows = [tuple(row[i] for i in order) for row in rows]
+    else:
+        rows = [dict(zip(columns, row)) for row in rows]
+    conn.exec_driver_sql(str(compiled), rows)
+
+def _driver_value(column, value):
+    process = column.type.bind_processor(db.engine.dialect)
+    return process(value) if process else value
+
+@contextmanager
+def _bulk_load(conn, table, defer_indexes):
+    """
+    Load settings for one connection: SQLite skips fsyncs, and the table's
+    secondary indexes are dropped and rebuilt once at the end, which is far
+    cheaper than maintaining them row by row. If the process dies mid-load,
+    `python migrate.py indexes` recreates them.
+    """
+    sqlite = conn.dialect.name == 'sqlite'
+    if sqlite:
+        synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+    dropped = []
+    if defer_indexes:
+        existing = {ix['name'] for ix in db.inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                index.drop(conn)
+                dropped.append(index)
+        conn.commit()
+    try:
+        yield
+    finally:
+        for index in dropped:
+            index.create(conn)
+        conn.commit()
+        if sqlite:
+            conn.exec_driver_sql(f'PRAGMA synchronous={synchronous}')
+
+def generate_campus(students, days, vendors=0, venues=len(SYNTHETIC_VENUES), meals_per_day=MEALS_PER_DAY,
+                    rng_seed=42, chunk_size=20000, defer_indexes=True, verify=True):
+    """
+    Bulk-generate synthetic students with a meal and top-up history.
+
+    Every wallet is topped up whenever it drops below ₹200, so balances
+    always match the generated ledger. The daily and spend rollups are
+    computed while generating rather than rebuilt from the ledger afterwards.
+    Existing rows are kept; new accounts get ids after the current maximum.
+    Call inside an app context.
+
+    Args:
+        students: Number of students to create
+        days: Days of history, ending today
+        vendors: Number of vendor accounts to create
+        venues: Number of venues meals are served at
+        meals_per_day: {meals eaten in a day: probability}
+        rng_seed: Seed for the generator, so runs are reproducible
+        chunk_size: Students generated and inserted per batch
+        defer_indexes: Rebuild the transactions indexes after the load
+        verify: Reconcile every wallet against its ledger afterwards
+
+    Returns:
+        dict: Accounts and transactions written, plus generated wallets that
+        don't match their ledger when verify is set
+    """
+    rng = random.Random(rng_seed)
+    alpha = current_app.config['SPEND_EWMA_ALPHA']
+    cumulative, plans = _day_plans(meals_per_day)
+    names = venue_names(venues)
+    # Each venue prices every slot a little differently
+    prices = [[100 * max(10, base + (0 if v == 0 else rng.choice((-10, -5, 0, 5, 10))))
+               for _, base, _ in SYNTHETIC_MEALS.values()] for v in range(venues)]
+    descriptions = [f'Meal: {meal}' for meal in SYNTHETIC_MEALS]
+    ewma_columns = [slot_column(meal) for meal in SYNTHETIC_MEALS]
+
+    # Serving hours are campus time; the ledger stores UTC. [day][slot] -> UTC start of service
+    first_day = campus_today() - timedelta(days=days)
+    serving = [[_campus_hour(first_day + timedelta(days=day), hour)
+                for hour, _, _ in SYNTHETIC_MEALS.values()] for day in range(days)]
+    users_table, ledger_table, spend_table = User.__table__, Transaction.__table__, SpendStat.__table__
+    to_timestamp = ledger_table.c.timestamp.type.bind_processor(db.engine.dialect) or (lambda v: v)
+    created_at = _driver_value(users_table.c.created_at, _campus_hour(first_day))
+    not_skipped = _driver_value(ledger_table.c.skipped, False)
+    # The daily rollup is UTC-dated: {UTC date: [venue] -> [count, paise]} for
+    # meals, {UTC date: [count, paise]} for top-ups
+    meal_totals = {}
+    topup_totals = {}
+    written = 0
+
+    with db.engine.connect() as conn:
+        next_id = first_id = (conn.execute(db.select(db.func.max(users_table.c.id))).scalar() or 0) + 1
+        accounts = [(next_id + n, f'vendor{next_id + n}@campus.test', PASSWORD_HASHES['vendor'], 'vendor', 0, created_at)
+                    for n in range(vendors)]
+        if accounts:
+            _insert_rows(conn, users_table, USER_COLUMNS, accounts)
+            conn.commit()
+        next_id += vendors
+
+        with _bulk_load(conn, ledger_table, defer_indexes):
+            for offset in range(0, students, chunk_size):
+                users, ledger, spend = [], [], []
+                for user_id in range(next_id + offset, next_id + min(offset + chunk_size, students)):
+                    balance = 0
+                    ewma = [None] * len(SYNTHETIC_MEALS)
+                    meals = 0
+                    for day in range(days):
+                        for slot, meal, hour in plans[bisect.bisect(cumulative, rng.random() * cumulative[-1])]:
+                            venue = rng.randrange(venues)
+                            price = prices[venue][slot]
+                            timestamp = serving[day][slot] + timedelta(seconds=rng.randrange(3600))
+                            if balance < max(TOPUP_BELOW * 100, price):
+                                balance += TOPUP_AMOUNT * 100
+                                topped_up_at = timestamp - timedelta(hours=1)
+                                ledger.append((user_id, TOPUP_AMOUNT * 100, 'top-up', 'Top-up via parent', None,
+                                               'parent', 'success', not_skipped, to_timestamp(topped_up_at)))
+                                totals = topup_totals.setdefault(topped_up_at.date(), [0, 0])
+                                totals[0] += 1
+                                totals[1] += TOPUP_AMOUNT * 100
+                            balance -= price
+                            ledger.append((user_id, -price, 'deduction', descriptions[slot], names[venue],
+                                           None, 'success', not_skipped, to_timestamp(timestamp)))
+                            day_totals = meal_totals.get(timestamp.date())
+                            if day_totals is None:
+                                day_totals = meal_totals[timestamp.date()] = [[0, 0] for _ in range(venues)]
+                            totals = day_totals[venue]
+                            totals[0] += 1
+                            totals[1] -= price
+                            previous = ewma[slot]
+                            ewma[slot] = float(price) if previous is None else previous + alpha * (price - previous)
+                            meals += 1
+                    users.append((user_id, f'student{user_id}@campus.test', PASSWORD_HASHES['student'], 'student',
+                                  balance, created_at))
+                    if meals:
+                        spend.append(dict(zip(ewma_columns, ewma), user_id=user_id, deduction_count=meals))
+
+                _insert_rows(conn, users_table, USER_COLUMNS, users)
+                if ledger:
+                    _insert_rows(conn, ledger_table, LEDGER_COLUMNS, ledger)
+                if spend:
+                    conn.execute(spend_table.insert(), spend)
+                conn.commit()
+                written += len(ledger)
+
+    for stat_date, (count, amount) in sorted(topup_totals.items()):
+        record_daily_stat(Transaction(transaction_type='top-up', source='parent', amount_paise=amount,
+                                      timestamp=datetime.combine(stat_date, datetime.min.time())), tx_count=count)
+    for stat_date, day_totals in sorted(meal_totals.items()):
+        timestamp = datetime.combine(stat_date, datetime.min.time())
+        for venue, (count, amount) in enumerate(day_totals):
+            if count:
+                record_daily_stat(Transaction(transaction_type='deduction', venue=names[venue], amount_paise=amount,
+                                              timestamp=timestamp), tx_count=count)
+    db.session.commit()
+
+    report = {'students': students, 'vendors': vendors, 'transactions': written}
+    if verify:
+        # Only generated wallets count; the demo admin and vendor hold balances with no ledger
+        mismatches = reconcile_wallets(fix=False)['mismatches']
+        report['mismatches'] = sum(1 for m in mismatches if m['user_id'] >= first_id)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables first')
+    parser.add_argument('--students', type=int, default=0, help='synthetic students to generate')
+    parser.add_argument('--vendors', type=int, default=0, help='synthetic vendor accounts to create')
+    parser.add_argument('--venues', type=int, default=len(SYNTHETIC_VENUES), help='venues meals are served at')
+    parser.add_argument('--days', type=int, default=30, help='days of history per student')
+    parser.add_argument('--meals-per-day', type=parse_distribution, default=MEALS_PER_DAY,
+                        help="distribution of meals per day, e.g. '0:0.05,1:0.2,2:0.5,3:0.25'")
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed, so runs are reproducible')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='students inserted per commit')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='maintain transactions indexes during the load instead of rebuilding them after')
+    parser.add_argument('--skip-verify', action='store_true', help='skip reconciling wallets against the ledger')
+    args = parser.parse_args(argv)
+
     with app.app_context():
-        # Clean start
-        db.drop_all()
+        if args.reset:
+            db.drop_all()
         db.create_all()
 
-        print("Creating users...")
-        # Create Admin
-        admin = User(
-            email="admin@test.com",
-            password_hash=hash_password("admin123"),
-            role="admin",
-            balance=10000.0
-        )
-        db.session.add(admin)
-
-        # Create Vendor
-        vendor = User(
-            email="vendor@test.com",
-            password_hash=hash_password("vendor123"),
-            role="vendor",
-            balance=5000.0
-        )
-        db.session.add(vendor)
-
-        # Create Student
-        # Balance calculation: ₹2000 (initial top-up) - ₹650 (5x₹70 lunch + 5x₹60 dinner) = ₹1350
-        student = User(
-            email="student@test.com",
-            password_hash=hash_password("student123"),
-            role="student",
-            balance=1350.0  # Correct balance matching transaction ledger
-        )
-        db.session.add(student)
-        db.session.commit()
-
-        print("Creating sample transactions...")
-        # Create some mock transactions over the last 7 days
-        now = datetime.utcnow()
-        transactions = []
-        
-        # Top-ups
-        transactions.append(Transaction(user_id=student.id, amount=2000, transaction_type='top-up', description='Initial Deposit', source='parent', timestamp=now - timedelta(days=6)))
-        
-        # Deductions
-        venues = ['Mess 1', 'Mess 2', 'Night Canteen']
-        for i in range(5):
-            day = now - timedelta(days=i)
-            # Deduction 1 (Lunch)
-            transactions.append(Transaction(
-                user_id=student.id, 
-                amount=-70, 
-                transaction_type='deduction', 
-                description='Meal: Lunch', 
-                venue=venues[i % len(venues)],
-                timestamp=day.replace(hour=13, minute=0, second=0)
-            ))
-            # Deduction 2 (Dinner)
-            transactions.append(Transaction(
-                user_id=student.id, 
-                amount=-60, 
-                transaction_type='deduction', 
-                description='Meal: Dinner', 
-                venue=venues[(i+1) % len(venues)],
-                timestamp=day.replace(hour=20, minute=0, second=0)
-            ))
-
-        db.session.add_all(transactions)
-        db.session.commit()
-
-        print("\nDatabase seeded successfully!")
-        print("-" * 30)
-        print("Admin:   admin@test.com   / admin123")
-        print("Vendor:  vendor@test.com  / vendor123")
-        print("Student: student@test.com / student123")
-        print("-" * 30)
+        if seed_demo():
+            print("\nDatabase seeded successfully!")
+            print("-" * 30)
+            print("Admin:   admin@test.com   / admin123")
+            print("Vendor:  vendor@test.com  / vendor123")
+            print("Student: student@test.com / student123")
+            print("-" * 30)
+        else:
+            print("Demo accounts already exist, skipping (use --reset to start over)")
+
+        if args.students or args.vendors:
+            print(f"Generating {args.students} students over {args.days} days...")
+            began = time.perf_counter()
+            report = generate_campus(
+                args.students, args.days, vendors=args.vendors, venues=args.venues,
+                meals_per_day=args.meals_per_day, rng_seed=args.seed, chunk_size=args.chunk_size,
+                defer_indexes=not args.keep_indexes, verify=not args.skip_verify
+            )
+            print(f"Wrote {report['transactions']} transactions for {report['students']} students "
+                  f"in {time.perf_counter() - began:.1f}s")
+            if report.get('mismatches'):
+                print(f"⚠️  {report['mismatches']} wallet(s) don't match their ledger")
 
 if __name__ == '__main__':
-    seed()
+    main()
@@ -0,0 +1,6 @@
+import os
+
+# app.py (and seed.py) build a module-level app on import; keep it, and any
+# test that doesn't pick its own database, off the developer's campuseats.db
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['READ_DATABASE_URL'] = ''
@@ -0,0 +1,86 @@
+import unittest
+import time
+from datetime import datetime
+from app import create_app
+from models import db, User, DailyStat
+from utils.utils import create_token
+from utils.qr import encode_qr_token
+from utils.stats import rebuild_daily_stats
+
+class AdminReportsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=0)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            admin = User(email=f"admin_{self._testMethodName}@test.com", password_hash='hash', role='admin')
+            db.session.add_all([student, vendor, admin])
+            db.session.commit()
+
+            self.student_id = student.id
+            self.vendor_id = vendor.id
+            self.admin_id = admin.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_headers(self, user_id, role):
+        with self.app.app_context():
+            token = create_token(user_id, role)
+            return {'Authorization': f'Bearer {token}'}
+
+    def make_payments(self):
+        self.client.post('/wallet/topup', json={'amount': 500, 'source': 'parent'},
+                         headers=self.get_headers(self.student_id, 'student'))
+        self.client.post('/meal/deduct',
+                         json={'qr_payload': encode_qr_token(self.student_id, time.time() + 300, self.app.config['QR_SECRET_KEY']),
+                               'meal_cost': 70, 'venue': 'Mess 1'},
+                         headers=self.get_headers(self.vendor_id, 'vendor'))
+        self.client.post('/admin/refund', json={'user_id': self.student_id, 'amount': 20},
+                         headers=self.get_headers(self.admin_id, 'admin'))
+
+    def get_reports(self):
+        res = self.client.get('/admin/reports', headers=self.get_headers(self.admin_id, 'admin'))
+        self.assertEqual(res.status_code, 200)
+        return res.get_json()
+
+    def test_reports_read_incremental_rollup(self):
+        self.make_payments()
+        data = self.get_reports()
+
+        self.assertEqual(data['total_transactions'], 3)
+        self.assertEqual(data['total_volume'], 450)
+        self.assertEqual(data['venue_report'], {'Mess 1': 1})
+        self.assertEqual(data['source_report'], {'parent': 1})
+        self.assertEqual(data['growth_trend'], [{'date': datetime.utcnow().date().isoformat(), 'volume': 450}])
+        self.assertEqual(data['entity_distribution'], {'student': 1, 'vendor': 1, 'admin': 1})
+        self.assertEqual(data['active_users'], 1)
+
+    def test_rebuild_matches_incremental(self):
+        self.make_payments()
+        before = self.get_reports()
+
+        with self.app.app_context():
+            DailyStat.query.delete()
+            db.session.commit()
+            self.assertEqual(rebuild_daily_stats(), 3)
+
+        self.assertEqual(self.get_reports(), before)
+
+    def test_refund_below_one_paisa_rejected(self):
+        res = self.client.post('/admin/refund', json={'user_id': self.student_id, 'amount': 0.001},
+                               headers=self.get_headers(self.admin_id, 'admin'))
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.get_reports()['total_transactions'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import json
+from datetime import datetime, timedelta
+from app import create_app
+from models import db, User, Transaction, ArchivedTransaction, DailyStat, QrRedemption, WalletCheckpoint
+from utils.archive import archive_term, OPENING_BALANCE
+from utils.stats import rebuild_daily_stats
+from utils.utils import create_token, verify_wallet_consistency, reconcile_wallets
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        now = datetime.utcnow()
+        self.cutoff = now - timedelta(days=30)
+        with self.app.app_context():
+            db.create_all()
+            student = User(email='archive@test.com', password_hash='hash', role='student', balance=1370)
+            db.session.add(student)
+            db.session.commit()
+            rows = [
+                (1000, 'top-up', 'success', now - timedelta(days=60)),
+                (-70, 'deduction', 'success', now - timedelta(days=50)),
+                # Still settling: stays hot however old it is
+                (500, 'top-up', 'processing', now - timedelta(days=45)),
+                (-60, 'deduction', 'success', now - timedelta(days=10)),
+            ]
+            for amount, tx_type, status, ts in rows:
+                db.session.add(Transaction(user_id=student.id, amount=amount, transaction_type=tx_type,
+                                           status=status, venue='Mess 1' if amount < 0 else None, timestamp=ts))
+            db.session.commit()
+            old_meal = Transaction.query.filter_by(amount_paise=-7000).one()
+            db.session.add(QrRedemption(qr_hash='a' * 16, user_id=student.id, transaction_id=old_meal.id))
+            rebuild_daily_stats()
+            verify_wallet_consistency(student.id)
+            db.session.commit()
+            self.student_id = student.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def headers(self):
+        with self.app.app_context():
+            return {'Authorization': f"Bearer {create_token(self.student_id, 'student')}"}
+
+    def amounts(self, url):
+        return [t['amount'] for t in self.client.get(url, headers=self.headers()).get_json()]
+
+    def test_archive_carries_balance_forward(self):
+        with self.app.app_context():
+            daily = sorted((s.stat_date, s.transaction_type, s.tx_count, s.amount_sum_paise) for s in DailyStat.query)
+            self.assertEqual(archive_term('2025-odd', self.cutoff), {'users': 1, 'archived': 2})
+
+            hot = Transaction.query.filter_by(user_id=self.student_id).order_by(Transaction.timestamp).all()
+            self.assertEqual([(t.transaction_type, t.amount) for t in hot],
+                             [('top-up', 500), (OPENING_BALANCE, 930), ('deduction', -60)])
+            self.assertEqual(ArchivedTransaction.query.filter_by(term='2025-odd').count(), 2)
+            self.assertEqual(QrRedemption.query.count(), 0)
+            self.assertIsNone(db.session.get(WalletCheckpoint, self.student_id))
+
+            # The hot set alone still adds up to the balance
+            self.assertEqual(verify_wallet_consistency(self.student_id), 1370)
+            self.assertEqual(reconcile_wallets()['mismatches'], [])
+
+            # Rebuilding the rollup reads the archive and skips the carry-forward
+            rebuild_daily_stats()
+            self.assertEqual(daily, sorted((s.stat_date, s.transaction_type, s.tx_count, s.amount_sum_paise)
+                                           for s in DailyStat.query))
+
+    def test_later_term_folds_previous_opening_balance(self):
+        with self.app.app_context():
+            archive_term('2025-odd', self.cutoff)
+            with self.assertRaises(ValueError):
+                archive_term('2025-even', self.cutoff - timedelta(days=1))
+            with self.assertRaises(ValueError):
+                archive_term('2025-odd', self.cutoff + timedelta(days=1))
+
+            report = archive_term('2025-even', self.cutoff + timedelta(days=25))
+            self.assertEqual(report, {'users': 1, 'archived': 1})
+            carried = Transaction.query.filter_by(transaction_type=OPENING_BALANCE).all()
+            self.assertEqual([t.amount for t in carried], [870])
+            self.assertEqual(verify_wallet_consistency(self.student_id), 1370)
+
+    def test_listing_pages_into_archive(self):
+        before = self.amounts('/transactions')
+        with self.app.app_context():
+            archive_term('2025-odd', self.cutoff)
+
+        self.assertEqual(before, [-60, 500, -70, 1000])
+        self.assertEqual(self.amounts('/transactions'), before)
+
+        amounts = []
+        url = '/transactions?limit=1'
+        while url:
+            res = self.client.get(url, headers=self.headers())
+            amounts.extend(t['amount'] for t in res.get_json())
+            cursor = res.headers.get('X-Next-Cursor')
+            url = f'/transactions?limit=1&before={cursor}' if cursor else None
+        self.assertEqual(amounts, before)
+
+        res = self.client.get('/transactions?format=ndjson', headers=self.headers())
+        rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['amount'] for r in rows], before)
+        self.assertEqual([r.get('term') for r in rows], [None, None, '2025-odd', '2025-odd'])
+
+        self.assertEqual(self.amounts('/transactions?type=deduction'), [-60, -70])
+
+    def test_ids_stay_unique_across_terms(self):
+        with self.app.app_context():
+            archive_term('2025-odd', self.cutoff)
+        self.client.post('/wallet/topup', json={'amount': 10}, headers=self.headers())
+        with self.app.app_context():
+            # Archives the newest rows too: only the processing top-up stays behind
+            self.assertEqual(archive_term('2025-even', datetime.utcnow()), {'users': 1, 'archived': 2})
+        self.client.post('/wallet/topup', json={'amount': 20}, headers=self.headers())
+
+        with self.app.app_context():
+            # New rows never take an id that is already in the archive
+            hot = {i for (i,) in db.session.query(Transaction.id)}
+            archived = {i for (i,) in db.session.query(ArchivedTransaction.id)}
+            self.assertEqual(hot & archived, set())
+
+        ids, amounts = [], []
+        url = '/transactions?limit=1'
+        while url:
+            res = self.client.get(url, headers=self.headers())
+            ids.extend(t['id'] for t in res.get_json())
+            amounts.extend(t['amount'] for t in res.get_json())
+            cursor = res.headers.get('X-Next-Cursor')
+            url = f'/transactions?limit=1&before={cursor}' if cursor else None
+        self.assertEqual(amounts, [20, 10, -60, 500, -70, 1000])
+        self.assertEqual(len(set(ids)), len(ids))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from app import create_app
+from asgi import create_asgi_app
+from models import db, User
+from utils.utils import create_token
+
+async def call(app, method, path, body=b'', headers=()):
+    """Drive one HTTP request through an ASGI app; returns (status, headers, body)."""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    done = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'root_path': '', 'query_string': b'',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 5000), 'server': ('testserver', 80),
+    }
+    await app(scope, receive, send)
+    done.set()
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+class AsgiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key',
+            'ASGI_THREADS': 2
+        })
+        with self.app.app_context():
+            db.create_all()
+            student = User(email='asgi@test.com', password_hash='hash', role='student', balance=0)
+            db.session.add(student)
+            db.session.commit()
+            self.headers = [('Authorization', f"Bearer {create_token(student.id, 'student')}"),
+                            ('Content-Type', 'application/json')]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_views_run_on_asgi_threads_pool(self):
+        threads = set()
+
+        def slow():
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return 'ok'
+
+        self.app.add_url_rule('/slow', 'slow', slow)
+        asgi_app = create_asgi_app(self.app)
+
+        async def burst():
+            return await asyncio.gather(*(call(asgi_app, 'GET', '/slow') for _ in range(8)))
+
+        results = asyncio.run(burst())
+        self.assertEqual([status for status, _, _ in results], [200] * 8)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_request_body_and_response(self):
+        asgi_app = create_asgi_app(self.app)
+        status, headers, body = asyncio.run(
+            call(asgi_app, 'POST', '/wallet/topup', b'{"amount": 25}', self.headers))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertEqual(json.loads(body)['new_balance'], 25)
+
+if __name__ == '__main__':
+    unittest.main()
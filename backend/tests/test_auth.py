@@ -0,0 +1,68 @@
+import unittest
+import threading
+import time
+from app import create_app
+from models import db, User
+from utils import passwords
+
+class AuthTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key',
+            'BCRYPT_ROUNDS': 4
+        })
+        self.client = self.app.test_client()
+        self.email = f"{self._testMethodName}@test.com"
+
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def register(self):
+        return self.client.post('/auth/register', json={'email': self.email, 'password': 'secret123'})
+
+    def login(self):
+        return self.client.post('/auth/login', json={'email': self.email, 'password': 'secret123'})
+
+    def stored_hash(self):
+        with self.app.app_context():
+            return User.query.filter_by(email=self.email).one().password_hash
+
+    def test_register_and_login_through_pool(self):
+        self.app.config['WORKER_PROFILE'] = 'gevent'
+        self.assertEqual(self.register().status_code, 201)
+        self.assertTrue(self.stored_hash().startswith('$2b$04$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_login_rehashes_on_cost_change(self):
+        self.register()
+        self.app.config['BCRYPT_ROUNDS'] = 5
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(self.stored_hash().startswith('$2b$05$'))
+
+    def test_full_queue_returns_429(self):
+        # One slot, held by a slow registration on another thread
+        self.app.config.update(WORKER_PROFILE='gevent', BCRYPT_POOL_SIZE=1, BCRYPT_QUEUE_SIZE=1, BCRYPT_ROUNDS=15)
+        slow = threading.Thread(target=self.client.post, args=('/auth/register',),
+                                kwargs={'json': {'email': 'slow@test.com', 'password': 'secret123'}})
+        slow.start()
+        time.sleep(0.5)
+        res = self.register()
+        slow.join()
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res.headers['Retry-After'], '1')
+
+    def test_sync_workers_hash_inline(self):
+        self.app.config.update(BCRYPT_POOL_SIZE=1, BCRYPT_QUEUE_SIZE=1)
+        with self.app.test_request_context():
+            self.assertFalse(passwords._offloaded())
+        self.assertEqual(self.register().status_code, 201)
+
+if __name__ == '__main__':
+    unittest.main()
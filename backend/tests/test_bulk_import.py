@@ -0,0 +1,167 @@
+import io
+import json
+import unittest
+from unittest import mock
+from app import create_app
+from models import db, User, Transaction, DailyStat
+from utils import bulk_import
+from utils.passwords import check_password, hash_passwords
+from utils.utils import create_token
+
+class BulkImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key',
+            'BCRYPT_ROUNDS': 4,
+            'BCRYPT_POOL_SIZE': 0
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email='existing@test.com', password_hash='hash', role='student', balance=0)
+            admin = User(email='admin@test.com', password_hash='hash', role='admin')
+            db.session.add_all([student, admin])
+            db.session.commit()
+            self.student_id = student.id
+            self.headers = {'Authorization': f"Bearer {create_token(admin.id, 'admin')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def upload(self, url, content, filename):
+        return self.client.post(url, headers=self.headers, content_type='multipart/form-data',
+                                data={'file': (io.BytesIO(content.encode()), filename)})
+
+    def test_bulk_users_reports_bad_rows(self):
+        csv_file = (
+            "email,password,role\n"
+            "new1@test.com,pw1,student\n"
+            "new2@test.com,pw2,\n"
+            "existing@test.com,pw3,student\n"
+            "new1@test.com,pw4,student\n"
+            "not-an-email,pw5,student\n"
+            "new3@test.com,pw6,chef\n"
+        )
+        report = self.upload('/admin/bulk/users', csv_file, 'cohort.csv').get_json()
+
+        self.assertEqual(report['processed'], 6)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([(e['line'], e['message']) for e in report['errors']], [
+            (4, 'User already exists'),
+            (5, 'Duplicate email in file'),
+            (6, 'Invalid email'),
+            (7, 'Unknown role chef'),
+        ])
+        with self.app.app_context():
+            user = User.query.filter_by(email='new2@test.com').one()
+            self.assertEqual(user.role, 'student')
+            self.assertTrue(check_password('pw2', user.password_hash))
+
+    def test_bulk_topups_credit_wallets_and_ledger(self):
+        rows = [
+            {'email': 'existing@test.com', 'amount': 250, 'reference': 'NEFT-1'},
+            {'user_id': self.student_id, 'amount': '100.50'},
+            {'email': 'ghost@test.com', 'amount': 100},
+            {'email': 'existing@test.com', 'amount': -5},
+            {'email': 'existing@test.com', 'amount': 9000},
+        ]
+        body = '\n'.join(json.dumps(r) for r in rows) + '\nnot json\n'
+        res = self.client.post('/admin/bulk/topups', data=body, headers=self.headers,
+                               content_type='application/x-ndjson')
+        report = res.get_json()
+
+        self.assertEqual(report['credited'], 2)
+        self.assertEqual(report['total_amount'], 350.5)
+        self.assertEqual([e['line'] for e in report['errors']], [3, 4, 5, 6])
+        with self.app.app_context():
+            self.assertEqual(db.session.get(User, self.student_id).balance, 350.5)
+            self.assertEqual(Transaction.query.filter_by(user_id=self.student_id).count(), 2)
+            stat = DailyStat.query.filter_by(transaction_type='top-up', source='parent').one()
+            self.assertEqual((stat.tx_count, stat.amount_sum_paise), (2, 35050))
+
+        reconcile = self.client.post('/admin/reconcile', headers=self.headers).get_json()
+        self.assertEqual(reconcile['mismatches'], [])
+
+    def test_concurrent_registration_is_a_row_error(self):
+        def register_then_hash(passwords):
+            # Someone signs up with a row's email while the chunk is hashing
+            db.session.add(User(email='race@test.com', password_hash='hash', role='student'))
+            db.session.commit()
+            return hash_passwords(passwords)
+
+        csv_file = "email,password\nfirst@test.com,pw\nrace@test.com,pw\nlast@test.com,pw\n"
+        with mock.patch.object(bulk_import, 'hash_passwords', side_effect=register_then_hash):
+            res = self.upload('/admin/bulk/users', csv_file, 'cohort.csv')
+        self.assertEqual(res.status_code, 200)
+        report = res.get_json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['errors'], [{'line': 3, 'email': 'race@test.com', 'message': 'User already exists'}])
+        with self.app.app_context():
+            self.assertEqual(User.query.filter_by(email='race@test.com').one().password_hash, 'hash')
+            self.assertEqual(User.query.filter(User.email.in_(['first@test.com', 'last@test.com'])).count(), 2)
+
+    def test_bulk_topups_publish_one_event_per_wallet(self):
+        self.app.config['WALLET_STREAM_ENABLED'] = True
+        body = "email,amount\nexisting@test.com,10\nexisting@test.com,15\nadmin@test.com,5\n"
+        with mock.patch.object(bulk_import, 'publish_wallet_event') as publish:
+            self.upload('/admin/bulk/topups', body, 'transfers.csv')
+
+        events = {call.args[0]: call.args[1] for call in publish.call_args_list}
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(events[self.student_id]['balance'], 25)
+        self.assertEqual([t['amount'] for t in events[self.student_id]['transactions']], [10, 15])
+        with self.app.app_context():
+            ids = [t.id for t in Transaction.query.filter_by(user_id=self.student_id).order_by(Transaction.id)]
+        self.assertEqual([t['id'] for t in events[self.student_id]['transactions']], ids)
+
+    def test_mistyped_ndjson_values_are_row_errors(self):
+        users = [
+            {'email': 5, 'password': 'pw'},
+            {'email': 'typed@test.com', 'password': 123456},
+            {'email': 'ok@test.com', 'password': 'pw'},
+        ]
+        res = self.client.post('/admin/bulk/users', data='\n'.join(json.dumps(r) for r in users),
+                               headers=self.headers, content_type='application/x-ndjson')
+        self.assertEqual(res.status_code, 200)
+        report = res.get_json()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([(e['line'], e['message']) for e in report['errors']],
+                         [(1, 'Invalid email'), (2, 'Invalid password')])
+
+        topups = [
+            {'email': ['x'], 'amount': 10},
+            {'user_id': [self.student_id], 'amount': 10},
+            {'user_id': 10 ** 30, 'amount': 10},
+            {'email': 'existing@test.com', 'amount': 10, 'source': {'bank': 'x'}},
+            {'user_id': str(self.student_id), 'amount': 10},
+        ]
+        res = self.client.post('/admin/bulk/topups', data='\n'.join(json.dumps(r) for r in topups),
+                               headers=self.headers, content_type='application/x-ndjson')
+        self.assertEqual(res.status_code, 200)
+        report = res.get_json()
+        self.assertEqual(report['credited'], 1)
+        self.assertEqual([(e['line'], e['message']) for e in report['errors']], [
+            (1, 'Invalid email'), (2, 'Invalid user_id'), (3, 'Invalid user_id'), (4, 'Invalid source')
+        ])
+
+    def test_bulk_users_capped_to_fit_a_request(self):
+        self.app.config['BULK_IMPORT_USERS_MAX_ROWS'] = 2
+        csv_file = "email,password\n" + "".join(f"cap{i}@test.com,pw\n" for i in range(3))
+        report = self.upload('/admin/bulk/users', csv_file, 'cohort.csv').get_json()
+        self.assertEqual(report['created'], 2)
+        self.assertIn('bulk_import.py', report['errors'][0]['message'])
+
+    def test_upload_row_limit(self):
+        self.app.config['BULK_IMPORT_MAX_ROWS'] = 2
+        csv_file = "email,amount\n" + "existing@test.com,10\n" * 3
+        report = self.upload('/admin/bulk/topups', csv_file, 'transfers.csv').get_json()
+        self.assertEqual(report['credited'], 2)
+        self.assertIn('Row limit of 2 reached', report['errors'][0]['message'])
+
+if __name__ == '__main__':
+    unittest.main()
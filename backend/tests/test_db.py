@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import create_app
+from models import db, User
+from utils.utils import create_token
+
+class EngineProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        # WAL and the read-only engine need a real file
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'campuseats.db')}",
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            admin = User(email=f"admin_{self._testMethodName}@test.com", password_hash='hash', role='admin')
+            db.session.add(admin)
+            db.session.commit()
+            self.admin_id = admin.id
+            self.headers = {'Authorization': f"Bearer {create_token(admin.id, 'admin')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_sqlite_pragmas_applied(self):
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+                self.assertEqual(conn.exec_driver_sql('PRAGMA synchronous').scalar(), 1) # NORMAL
+                self.assertEqual(conn.exec_driver_sql('PRAGMA busy_timeout').scalar(),
+                                 self.app.config['SQLITE_PRAGMAS']['busy_timeout'])
+
+    def test_read_engine_rejects_writes(self):
+        with self.app.app_context():
+            with db.engines['read'].connect() as conn:
+                self.assertEqual(conn.exec_driver_sql('SELECT count(*) FROM users').scalar(), 1)
+                with self.assertRaises(Exception):
+                    conn.exec_driver_sql("UPDATE users SET balance = 0")
+
+    @contextmanager
+    def recorded_statements(self):
+        statements = {'primary': [], 'read': []}
+        with self.app.app_context():
+            engines = {'primary': db.engine, 'read': db.engines['read']}
+
+        def recorder(key):
+            def record(conn, cursor, statement, *args):
+                statements[key].append(statement)
+            return record
+
+        listeners = [(engines[key], recorder(key)) for key in statements]
+        for engine, fn in listeners:
+            event.listen(engine, 'before_cursor_execute', fn)
+        try:
+            yield statements
+        finally:
+            for engine, fn in listeners:
+                event.remove(engine, 'before_cursor_execute', fn)
+
+    def test_listing_reads_from_read_engine(self):
+        with self.recorded_statements() as statements:
+            res = self.client.get('/admin/users', headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()), 1)
+        self.assertGreater(len(statements['read']), 0)
+        self.assertEqual(statements['primary'], [])
+
+    def test_same_file_read_engine_skips_read_your_writes(self):
+        # The read-only handle on the primary's own file never lags
+        with self.recorded_statements() as statements:
+            self.assertEqual(self.client.post('/wallet/topup', json={'amount': 100}, headers=self.headers).status_code, 200)
+            self.assertEqual(self.client.get('/transactions', headers=self.headers).status_code, 200)
+
+        self.assertGreater(len(statements['read']), 0)
+        self.assertEqual([s for key in statements for s in statements[key] if 'recent_writes' in s], [])
+
+if __name__ == '__main__':
+    unittest.main()
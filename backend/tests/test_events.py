@@ -0,0 +1,137 @@
+import json
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from app import create_app
+from models import db, User, Transaction, WalletEvent
+from utils.events import DatabaseBroker, get_broker
+from utils.utils import create_token
+from utils.qr import encode_qr_token
+
+class WalletStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key',
+            'WALLET_STREAM_ENABLED': True,
+            'WORKER_PROFILE': 'gevent'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=100)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            admin = User(email=f"admin_{self._testMethodName}@test.com", password_hash='hash', role='admin')
+            db.session.add_all([student, vendor, admin])
+            db.session.commit()
+            db.session.add(Transaction(user_id=student.id, amount=100, transaction_type='top-up', source='self'))
+            db.session.commit()
+
+            self.student_id = student.id
+            self.student_token = create_token(student.id, 'student')
+            self.vendor_headers = {'Authorization': f"Bearer {create_token(vendor.id, 'vendor')}"}
+            self.admin_headers = {'Authorization': f"Bearer {create_token(admin.id, 'admin')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def stream_token(self):
+        res = self.client.post('/wallet/stream/token', headers={'Authorization': f'Bearer {self.student_token}'})
+        self.assertEqual(res.status_code, 200)
+        return res.get_json()['token']
+
+    def open_stream(self):
+        res = self.client.get(f'/wallet/stream?token={self.stream_token()}', buffered=False)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'text/event-stream')
+        return res, iter(res.response)
+
+    def next_event(self, chunks):
+        chunk = next(chunks).decode()
+        name, data = chunk.strip().split('\n')
+        self.assertEqual(name, 'event: wallet')
+        return json.loads(data[len('data: '):])
+
+    def test_stream_requires_token(self):
+        self.assertEqual(self.client.get('/wallet/stream').status_code, 401)
+        self.assertEqual(self.client.get('/wallet/stream?token=bogus').status_code, 401)
+
+    def test_stream_token_is_stream_only(self):
+        # The login token never goes in a URL, and a stream token opens nothing else
+        self.assertEqual(self.client.get(f'/wallet/stream?token={self.student_token}').status_code, 401)
+        res = self.client.get('/wallet/balance', headers={'Authorization': f'Bearer {self.stream_token()}'})
+        self.assertEqual(res.status_code, 401)
+
+    def test_stream_disabled_or_misconfigured(self):
+        self.app.config['WALLET_STREAM_ENABLED'] = False
+        res = self.client.post('/wallet/stream/token', headers={'Authorization': f'Bearer {self.student_token}'})
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(self.client.get('/wallet/stream?token=bogus').status_code, 404)
+
+        enabled = {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'WALLET_STREAM_ENABLED': True}
+        with self.assertRaises(ValueError):
+            create_app({**enabled, 'WORKER_PROFILE': 'sync'})
+        with self.assertRaises(ValueError):
+            create_app({**enabled, 'WORKER_PROFILE': 'gevent', 'WEB_CONCURRENCY': 4})
+        create_app({**enabled, 'WORKER_PROFILE': 'gevent', 'WEB_CONCURRENCY': 4, 'EVENT_BROKER': 'database'})
+
+    def test_stream_pushes_topup_deduction_and_refund(self):
+        res, chunks = self.open_stream()
+        self.assertEqual(self.next_event(chunks), {'balance': 100, 'transactions': []})
+
+        self.client.post('/wallet/topup', json={'amount': 50},
+                         headers={'Authorization': f'Bearer {self.student_token}'})
+        event = self.next_event(chunks)
+        self.assertEqual(event['balance'], 150)
+        self.assertEqual([t['amount'] for t in event['transactions']], [50])
+
+        payload = encode_qr_token(self.student_id, time.time() + 300, self.app.config['QR_SECRET_KEY'])
+        self.client.post('/meal/deduct', json={'qr_payload': payload, 'meal_cost': 30}, headers=self.vendor_headers)
+        event = self.next_event(chunks)
+        self.assertEqual(event['balance'], 120)
+        self.assertEqual(event['transactions'][0]['transaction_type'], 'deduction')
+
+        self.client.post('/admin/refund', json={'user_id': self.student_id, 'amount': 10}, headers=self.admin_headers)
+        self.assertEqual(self.next_event(chunks)['balance'], 130)
+
+        res.close()
+        with self.app.app_context():
+            self.assertEqual(get_broker().subscriber_count(), 0)
+
+    def test_database_broker_relays_between_workers(self):
+        # Two brokers on one database stand in for two gunicorn workers
+        publisher, listener = DatabaseBroker(self.app), DatabaseBroker(self.app)
+        try:
+            with self.app.app_context():
+                events = listener.subscribe(self.student_id)
+                publisher.publish(self.student_id + 1000, {'balance': 1, 'transactions': []})
+                publisher.publish(self.student_id, {'balance': 42, 'transactions': []})
+
+            self.assertEqual(events.get(timeout=5), {'balance': 42, 'transactions': []})
+            self.assertTrue(events.empty())
+        finally:
+            listener.close()
+
+    def test_failed_publish_keeps_the_payment(self):
+        with mock.patch.object(self.app.extensions['wallet_events'], 'publish', side_effect=RuntimeError('locked')):
+            res = self.client.post('/wallet/topup', json={'amount': 50},
+                                   headers={'Authorization': f'Bearer {self.student_token}'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['new_balance'], 150)
+
+    def test_database_broker_prunes_without_listeners(self):
+        publisher = DatabaseBroker(self.app)
+        with self.app.app_context():
+            db.session.add(WalletEvent(user_id=self.student_id, payload='{}',
+                                       created_at=datetime.utcnow() - timedelta(hours=1)))
+            db.session.commit()
+            publisher.publish(self.student_id, {'balance': 42, 'transactions': []})
+            self.assertEqual([json.loads(e.payload)['balance'] for e in WalletEvent.query], [42])
+
+if __name__ == '__main__':
+    unittest.main()
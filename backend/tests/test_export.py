@@ -0,0 +1,125 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app import create_app
+from models import db, User, Transaction
+from utils.archive import archive_term
+from utils.export import Settlement, export_ndjson_gzip, ledger_rows, parse_range
+from utils.utils import create_token
+
+class ExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        now = datetime.utcnow().replace(microsecond=0)
+        self.term_start = now - timedelta(days=20)
+        with self.app.app_context():
+            db.create_all()
+            student = User(email='export@test.com', password_hash='hash', role='student', balance=790)
+            admin = User(email='admin@test.com', password_hash='hash', role='admin')
+            db.session.add_all([student, admin])
+            db.session.commit()
+            rows = [
+                (1000, 'top-up', None, now - timedelta(days=40)),  # before the term, archived
+                (-70, 'deduction', 'Mess 1', now - timedelta(days=10)),
+                (-60, 'deduction', 'Mess 2', now - timedelta(days=9)),
+                (-80, 'deduction', 'Mess 1', now - timedelta(days=8)),
+            ]
+            for amount, tx_type, venue, ts in rows:
+                db.session.add(Transaction(user_id=student.id, amount=amount, transaction_type=tx_type,
+                                           venue=venue, source='parent' if amount > 0 else None, timestamp=ts))
+            db.session.commit()
+            archive_term('2025-odd', now - timedelta(days=30))
+            self.headers = {'Authorization': f"Bearer {create_token(admin.id, 'admin')}"}
+            self.student_headers = {'Authorization': f"Bearer {create_token(student.id, 'student')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_csv_export_with_settlement(self):
+        res = self.client.get(f'/admin/export/transactions?from={self.term_start.date().isoformat()}',
+                              headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'text/csv')
+        self.assertIn('attachment', res.headers['Content-Disposition'])
+
+        data, _, settlement = res.get_data(as_text=True).partition('\r\n\r\n')
+        rows = list(csv.DictReader(io.StringIO(data)))
+        # Oldest first; the carried-forward opening balance is not exported
+        self.assertEqual([(r['venue'], r['amount']) for r in rows],
+                         [('Mess 1', '-70.0'), ('Mess 2', '-60.0'), ('Mess 1', '-80.0')])
+        self.assertEqual(rows[0]['email'], 'export@test.com')
+        self.assertEqual(list(csv.reader(io.StringIO(settlement))), [
+            ['settlement_venue', 'meals', 'amount'], ['Mess 1', '2', '150.0'], ['Mess 2', '1', '60.0']
+        ])
+
+    def test_ndjson_export_includes_archive(self):
+        res = self.client.get('/admin/export/transactions?format=ndjson', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        lines = [json.loads(line) for line in gzip.decompress(res.get_data()).decode().splitlines()]
+
+        rows, summary = lines[:-1], lines[-1]
+        self.assertEqual([(r['transaction_type'], r['term']) for r in rows],
+                         [('top-up', '2025-odd'), ('deduction', None), ('deduction', None), ('deduction', None)])
+        self.assertEqual(summary['record'], 'settlement')
+        self.assertEqual(summary['venues']['Mess 1'], {'meals': 2, 'amount': 150.0})
+        self.assertEqual(summary['totals']['top-up'], {'count': 1, 'amount': 1000.0})
+
+    def test_venue_filter_and_inclusive_end(self):
+        to = (datetime.utcnow() - timedelta(days=9)).date().isoformat()
+        res = self.client.get(f'/admin/export/transactions?format=ndjson&venue=Mess%201&to={to}',
+                              headers=self.headers)
+        lines = [json.loads(line) for line in gzip.decompress(res.get_data()).decode().splitlines()]
+        self.assertEqual([r['amount'] for r in lines[:-1]], [-70.0])
+        self.assertEqual(lines[-1]['venues'], {'Mess 1': {'meals': 1, 'amount': 70.0}})
+
+    def test_rejects_bad_requests(self):
+        url = '/admin/export/transactions'
+        self.assertEqual(self.client.get(url, headers=self.student_headers).status_code, 403)
+        self.assertEqual(self.client.get(f'{url}?format=xml', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get(f'{url}?from=yesterday', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get(f'{url}?from=2026-05-01&to=2026-04-01', headers=self.headers).status_code, 400)
+
+    def test_sync_workers_cap_export_rows(self):
+        url = '/admin/export/transactions'
+        self.assertEqual(self.app.config['WORKER_PROFILE'], 'sync')
+        self.app.config['EXPORT_SYNC_MAX_ROWS'] = 2
+        # Four rows in all (one archived), so only narrower ranges fit
+        res = self.client.get(url, headers=self.headers)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('export.py', res.get_json()['message'])
+        self.assertEqual(self.client.get(f'{url}?venue=Mess%201', headers=self.headers).status_code, 200)
+
+        # gevent and uvicorn workers aren't bound by the sync timeout
+        self.app.config['WORKER_PROFILE'] = 'gevent'
+        self.assertEqual(self.client.get(url, headers=self.headers).status_code, 200)
+
+    def test_offset_bounds_become_naive_utc(self):
+        self.assertEqual(parse_range('2026-04-01T05:30:00+05:30', '2026-04-02T00:00:00Z'),
+                         (datetime(2026, 4, 1), datetime(2026, 4, 2)))
+        res = self.client.get('/admin/export/transactions?format=ndjson&from='
+                              f'{self.term_start.isoformat()}%2B00:00', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        lines = gzip.decompress(res.get_data()).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+
+    @patch('utils.export.CHUNK_BYTES', 64)
+    def test_gzip_is_written_in_chunks(self):
+        with self.app.app_context():
+            chunks = list(export_ndjson_gzip(ledger_rows(), Settlement()))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(len(gzip.decompress(b''.join(chunks)).decode().splitlines()), 5)
+
+if __name__ == '__main__':
+    unittest.main()
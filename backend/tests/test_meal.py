@@ -0,0 +1,144 @@
+import unittest
+import time
+from datetime import datetime, timedelta
+from app import create_app
+from models import db, User, Transaction, QrRedemption
+from utils.utils import create_token
+from utils.qr import encode_qr_token
+
+class MealDeductTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=100)
+            db.session.add(student)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            db.session.add(vendor)
+            db.session.commit()
+            db.session.add(Transaction(user_id=student.id, amount=100, transaction_type='top-up', source='self'))
+            db.session.commit()
+
+            self.student_id = student.id
+            self.vendor_id = vendor.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_vendor_headers(self):
+        with self.app.app_context():
+            token = create_token(self.vendor_id, 'vendor')
+            return {'Authorization': f'Bearer {token}'}
+
+    def qr_payload(self, expires_in=300):
+        return encode_qr_token(self.student_id, time.time() + expires_in, self.app.config['QR_SECRET_KEY'])
+
+    def deduct(self, qr_payload, meal_cost=30):
+        return self.client.post('/meal/deduct',
+                                json={'qr_payload': qr_payload, 'meal_cost': meal_cost, 'venue': 'Mess 1'},
+                                headers=self.get_vendor_headers())
+
+    def test_deduct_success_records_redemption(self):
+        res = self.deduct(self.qr_payload())
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['new_balance'], 70)
+
+        with self.app.app_context():
+            redemption = QrRedemption.query.filter_by(user_id=self.student_id).one()
+            self.assertEqual(len(redemption.qr_hash), 16)
+            self.assertEqual(redemption.transaction.transaction_type, 'deduction')
+
+    def test_duplicate_scan_rejected(self):
+        payload = self.qr_payload()
+        self.assertEqual(self.deduct(payload).status_code, 200)
+
+        res = self.deduct(payload)
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.get_json()['previous_amount'], 30)
+
+        with self.app.app_context():
+            self.assertEqual(User.query.get(self.student_id).balance, 70)
+            self.assertEqual(Transaction.query.filter_by(user_id=self.student_id, transaction_type='deduction').count(), 1)
+
+    def test_insufficient_balance(self):
+        res = self.deduct(self.qr_payload(), meal_cost=500)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('Insufficient', res.get_json()['message'])
+
+    def test_sub_paisa_meal_cost_rejected(self):
+        res = self.deduct(self.qr_payload(), meal_cost=0.001)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json()['message'], 'Invalid meal_cost')
+
+        scans = [{'qr_payload': self.qr_payload(), 'meal_cost': 0.004}]
+        res = self.client.post('/meal/deduct/batch', json={'scans': scans}, headers=self.get_vendor_headers())
+        self.assertEqual(res.get_json()['results'][0]['status'], 'invalid')
+
+        with self.app.app_context():
+            self.assertEqual(Transaction.query.filter_by(transaction_type='deduction').count(), 0)
+
+    def test_forged_token_rejected(self):
+        forged = encode_qr_token(self.student_id, time.time() + 300, 'not-the-server-key')
+        res = self.deduct(forged)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json()['message'], 'Invalid QR signature')
+
+    def test_expired_and_malformed_tokens_rejected(self):
+        res = self.deduct(self.qr_payload(expires_in=-10))
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('expired', res.get_json()['message'])
+
+        res = self.deduct('NOT-A-TOKEN')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json()['message'], 'Malformed QR code')
+
+    def test_legacy_json_payload(self):
+        legacy = {'user_id': self.student_id, 'expires': time.time() + 300}
+        self.assertEqual(self.deduct(legacy).status_code, 400)
+
+        self.app.config['QR_ACCEPT_LEGACY_PAYLOAD'] = True
+        self.assertEqual(self.deduct(legacy).status_code, 200)
+        self.assertEqual(self.deduct(legacy).status_code, 409)
+
+    def test_batch_settlement(self):
+        redeemed = self.qr_payload()
+        self.assertEqual(self.deduct(redeemed).status_code, 200)
+
+        first, second = self.qr_payload(), self.qr_payload()
+        scanned_at = time.time() - 600
+        scans = [
+            {'qr_payload': first, 'meal_cost': 30, 'scanned_at': scanned_at},
+            {'qr_payload': first, 'meal_cost': 30, 'scanned_at': scanned_at + 1},
+            {'qr_payload': redeemed, 'meal_cost': 30},
+            {'qr_payload': second, 'meal_cost': 50},
+            {'qr_payload': 'NOT-A-TOKEN', 'meal_cost': 30},
+            {'qr_payload': self.qr_payload(), 'meal_cost': 30, 'scanned_at': time.time() + 3600},
+        ]
+        res = self.client.post('/meal/deduct/batch', json={'scans': scans, 'venue': 'Mess 2'},
+                               headers=self.get_vendor_headers())
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['success', 'duplicate', 'duplicate', 'insufficient', 'invalid', 'invalid'])
+        self.assertEqual(data['summary'], {'success': 1, 'duplicate': 2, 'insufficient': 1, 'invalid': 2})
+        self.assertEqual(data['results'][0]['new_balance'], 40)
+
+        with self.app.app_context():
+            self.assertEqual(User.query.get(self.student_id).balance, 40)
+            settled = Transaction.query.filter_by(user_id=self.student_id, venue='Mess 2').one()
+            self.assertAlmostEqual(settled.timestamp, datetime.utcfromtimestamp(scanned_at), delta=timedelta(seconds=1))
+
+    def test_batch_requires_scans(self):
+        res = self.client.post('/meal/deduct/batch', json={'scans': []}, headers=self.get_vendor_headers())
+        self.assertEqual(res.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,18 @@
 import unittest
 import json
-from datetime import date, timedelta
+from datetime import datetime, timedelta
 from app import create_app
-from models import db, User, MealSkip
+from models import db, User, MealSkip, Transaction
+from utils.forecast import campus_today, campus_to_utc, invalidate_forecast
 from utils.utils import create_token
 
 class MealSkipTestCase(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
-        self.app.config['TESTING'] = True
-        self.app.config['JWT_SECRET_KEY'] = 'jwt-dev-secret-key'
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
         self.client = self.app.test_client()
         
         with self.app.app_context():
@@ -32,6 +34,11 @@ class MealSkipTestCase(unittest.TestCase):
             db.session.remove()
             db.drop_all()
             
+    def campus_date(self, days=0):
+        # Skip dates are campus calendar dates
+        with self.app.app_context():
+            return campus_today() + timedelta(days=days)
+
     def get_student_headers(self):
         with self.app.app_context():
             token = create_token(self.student_id, 'student')
@@ -43,7 +50,7 @@ class MealSkipTestCase(unittest.TestCase):
             return {'Authorization': f'Bearer {token}'}
 
     def test_meal_skip_success(self):
-        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        tomorrow = self.campus_date(1).isoformat()
         res = self.client.post('/meal/skip', 
                                json={'meal_slot': 'LUNCH', 'skip_date': tomorrow},
                                headers=self.get_student_headers())
@@ -52,7 +59,7 @@ class MealSkipTestCase(unittest.TestCase):
         self.assertEqual(data['message'], 'Meal skip recorded')
 
     def test_meal_skip_validation_failure(self):
-        today = date.today().isoformat()
+        today = self.campus_date().isoformat()
         res = self.client.post('/meal/skip', 
                                json={'meal_slot': 'LUNCH', 'skip_date': today},
                                headers=self.get_student_headers())
@@ -60,7 +67,7 @@ class MealSkipTestCase(unittest.TestCase):
         self.assertIn('24 hours in advance', res.get_json()['message'])
 
     def test_meal_skip_duplicate_failure(self):
-        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        tomorrow = self.campus_date(1).isoformat()
         # First skip
         self.client.post('/meal/skip', 
                          json={'meal_slot': 'LUNCH', 'skip_date': tomorrow},
@@ -73,7 +80,7 @@ class MealSkipTestCase(unittest.TestCase):
         self.assertIn('already skipped', res.get_json()['message'])
 
     def test_vendor_view_skips(self):
-        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        tomorrow = self.campus_date(1).isoformat()
         # Student skips
         self.client.post('/meal/skip', 
                          json={'meal_slot': 'DINNER', 'skip_date': tomorrow},
@@ -86,6 +93,70 @@ class MealSkipTestCase(unittest.TestCase):
         data = res.get_json()
         self.assertEqual(data['summary']['DINNER'], 1)
         self.assertEqual(len(data['skips']), 1)
+        self.assertEqual(data['skips'][0]['user_email'], self.student_email)
+
+    def test_vendor_view_skips_summary_only(self):
+        tomorrow = self.campus_date(1).isoformat()
+        for slot in ('LUNCH', 'DINNER'):
+            self.client.post('/meal/skip',
+                             json={'meal_slot': slot, 'skip_date': tomorrow},
+                             headers=self.get_student_headers())
+
+        res = self.client.get(f'/meal/skips/upcoming?date={tomorrow}&summary_only=true',
+                              headers=self.get_vendor_headers())
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['summary'], {'BREAKFAST': 0, 'LUNCH': 1, 'DINNER': 1})
+        self.assertNotIn('skips', data)
+
+    def test_forecast_subtracts_skips(self):
+        # Two lunches a day served at Mess 1 over the last two days, at 13:00
+        # campus time (07:30 UTC in Asia/Kolkata)
+        with self.app.app_context():
+            for days_ago in (1, 2):
+                day = self.campus_date(-days_ago)
+                served_at = campus_to_utc(datetime(day.year, day.month, day.day, 13))
+                for _ in range(2):
+                    db.session.add(Transaction(user_id=self.student_id, amount=-70, transaction_type='deduction',
+                                               venue='Mess 1', timestamp=served_at))
+            db.session.commit()
+
+        tomorrow = self.campus_date(1).isoformat()
+        self.client.post('/meal/skip',
+                         json={'meal_slot': 'LUNCH', 'skip_date': tomorrow},
+                         headers=self.get_student_headers())
+
+        res = self.client.get('/meal/forecast?days=1', headers=self.get_vendor_headers())
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['forecast'], [{
+            'date': tomorrow,
+            'meal_slot': 'LUNCH',
+            'venue': 'Mess 1',
+            'baseline_headcount': 2.0,
+            'skips': 1.0,
+            'expected_headcount': 1
+        }])
+        self.assertEqual(data['waste_reduction_pct'], 50.0)
+
+    def test_forecast_slots_follow_campus_clock(self):
+        # 04:45 UTC is breakfast time in London but 10:15 (lunch) on campus
+        self.app.config['CAMPUS_TIMEZONE'] = 'Asia/Kolkata'
+        with self.app.app_context():
+            day = self.campus_date(-1)
+            db.session.add(Transaction(user_id=self.student_id, amount=-70, transaction_type='deduction',
+                                       venue='Mess 1', timestamp=datetime(day.year, day.month, day.day, 4, 45)))
+            db.session.commit()
+
+        # The forecast is cached per worker; drop other tests' figures
+        invalidate_forecast()
+        res = self.client.get('/meal/forecast?days=1', headers=self.get_vendor_headers())
+        self.assertEqual([(row['meal_slot'], row['baseline_headcount']) for row in res.get_json()['forecast']],
+                         [('LUNCH', 1.0)])
+
+    def test_forecast_days_validation(self):
+        res = self.client.get('/meal/forecast?days=30', headers=self.get_vendor_headers())
+        self.assertEqual(res.status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+import copy
+import logging
+import unittest
+from sqlalchemy.exc import IntegrityError
+from app import create_app
+from models import db, User
+from utils.log import logger, log_event
+from utils.metrics import reset_metrics
+from utils.utils import create_token
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+        reset_metrics()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=0)
+            db.session.add(student)
+            db.session.commit()
+            self.headers = {'Authorization': f"Bearer {create_token(student.id, 'student')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def series(self, text, prefix):
+        return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+                for line in text.splitlines() if line.startswith(prefix)}
+
+    def test_metrics_cover_latency_sql_and_lock_wait(self):
+        self.client.post('/wallet/topup', json={'amount': 100}, headers=self.headers)
+        self.client.get('/wallet/balance', headers=self.headers)
+
+        res = self.client.get('/metrics')
+        self.assertEqual(res.status_code, 200)
+        text = res.get_data(as_text=True)
+        self.assertIn('# TYPE campuseats_request_duration_seconds histogram', text)
+
+        latency = self.series(text, 'campuseats_request_duration_seconds_count')
+        self.assertEqual(latency['campuseats_request_duration_seconds_count{blueprint="wallet",endpoint="wallet.topup",method="POST",status="200"}'], 1)
+        self.assertEqual(latency['campuseats_request_duration_seconds_count{blueprint="wallet",endpoint="wallet.get_balance",method="GET",status="200"}'], 1)
+
+        queries = self.series(text, 'campuseats_request_sql_queries_sum')
+        self.assertGreater(queries['campuseats_request_sql_queries_sum{blueprint="wallet",endpoint="wallet.topup"}'], 1)
+        self.assertEqual(queries['campuseats_request_sql_queries_sum{blueprint="wallet",endpoint="wallet.get_balance"}'], 1)
+
+        # Only the wallet write holds row locks
+        lock_wait = self.series(text, 'campuseats_lock_wait_seconds_count')
+        self.assertEqual(list(lock_wait), ['campuseats_lock_wait_seconds_count{blueprint="wallet",endpoint="wallet.topup"}'])
+
+    def test_failed_statements_leave_no_timing_state(self):
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                info = copy.deepcopy(conn.info)
+                for _ in range(3):
+                    with self.assertRaises(IntegrityError):
+                        conn.execute(db.insert(User).values(email=f"{self._testMethodName}@test.com",
+                                                            password_hash='hash', role='student', balance=0))
+                    conn.rollback()
+                self.assertEqual(dict(conn.info), info)
+
+    def test_metrics_token(self):
+        self.app.config['METRICS_TOKEN'] = 'scrape-me'
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code, 200)
+
+    def test_log_events_are_sampled(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger.addHandler(handler)
+        try:
+            with self.app.app_context():
+                log_event('wallet.topup', sample_rate=0.0, user_id=1)
+                log_event('wallet.topup', sample_rate=1.0, user_id=2)
+                log_event('wallet.mismatch', level=logging.WARNING, sample_rate=0.0, user_id=3)
+        finally:
+            logger.removeHandler(handler)
+
+        self.assertEqual([r.fields['user_id'] for r in records], [2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from app import create_app
+from models import db, User, Transaction, QrRedemption
+from utils.utils import create_token
+from utils.qr import verify_qr_token
+
+class QRGenerateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=100)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            db.session.add_all([student, vendor])
+            db.session.commit()
+            db.session.add(Transaction(user_id=student.id, amount=100, transaction_type='top-up', source='self'))
+            db.session.commit()
+
+            self.student_id = student.id
+            self.vendor_id = vendor.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_headers(self, user_id, role):
+        with self.app.app_context():
+            token = create_token(user_id, role)
+            return {'Authorization': f'Bearer {token}'}
+
+    def generate(self, fmt=None):
+        url = f'/qr/generate?format={fmt}' if fmt else '/qr/generate'
+        res = self.client.get(url, headers=self.get_headers(self.student_id, 'student'))
+        self.assertEqual(res.status_code, 200)
+        return res.get_json()
+
+    def test_formats(self):
+        self.assertTrue(self.generate()['qr_image'].startswith('data:image/png;base64,'))
+        self.assertTrue(self.generate('svg')['qr_image'].startswith('data:image/svg+xml;base64,'))
+        data = self.generate('payload')
+        self.assertNotIn('qr_image', data)
+        with self.app.app_context():
+            scan = verify_qr_token(data['qr_payload'], self.app.config['QR_SECRET_KEY'])
+        self.assertEqual(scan['user_id'], self.student_id)
+        self.assertEqual(scan['expires'], data['expires_at'])
+
+        res = self.client.get('/qr/generate?format=gif', headers=self.get_headers(self.student_id, 'student'))
+        self.assertEqual(res.status_code, 400)
+
+    def test_refresh_reuses_code_until_redeemed(self):
+        first = self.generate()
+        self.assertEqual(self.generate(), first)
+
+        res = self.client.post('/meal/deduct',
+                               json={'qr_payload': first['qr_payload'], 'meal_cost': 30},
+                               headers=self.get_headers(self.vendor_id, 'vendor'))
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(self.generate()['qr_payload'], first['qr_payload'])
+
+    def test_redemption_on_another_worker_retires_code(self):
+        first = self.generate('payload')
+        with self.app.app_context():
+            meal = Transaction(user_id=self.student_id, amount=-30, transaction_type='deduction')
+            db.session.add(meal)
+            db.session.flush()
+            scan = verify_qr_token(first['qr_payload'], self.app.config['QR_SECRET_KEY'])
+            # Written the way /meal/deduct on another process would, with no local state touched
+            db.session.add(QrRedemption(qr_hash=scan['qr_hash'], user_id=self.student_id, transaction_id=meal.id))
+            db.session.commit()
+
+        second = self.generate('payload')
+        self.assertNotEqual(second['qr_payload'], first['qr_payload'])
+        self.assertEqual(self.generate('payload'), second)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import re
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from models import db, User, Transaction, MealSkip
+from utils.utils import create_token
+from utils.qr import encode_qr_token
+
+# Tables that grow with campus activity; reading one end to end is a regression.
+# users and the daily_stats rollup stay small and are allowed to be scanned.
+HOT_TABLES = ('transactions', 'meal_skips', 'qr_redemptions', 'wallet_checkpoints')
+FULL_SCAN = re.compile(r'^SCAN (%s)\b(?!.*USING)' % '|'.join(HOT_TABLES))
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Runs EXPLAIN QUERY PLAN on every statement a hot route issues."""
+
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=1000)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            admin = User(email=f"admin_{self._testMethodName}@test.com", password_hash='hash', role='admin')
+            db.session.add_all([student, vendor, admin])
+            db.session.commit()
+
+            now = datetime.utcnow()
+            db.session.add(Transaction(user_id=student.id, amount=1000, transaction_type='top-up', source='self', timestamp=now - timedelta(days=2)))
+            for i in range(20):
+                db.session.add(Transaction(user_id=vendor.id, amount=-50, transaction_type='deduction', venue='Mess 1', timestamp=now - timedelta(hours=i)))
+            db.session.add(MealSkip(user_id=student.id, meal_slot='LUNCH', skip_date=date.today() + timedelta(days=3)))
+            db.session.commit()
+
+            self.student_id = student.id
+            self.vendor_id = vendor.id
+            self.admin_id = admin.id
+            # Reports and listings may be served by the read engine
+            self.engines = list(db.engines.values())
+
+        self.statements = []
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._capture)
+
+    def tearDown(self):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._capture)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            self.statements.append((statement, parameters))
+
+    def get_headers(self, user_id, role):
+        with self.app.app_context():
+            token = create_token(user_id, role)
+            return {'Authorization': f'Bearer {token}'}
+
+    def assert_no_full_scans(self, method, url, role, **kwargs):
+        user_id = {'student': self.student_id, 'vendor': self.vendor_id, 'admin': self.admin_id}[role]
+        headers = self.get_headers(user_id, role)
+        self.statements = []
+        res = self.client.open(url, method=method, headers=headers, **kwargs)
+        self.assertLess(res.status_code, 500, res.get_data(as_text=True))
+        captured = list(self.statements)
+        self.assertTrue(captured, f"{method} {url} issued no queries")
+
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                for statement, parameters in captured:
+                    plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                    for row in plan:
+                        detail = row[-1]
+                        self.assertIsNone(
+                            FULL_SCAN.match(detail),
+                            f"{method} {url} full-scans a hot table:\n{statement}\n-> {detail}"
+                        )
+
+    def test_wallet_routes(self):
+        self.assert_no_full_scans('GET', '/wallet/balance', 'student')
+        self.assert_no_full_scans('GET', '/wallet/projection', 'student')
+        self.assert_no_full_scans('POST', '/wallet/topup', 'student', json={'amount': 100})
+
+    def test_meal_deduct(self):
+        payload = encode_qr_token(self.student_id, time.time() + 300, self.app.config['QR_SECRET_KEY'])
+        self.assert_no_full_scans('POST', '/meal/deduct', 'vendor',
+                                  json={'qr_payload': payload, 'meal_cost': 30, 'venue': 'Mess 1'})
+
+    def test_qr_generate(self):
+        self.assert_no_full_scans('GET', '/qr/generate?format=payload', 'student')
+
+    def test_transaction_listing(self):
+        self.assert_no_full_scans('GET', '/transactions', 'student')
+        self.assert_no_full_scans('GET', '/transactions?type=deduction', 'student')
+        self.assert_no_full_scans('GET', '/transactions?venue=Mess%201', 'student')
+        self.assert_no_full_scans('GET', f'/transactions?limit=5&before={datetime.utcnow().isoformat()},999', 'student')
+
+    def test_meal_skip_routes(self):
+        skip_date = (date.today() + timedelta(days=3)).isoformat()
+        self.assert_no_full_scans('GET', '/meal/skips?upcoming=true', 'student')
+        self.assert_no_full_scans('POST', '/meal/skip', 'student',
+                                  json={'meal_slot': 'DINNER', 'skip_date': skip_date})
+        self.assert_no_full_scans('GET', f'/meal/skips/upcoming?date={skip_date}', 'vendor')
+        self.assert_no_full_scans('GET', f'/meal/skips/upcoming?date={skip_date}&meal_slot=LUNCH', 'vendor')
+        self.assert_no_full_scans('GET', f'/meal/skips/upcoming?date={skip_date}&summary_only=true', 'vendor')
+        self.assert_no_full_scans('GET', '/meal/forecast?days=7', 'vendor')
+
+    def test_admin_routes(self):
+        self.assert_no_full_scans('GET', '/admin/reports', 'admin')
+        self.assert_no_full_scans('POST', '/admin/refund', 'admin', json={'user_id': self.student_id, 'amount': 10})
+
+if __name__ == '__main__':
+    unittest.main()
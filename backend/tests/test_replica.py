@@ -0,0 +1,111 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app import create_app
+from models import db, User, Transaction, RecentWrite
+from utils.utils import create_token
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Primary and replica are two SQLite files; sync_replica() plays replication."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.primary_path = os.path.join(self.tmpdir, 'primary.db')
+        self.replica_path = os.path.join(self.tmpdir, 'replica.db')
+        self.app = self.worker()
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            student = User(email='student@test.com', password_hash='hash', role='student', balance=0)
+            admin = User(email='admin@test.com', password_hash='hash', role='admin')
+            db.session.add_all([student, admin])
+            db.session.commit()
+            self.student_id = student.id
+            self.student_headers = {'Authorization': f"Bearer {create_token(student.id, 'student')}"}
+            self.admin_headers = {'Authorization': f"Bearer {create_token(admin.id, 'admin')}"}
+        self.sync_replica()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def worker(self):
+        # One app instance per gunicorn worker; they share only the databases
+        return create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.primary_path}',
+            'SQLALCHEMY_BINDS': {'read': f'sqlite:///{self.replica_path}'},
+            'READ_REPLICA': True,
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+
+    def sync_replica(self):
+        source = sqlite3.connect(self.primary_path)
+        target = sqlite3.connect(self.replica_path)
+        source.backup(target)
+        source.close()
+        target.close()
+        with self.app.app_context():
+            db.engines['read'].dispose()
+
+    def test_listings_read_from_replica(self):
+        with self.app.app_context():
+            db.session.add(User(email='late@test.com', password_hash='hash', role='student'))
+            db.session.commit()
+
+        # The admin hasn't written anything, so the lagging replica answers
+        self.assertEqual(len(self.client.get('/admin/users', headers=self.admin_headers).get_json()), 2)
+        self.sync_replica()
+        self.assertEqual(len(self.client.get('/admin/users', headers=self.admin_headers).get_json()), 3)
+
+    def test_user_reads_own_writes_before_replication(self):
+        res = self.client.post('/wallet/topup', json={'amount': 100}, headers=self.student_headers)
+        self.assertEqual(res.status_code, 200)
+
+        # Not replicated yet, but the student's own listing goes to the primary
+        listing = self.client.get('/transactions', headers=self.student_headers).get_json()
+        self.assertEqual([t['amount'] for t in listing], [100])
+
+        with self.app.app_context():
+            with db.engines['read'].connect() as conn:
+                self.assertEqual(conn.exec_driver_sql('SELECT count(*) FROM transactions').scalar(), 0)
+
+    def test_write_pins_reads_on_other_workers(self):
+        res = self.client.post('/wallet/topup', json={'amount': 100}, headers=self.student_headers)
+        self.assertEqual(res.status_code, 200)
+
+        other = self.worker()
+        try:
+            listing = other.test_client().get('/transactions', headers=self.student_headers).get_json()
+            self.assertEqual([t['amount'] for t in listing], [100])
+        finally:
+            with other.app_context():
+                for engine in db.engines.values():
+                    engine.dispose()
+
+    def test_refund_pins_the_refunded_student(self):
+        res = self.client.post('/admin/refund', json={'user_id': self.student_id, 'amount': 20},
+                               headers=self.admin_headers)
+        self.assertEqual(res.status_code, 200)
+
+        listing = self.client.get('/transactions', headers=self.student_headers).get_json()
+        self.assertEqual([t['transaction_type'] for t in listing], ['refund'])
+
+    def test_window_expiry_returns_reads_to_replica(self):
+        self.client.post('/wallet/topup', json={'amount': 100}, headers=self.student_headers)
+        with self.app.app_context():
+            RecentWrite.query.update({'written_at': datetime.utcnow() - timedelta(minutes=1)})
+            db.session.commit()
+
+        self.assertEqual(self.client.get('/transactions', headers=self.student_headers).get_json(), [])
+        with self.app.app_context():
+            self.assertEqual(Transaction.query.filter_by(user_id=self.student_id).count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from app import create_app
+from models import db, User, Transaction, DailyStat, SpendStat
+from seed import generate_campus, parse_distribution
+from utils.stats import rebuild_daily_stats, rebuild_spend_stats
+
+class SeedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True
+        })
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def generate(self, **kwargs):
+        with self.app.app_context():
+            report = generate_campus(40, 20, vendors=2, venues=5, chunk_size=15, **kwargs)
+            ledger = db.session.query(Transaction.user_id, Transaction.amount_paise, Transaction.venue)\
+                .order_by(Transaction.id).all()
+            return report, ledger
+
+    def test_ledgers_match_balances_and_rollups(self):
+        report, ledger = self.generate()
+        self.assertEqual(report['students'], 40)
+        self.assertEqual(report['transactions'], len(ledger))
+        self.assertEqual(report['mismatches'], 0)
+
+        with self.app.app_context():
+            self.assertEqual(User.query.filter_by(role='vendor').count(), 2)
+            self.assertEqual(len({venue for _, _, venue in ledger if venue}), 5)
+            for user in User.query.filter_by(role='student'):
+                self.assertGreaterEqual(user.balance_paise, 0)
+
+            # The rollups written while generating equal a rebuild from the ledger
+            daily = sorted((s.stat_date, s.venue, s.transaction_type, s.tx_count, s.amount_sum_paise)
+                           for s in DailyStat.query)
+            spend = sorted((s.user_id, s.deduction_count, round(s.lunch_ewma_paise or 0, 6)) for s in SpendStat.query)
+            rebuild_daily_stats()
+            rebuild_spend_stats()
+            self.assertEqual(daily, sorted((s.stat_date, s.venue, s.transaction_type, s.tx_count, s.amount_sum_paise)
+                                           for s in DailyStat.query))
+            self.assertEqual(spend, sorted((s.user_id, s.deduction_count, round(s.lunch_ewma_paise or 0, 6))
+                                           for s in SpendStat.query))
+
+            # Deferred indexes are back after the load
+            indexes = {ix['name'] for ix in db.inspect(db.engine).get_indexes('transactions')}
+            self.assertTrue({ix.name for ix in Transaction.__table__.indexes} <= indexes)
+
+    def test_same_seed_same_ledger(self):
+        _, first = self.generate(verify=False)
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+        _, second = self.generate(verify=False)
+        self.assertEqual(first, second)
+
+    def test_meals_per_day_distribution(self):
+        self.assertEqual(parse_distribution('0:0.1,2:0.9'), {0: 0.1, 2: 0.9})
+        with self.assertRaises(ValueError):
+            parse_distribution('4:1')
+
+        _, ledger = self.generate(meals_per_day={0: 1.0}, verify=False)
+        self.assertEqual(ledger, [])
+
+if __name__ == '__main__':
+    unittest.main()
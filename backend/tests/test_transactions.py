@@ -0,0 +1,71 @@
+import unittest
+import json
+from datetime import datetime, timedelta
+from app import create_app
+from models import db, User, Transaction
+from utils.utils import create_token
+
+class TransactionListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=0)
+            db.session.add(student)
+            db.session.commit()
+
+            # Two rows share a timestamp so the id tie-breaker is exercised
+            base = datetime(2026, 1, 1, 12, 0, 0)
+            stamps = [base, base, base + timedelta(hours=1), base + timedelta(hours=2), base + timedelta(hours=3)]
+            for i, ts in enumerate(stamps):
+                db.session.add(Transaction(user_id=student.id, amount=10 + i, transaction_type='top-up', timestamp=ts))
+            db.session.commit()
+
+            self.student_id = student.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_student_headers(self):
+        with self.app.app_context():
+            token = create_token(self.student_id, 'student')
+            return {'Authorization': f'Bearer {token}'}
+
+    def test_unpaginated_list_unchanged(self):
+        res = self.client.get('/transactions', headers=self.get_student_headers())
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([t['amount'] for t in res.get_json()], [14, 13, 12, 11, 10])
+        self.assertNotIn('X-Next-Cursor', res.headers)
+
+    def test_keyset_pagination_walks_full_history(self):
+        amounts = []
+        url = '/transactions?limit=2'
+        while url:
+            res = self.client.get(url, headers=self.get_student_headers())
+            self.assertEqual(res.status_code, 200)
+            amounts.extend(t['amount'] for t in res.get_json())
+            cursor = res.headers.get('X-Next-Cursor')
+            url = f'/transactions?limit=2&before={cursor}' if cursor else None
+        self.assertEqual(amounts, [14, 13, 12, 11, 10])
+
+    def test_invalid_cursor(self):
+        res = self.client.get('/transactions?limit=2&before=yesterday', headers=self.get_student_headers())
+        self.assertEqual(res.status_code, 400)
+
+    def test_ndjson_stream(self):
+        res = self.client.get('/transactions?format=ndjson', headers=self.get_student_headers())
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['amount'] for r in rows], [14, 13, 12, 11, 10])
+
+if __name__ == '__main__':
+    unittest.main()
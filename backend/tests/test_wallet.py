@@ -0,0 +1,198 @@
+import unittest
+from unittest import mock
+from app import create_app
+from datetime import datetime
+from models import db, User, Transaction, WalletCheckpoint, SpendStat
+from utils.forecast import campus_today, campus_to_utc, invalidate_forecast
+from utils.stats import rebuild_spend_stats
+from utils import utils
+from utils.utils import create_token, reconcile_wallets
+from utils.wallet import credit, debit
+
+class WalletTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=0)
+            db.session.add(student)
+            admin = User(email=f"admin_{self._testMethodName}@test.com", password_hash='hash', role='admin')
+            db.session.add(admin)
+            db.session.commit()
+
+            self.student_id = student.id
+            self.admin_id = admin.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_headers(self, user_id, role):
+        with self.app.app_context():
+            token = create_token(user_id, role)
+            return {'Authorization': f'Bearer {token}'}
+
+    def topup(self, amount):
+        return self.client.post('/wallet/topup', json={'amount': amount},
+                                headers=self.get_headers(self.student_id, 'student'))
+
+    def test_topup_advances_checkpoint(self):
+        self.assertEqual(self.topup(200).get_json()['new_balance'], 200)
+        self.assertEqual(self.topup(50).get_json()['new_balance'], 250)
+
+        with self.app.app_context():
+            checkpoint = db.session.get(WalletCheckpoint, self.student_id)
+            last_tx = Transaction.query.filter_by(user_id=self.student_id).order_by(Transaction.id.desc()).first()
+            self.assertEqual(checkpoint.ledger_sum_paise, 25000)
+            self.assertEqual(checkpoint.last_transaction_id, last_tx.id)
+
+    def test_fractional_amounts_stay_exact(self):
+        for _ in range(3):
+            self.topup(0.1)
+
+        with self.app.app_context():
+            user = db.session.get(User, self.student_id)
+            self.assertEqual(user.balance_paise, 30)
+            self.assertEqual(user.to_dict()['balance'], 0.3)
+
+    def test_reconcile_reports_mismatches(self):
+        self.topup(200)
+        with self.app.app_context():
+            db.session.get(User, self.student_id).balance = 999
+            db.session.commit()
+
+        headers = self.get_headers(self.admin_id, 'admin')
+        report = self.client.post('/admin/reconcile', headers=headers).get_json()
+        self.assertEqual(report['mismatches'], [{'user_id': self.student_id, 'balance': 999, 'ledger_sum': 200}])
+
+        report = self.client.post('/admin/reconcile?fix=true', headers=headers).get_json()
+        self.assertTrue(report['corrected'])
+        with self.app.app_context():
+            self.assertEqual(db.session.get(User, self.student_id).balance, 200)
+
+    def test_reconcile_pages_by_user_id(self):
+        self.topup(200)
+        headers = self.get_headers(self.admin_id, 'admin')
+        seen = []
+        response = self.client.post('/admin/reconcile?limit=1', headers=headers)
+        while True:
+            self.assertEqual(response.get_json()['users_checked'], 1)
+            seen.append(int(response.headers.get('X-Next-Cursor', 0)))
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            response = self.client.post(f"/admin/reconcile?limit=1&after={response.headers['X-Next-Cursor']}", headers=headers)
+        self.assertEqual(seen, [self.student_id, 0])
+        self.assertEqual(self.client.post(f'/admin/reconcile?after={self.admin_id}', headers=headers).get_json()['users_checked'], 0)
+
+        with self.app.app_context():
+            self.assertEqual(db.session.get(WalletCheckpoint, self.student_id).ledger_sum_paise, 20000)
+
+    def test_reconcile_fix_keeps_concurrent_payment(self):
+        self.topup(200)
+        with self.app.app_context():
+            db.session.get(User, self.student_id).balance = 999
+            db.session.commit()
+
+            # A 50 top-up commits between the ledger read and the correction
+            to_rupees = utils.to_rupees
+            def pay_then_format(value):
+                if not Transaction.query.filter_by(amount_paise=5000).count():
+                    credit(self.student_id, 5000, transaction_type='top-up', source='self')
+                return to_rupees(value)
+
+            with mock.patch.object(utils, 'to_rupees', side_effect=pay_then_format):
+                report = reconcile_wallets(fix=True)
+            self.assertEqual(report['skipped'], [self.student_id])
+            db.session.expire_all()
+            self.assertEqual(db.session.get(User, self.student_id).balance, 1049)
+
+            # The next sweep corrects it against the ledger that includes the payment
+            self.assertEqual(reconcile_wallets(fix=True)['skipped'], [])
+            db.session.expire_all()
+            self.assertEqual(db.session.get(User, self.student_id).balance, 250)
+
+    def test_repeat_token_served_from_cache(self):
+        headers = self.get_headers(self.student_id, 'student')
+        self.client.get('/wallet/balance', headers=headers)
+        admin_headers = self.get_headers(self.admin_id, 'admin')
+        before = self.client.get('/admin/cache/stats', headers=admin_headers).get_json()['tokens']
+
+        for _ in range(3):
+            self.assertEqual(self.client.get('/wallet/balance', headers=headers).status_code, 200)
+
+        after = self.client.get('/admin/cache/stats', headers=admin_headers).get_json()['tokens']
+        # Three balance polls plus the second stats call all hit the cache
+        self.assertEqual(after['hits'] - before['hits'], 4)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_amounts_below_one_paisa_rejected(self):
+        for amount in (0.001, 0.004, -1, '100', True, None):
+            self.assertEqual(self.topup(amount).status_code, 400, amount)
+        self.assertEqual(self.topup(0.005).status_code, 200) # rounds up to one paisa
+
+        with self.app.app_context():
+            self.assertEqual([t.amount_paise for t in Transaction.query.filter_by(user_id=self.student_id)], [1])
+
+    def test_spend_stats_follow_ledger_writes(self):
+        self.topup(500)
+        with self.app.app_context():
+            # Serving hours on the campus clock; the ledger stores them in UTC
+            today = campus_today()
+            for hour, cost in ((12, 5000), (13, 10000), (8, 3000)):
+                debit(self.student_id, cost, transaction_type='deduction', venue='Mess 1',
+                      timestamp=campus_to_utc(datetime(today.year, today.month, today.day, hour)))
+            db.session.commit()
+
+            stat = db.session.get(SpendStat, self.student_id)
+            # alpha 0.3: 5000 then 5000 + 0.3 * (10000 - 5000)
+            self.assertAlmostEqual(stat.lunch_ewma_paise, 6500)
+            self.assertAlmostEqual(stat.breakfast_ewma_paise, 3000)
+            self.assertIsNone(stat.dinner_ewma_paise)
+            self.assertEqual(stat.deduction_count, 3)
+
+            incremental = (stat.lunch_ewma_paise, stat.breakfast_ewma_paise, stat.deduction_count)
+            rebuild_spend_stats()
+            db.session.expire_all()
+            stat = db.session.get(SpendStat, self.student_id)
+            self.assertEqual((stat.lunch_ewma_paise, stat.breakfast_ewma_paise, stat.deduction_count), incremental)
+
+        # Campus-wide slot costs are cached per worker; drop other tests' figures
+        invalidate_forecast()
+        projection = self.client.get('/wallet/projection',
+                                     headers=self.get_headers(self.student_id, 'student')).get_json()
+        self.assertEqual(projection['slot_costs']['LUNCH'], 65)
+        self.assertEqual(projection['slot_costs']['BREAKFAST'], 30)
+        # No dinners yet: the campus-wide average stands in (the default menu price)
+        self.assertEqual(projection['slot_costs']['DINNER'], 60)
+        self.assertEqual(projection['confidence_score'], 0.8)
+        self.assertEqual(projection['projected_balance'],
+                         500 - 180 - projection['next_meal_cost'])
+
+    def test_projection_counts_only_processing_topups(self):
+        self.topup(100)
+        with self.app.app_context():
+            db.session.add(Transaction(user_id=self.student_id, amount=300, transaction_type='top-up',
+                                       source='parent', status='processing'))
+            db.session.commit()
+
+        headers = self.get_headers(self.student_id, 'student')
+        projection = self.client.get('/wallet/projection', headers=headers).get_json()
+        self.assertEqual(projection['projected_balance'], 100 + 300 - projection['next_meal_cost'])
+
+        # Once it settles, the top-up is in the balance and no longer pending
+        with self.app.app_context():
+            Transaction.query.filter_by(status='processing').update({'status': 'success'})
+            db.session.get(User, self.student_id).balance_paise += 30000
+            db.session.commit()
+        projection = self.client.get('/wallet/projection', headers=headers).get_json()
+        self.assertEqual(projection['projected_balance'], 400 - projection['next_meal_cost'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from models import db, User, Transaction
+from utils.utils import create_token
+from utils.qr import encode_qr_token
+
+THREADS = 16
+
+class WalletConcurrencyTestCase(unittest.TestCase):
+    """Parallel deductions against one wallet must never lose or overdraw money."""
+
+    def setUp(self):
+        # Threads need a shared file rather than one in-memory connection
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'campuseats.db')}",
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'jwt-dev-secret-key'
+        })
+
+        with self.app.app_context():
+            db.create_all()
+            student = User(email=f"{self._testMethodName}@test.com", password_hash='hash', role='student', balance=300)
+            vendor = User(email=f"vendor_{self._testMethodName}@test.com", password_hash='hash', role='vendor')
+            db.session.add_all([student, vendor])
+            db.session.commit()
+            db.session.add(Transaction(user_id=student.id, amount=300, transaction_type='top-up', source='self'))
+            db.session.commit()
+
+            self.student_id = student.id
+            self.headers = {'Authorization': f"Bearer {create_token(vendor.id, 'vendor')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def deduct(self, _):
+        # Each request gets its own client and a fresh QR, so only the wallet is shared
+        token = encode_qr_token(self.student_id, time.time() + 300, self.app.config['QR_SECRET_KEY'])
+        res = self.app.test_client().post('/meal/deduct',
+                                          json={'qr_payload': token, 'meal_cost': 10},
+                                          headers=self.headers)
+        return res.status_code
+
+    def test_parallel_deductions_lose_no_balance(self):
+        # 50 attempts at ₹10 against a ₹300 wallet: exactly 30 may succeed
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            statuses = list(pool.map(self.deduct, range(50)))
+
+        self.assertEqual(statuses.count(200), 30)
+        self.assertEqual(statuses.count(400), 20)
+
+        with self.app.app_context():
+            self.assertEqual(db.session.get(User, self.student_id).balance_paise, 0)
+            ledger = db.session.query(db.func.sum(Transaction.amount_paise))\
+                .filter(Transaction.user_id == self.student_id).scalar()
+            self.assertEqual(ledger, 0)
+            self.assertEqual(Transaction.query.filter_by(user_id=self.student_id, transaction_type='deduction').count(), 30)
+
+if __name__ == '__main__':
+    unittest.main()
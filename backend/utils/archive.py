@@ -0,0 +1,101 @@
+from datetime import datetime
+from sqlalchemy import and_, delete, insert, literal, select
+from models import db, User, Transaction, ArchivedTransaction, ArchiveTerm, QrRedemption, WalletCheckpoint
+
+OPENING_BALANCE = 'opening-balance'
+CHUNK_SIZE = 1000
+# Columns copied as-is into transactions_archive
+LEDGER_COLUMNS = ('id', 'user_id', 'amount_paise', 'transaction_type', 'description', 'venue', 'source',
+                  'status', 'skipped', 'timestamp')
+
+def archive_cutoff():
+    """
+    Latest archive cutoff, or None while nothing has been archived.
+
+    Read on every call (archive_terms holds one row per term), so no worker
+    keeps paging the hot ledger after a term has moved out of it.
+    """
+    return db.session.query(db.func.max(ArchiveTerm.cutoff)).scalar()
+
+def archive_term(term, cutoff, chunk_size=CHUNK_SIZE):
+    """
+    Move a closed term's settled ledger rows into transactions_archive.
+
+    Works through users in chunks, one commit each. A chunk's rows from
+    before `cutoff` are copied to the archive and deleted, and each user gets
+    a single opening-balance row at `cutoff` that carries their sum forward,
+    so the hot ledger alone still adds up to User.balance. Opening-balance
+    rows of earlier terms are folded into the new one. Pending and
+    processing rows stay hot until they settle. Wallet checkpoints of the
+    moved users are dropped and rebuilt from the hot set on the next verify.
+    Running the same term again resumes an interrupted archive.
+
+    Args:
+        term: Term label, e.g. '2025-odd'
+        cutoff: Rows strictly before this datetime are archived
+        chunk_size: Users per commit
+
+    Returns:
+        dict: Users carried forward and ledger rows archived
+    """
+    if cutoff > datetime.utcnow():
+        raise ValueError('Cutoff must be in the past')
+    record = db.session.get(ArchiveTerm, term)
+    if record is None:
+        latest = archive_cutoff()
+        if latest is not None and cutoff <= latest:
+            raise ValueError(f'Cutoff must be after the last archived cutoff ({latest.isoformat()})')
+        record = ArchiveTerm(term=term, cutoff=cutoff, transactions=0)
+        db.session.add(record)
+        db.session.commit()
+    elif record.cutoff != cutoff:
+        raise ValueError(f'Term {term} was archived with cutoff {record.cutoff.isoformat()}')
+
+    report = {'users': 0, 'archived': 0}
+    last_user_id = 0
+    while True:
+        # Locking the chunk's users holds off wallet writes (and their
+        # checkpoint updates) until the carry-forward is committed
+        user_ids = [i for (i,) in db.session.query(User.id).filter(User.id > last_user_id)
+                    .order_by(User.id).limit(chunk_size).with_for_update()]
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        closed = and_(Transaction.user_id.between(user_ids[0], last_user_id),
+                      Transaction.timestamp < cutoff, Transaction.status == 'success')
+        carried = db.session.query(Transaction.user_id, db.func.sum(Transaction.amount_paise))\
+            .filter(closed).group_by(Transaction.user_id).all()
+        if not carried:
+            db.session.commit()
+            continue
+
+        source, target = Transaction.__mapper__.columns, ArchivedTransaction.__mapper__.columns
+        moved = db.session.execute(
+            insert(ArchivedTransaction.__table__).from_select(
+                [target['term']] + [target[name] for name in LEDGER_COLUMNS],
+                select(literal(term), *[source[name] for name in LEDGER_COLUMNS])
+                .where(closed, Transaction.transaction_type != OPENING_BALANCE)
+            )
+        ).rowcount
+        # QR codes expire within minutes; redemptions this old only guard the FK
+        db.session.execute(delete(QrRedemption).where(QrRedemption.transaction_id.in_(
+            select(Transaction.id).where(closed))))
+        db.session.execute(delete(Transaction).where(closed), execution_options={'synchronize_session': False})
+        db.session.bulk_insert_mappings(Transaction, [{
+            'user_id': user_id,
+            'amount_paise': total,
+            'transaction_type': OPENING_BALANCE,
+            'description': f'Opening balance carried forward from {term}',
+            'status': 'success',
+            'skipped': False,
+            'timestamp': cutoff
+        } for user_id, total in carried])
+        db.session.execute(delete(WalletCheckpoint).where(WalletCheckpoint.user_id.in_([u for u, _ in carried])))
+        record.transactions += moved
+        db.session.commit()
+
+        report['users'] += len(carried)
+        report['archived'] += moved
+
+    return report
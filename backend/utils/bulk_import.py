@@ -0,0 +1,271 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import InvalidOperation
+from flask import current_app
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Transaction
+from utils.events import wallet_event, publish_wallet_event
+from utils.money import to_paise, to_rupees
+from utils.passwords import hash_passwords
+from utils.stats import record_daily_stat
+
+ROLES = ('student', 'vendor', 'admin')
+CHUNK_SIZE = 500
+# Same cap as /wallet/topup
+MAX_TOPUP = 5000
+
+def read_rows(stream, fmt='csv'):
+    """
+    Stream-parse an uploaded file without loading it into memory.
+
+    Args:
+        stream: Binary file-like object
+        fmt: 'csv' (header row required) or 'ndjson' (one JSON object per line)
+
+    Yields:
+        tuple: (line number, row dict), or (line number, error message) for
+        lines that don't parse
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'ndjson':
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, 'Invalid JSON'
+                continue
+            yield line_no, row if isinstance(row, dict) else 'Expected a JSON object'
+        return
+
+    # Line 1 is the header
+    for line_no, row in enumerate(csv.DictReader(text), start=2):
+        yield line_no, row
+
+def detect_format(filename=None, content_type=None):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'json' in (content_type or ''):
+        return 'ndjson'
+    return 'csv'
+
+def limit_rows(rows, limit):
+    """Pass through the first `limit` rows, then report the cut-off as a row error."""
+    for count, (line_no, row) in enumerate(rows):
+        if count == limit:
+            yield line_no, f'Row limit of {limit} reached; import larger files with bulk_import.py'
+            return
+        yield line_no, row
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _field(row, name):
+    value = row.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+def _is_user_id(value):
+    # NDJSON may carry the id as a number, CSV always as text
+    if isinstance(value, str):
+        value = int(value) if value.isdecimal() else 0
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value < 2 ** 63
+
+def import_users(rows, chunk_size=CHUNK_SIZE):
+    """
+    Create accounts in chunks: one IN query, one parallel hashing pass and
+    one bulk insert per chunk, committed per chunk. Emails registered while
+    the chunk was hashing are reported as row errors.
+
+    Args:
+        rows: (line number, row) pairs from read_rows; rows need email and
+            password, role defaults to student
+
+    Returns:
+        dict: Rows processed, accounts created and per-row errors
+    """
+    report = {'processed': 0, 'created': 0, 'errors': []}
+    seen = set()
+
+    for chunk in _chunks(rows, chunk_size):
+        candidates = []
+        for line_no, row in chunk:
+            report['processed'] += 1
+            if isinstance(row, str):
+                report['errors'].append({'line': line_no, 'message': row})
+                continue
+            email = _field(row, 'email')
+            password = _field(row, 'password')
+            role = _field(row, 'role') or 'student'
+            # NDJSON values can be any JSON type
+            if not isinstance(email, str) or '@' not in email:
+                report['errors'].append({'line': line_no, 'message': 'Invalid email'})
+            elif not password:
+                report['errors'].append({'line': line_no, 'email': email, 'message': 'Missing password'})
+            elif not isinstance(password, str):
+                report['errors'].append({'line': line_no, 'email': email, 'message': 'Invalid password'})
+            elif role not in ROLES:
+                report['errors'].append({'line': line_no, 'email': email, 'message': f'Unknown role {role}'})
+            elif email in seen:
+                report['errors'].append({'line': line_no, 'email': email, 'message': 'Duplicate email in file'})
+            else:
+                seen.add(email)
+                candidates.append((line_no, email, password, role))
+
+        if not candidates:
+            continue
+
+        existing = {e for (e,) in db.session.query(User.email).filter(User.email.in_([c[1] for c in candidates]))}
+        new_users = []
+        for line_no, email, password, role in candidates:
+            if email in existing:
+                report['errors'].append({'line': line_no, 'email': email, 'message': 'User already exists'})
+            else:
+                new_users.append((line_no, email, password, role))
+
+        hashes = hash_passwords([password for _, _, password, _ in new_users])
+        now = datetime.utcnow()
+        while new_users:
+            try:
+                db.session.bulk_insert_mappings(User, [
+                    {'email': email, 'password_hash': hashed, 'role': role, 'balance_paise': 0, 'created_at': now}
+                    for (_, email, _, role), hashed in zip(new_users, hashes)
+                ])
+                db.session.commit()
+                break
+            except IntegrityError:
+                # Registered since the check above: report those rows, retry the rest
+                db.session.rollback()
+                taken = {e for (e,) in db.session.query(User.email).filter(User.email.in_([u[1] for u in new_users]))}
+                if not taken:
+                    raise
+                kept = [(user, hashed) for user, hashed in zip(new_users, hashes) if user[1] not in taken]
+                for line_no, email, _, _ in new_users:
+                    if email in taken:
+                        report['errors'].append({'line': line_no, 'email': email, 'message': 'User already exists'})
+                new_users = [user for user, _ in kept]
+                hashes = [hashed for _, hashed in kept]
+        report['created'] += len(new_users)
+
+    report['errors'].sort(key=lambda e: e['line'])
+    return report
+
+def _wallet_events(ledger, user_ids):
+    # One event per credited wallet, built before the commit expires anything
+    balances = dict(db.session.query(User.id, User.balance_paise).filter(User.id.in_(user_ids)))
+    rows = {}
+    for mapping in ledger:
+        rows.setdefault(mapping['user_id'], []).append(Transaction(skipped=False, **mapping))
+    return {user_id: wallet_event(to_rupees(balances[user_id]), transactions) for user_id, transactions in rows.items()}
+
+def import_topups(rows, chunk_size=CHUNK_SIZE):
+    """
+    Credit wallets from a bank-transfer file in chunked commits.
+
+    Each chunk resolves its emails with one IN query, inserts the ledger rows
+    in bulk and applies the balance increments as one executemany UPDATE, so
+    concurrent payments are never overwritten. Credited wallets get one
+    wallet event each once their chunk commits.
+
+    Args:
+        rows: (line number, row) pairs from read_rows; rows need email (or
+            user_id) and amount, with optional source and reference
+
+    Returns:
+        dict: Rows processed, wallets credited, total credited and per-row errors
+    """
+    report = {'processed': 0, 'credited': 0, 'total_amount': 0, 'errors': []}
+    total_paise = 0
+    increment = update(User.__table__)\
+        .where(User.__table__.c.id == bindparam('target_id'))\
+        .values(balance=User.__table__.c.balance + bindparam('delta'))
+
+    for chunk in _chunks(rows, chunk_size):
+        valid = []
+        for line_no, row in chunk:
+            report['processed'] += 1
+            if isinstance(row, str):
+                report['errors'].append({'line': line_no, 'message': row})
+                continue
+            try:
+                amount_paise = to_paise(_field(row, 'amount'))
+            except (InvalidOperation, TypeError, ValueError):
+                amount_paise = None
+            email = _field(row, 'email')
+            user_id = _field(row, 'user_id')
+            source = _field(row, 'source') or 'parent'
+            if amount_paise is None or amount_paise <= 0:
+                report['errors'].append({'line': line_no, 'message': 'Invalid amount'})
+            elif amount_paise > MAX_TOPUP * 100:
+                report['errors'].append({'line': line_no, 'message': f'Maximum top-up amount is ₹{MAX_TOPUP}'})
+            elif not email and not user_id:
+                report['errors'].append({'line': line_no, 'message': 'Missing email or user_id'})
+            # NDJSON values can be any JSON type
+            elif email and not isinstance(email, str):
+                report['errors'].append({'line': line_no, 'message': 'Invalid email'})
+            elif not email and not _is_user_id(user_id):
+                report['errors'].append({'line': line_no, 'message': 'Invalid user_id'})
+            elif not isinstance(source, str):
+                report['errors'].append({'line': line_no, 'message': 'Invalid source'})
+            else:
+                valid.append((line_no, email or None, None if email else int(user_id), source,
+                              _field(row, 'reference'), amount_paise))
+
+        emails = [email for _, email, _, _, _, _ in valid if email]
+        ids = [user_id for _, email, user_id, _, _, _ in valid if not email]
+        by_email = dict(db.session.query(User.email, User.id).filter(User.email.in_(emails))) if emails else {}
+        known_ids = {i for (i,) in db.session.query(User.id).filter(User.id.in_(ids))} if ids else set()
+
+        now = datetime.utcnow()
+        ledger = []
+        deltas = {}
+        by_source = {}
+        for line_no, email, user_id, source, reference, amount_paise in valid:
+            user_id = by_email.get(email) if email else (user_id if user_id in known_ids else None)
+            if user_id is None:
+                report['errors'].append({'line': line_no, 'email': email, 'message': 'User not found'})
+                continue
+
+            ledger.append({
+                'user_id': user_id,
+                'amount_paise': amount_paise,
+                'transaction_type': 'top-up',
+                'description': f'Bank transfer {reference}' if reference else 'Bank transfer',
+                'source': source,
+                'status': 'success',
+                'timestamp': now
+            })
+            deltas[user_id] = deltas.get(user_id, 0) + amount_paise
+            count, amount = by_source.get(source, (0, 0))
+            by_source[source] = (count + 1, amount + amount_paise)
+
+        if not ledger:
+            continue
+
+        # Row ids are only needed for the wallet events
+        streams = current_app.config['WALLET_STREAM_ENABLED']
+        db.session.bulk_insert_mappings(Transaction, ledger, return_defaults=streams)
+        db.session.execute(increment, [{'target_id': u, 'delta': d} for u, d in deltas.items()])
+        for source, (count, amount) in by_source.items():
+            record_daily_stat(Transaction(transaction_type='top-up', source=source,
+                                          amount_paise=amount, timestamp=now), tx_count=count)
+        events = _wallet_events(ledger, deltas) if streams else {}
+        db.session.commit()
+        for user_id, event in events.items():
+            publish_wallet_event(user_id, event)
+
+        report['credited'] += len(ledger)
+        total_paise += sum(deltas.values())
+
+    report['total_amount'] = to_rupees(total_paise)
+    report['errors'].sort(key=lambda e: e['line'])
+    return report
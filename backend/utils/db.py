@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from functools import wraps
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from flask import g, request, current_app, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+
+# Bind key of the optional read-only engine or replica (SQLALCHEMY_BINDS['read'])
+READ_BIND = 'read'
+
+# INSERT ... ON CONFLICT builders; other databases update, then insert if missing
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def insert_for_dialect(session):
+    """The session's INSERT ... ON CONFLICT builder, or None if its database has none."""
+    return UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs issued by @read_only views to the read engine.
+    Writes, flushes and every other view keep using the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_routed() and isinstance(clause, sa.Select):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _reads_routed():
+    return has_app_context() and g.get('db_read_only', False)
+
+def read_only(f):
+    """
+    Route the view's queries to the read engine, if one is configured.
+
+    A user who wrote within READ_YOUR_WRITES_WINDOW seconds reads from the
+    primary instead, so a lagging replica never hides their own changes.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        user = getattr(request, 'user', None)
+        g.db_read_only = not (user and wrote_recently(user['user_id']))
+        return f(*args, **kwargs)
+    return decorated
+
+def wrote_recently(user_id):
+    """
+    Whether the user wrote within READ_YOUR_WRITES_WINDOW seconds.
+
+    The marker lives in the primary's recent_writes table, so a write served
+    by one worker pins the user's reads on every other worker too.
+    """
+    from models import db, RecentWrite
+
+    if not _tracks_writes(db):
+        return False
+    window = current_app.config['READ_YOUR_WRITES_WINDOW']
+    written_at = db.session.query(RecentWrite.written_at).filter_by(user_id=user_id).scalar()
+    return written_at is not None and written_at > datetime.utcnow() - timedelta(seconds=window)
+
+def _tracks_writes(db):
+    # Only a separate replica can lag; reads of the primary's own file can't
+    config = current_app.config
+    return config.get('READ_REPLICA', False) and config.get('READ_YOUR_WRITES_WINDOW', 0) > 0 \
+        and READ_BIND in db.engines
+
+def mark_written(session, user_ids):
+    """Stamp the users' recent_writes rows inside the session's transaction."""
+    from models import RecentWrite
+
+    if not _tracks_writes(session._db):
+        return
+    table = RecentWrite.__table__
+    now = datetime.utcnow()
+    # Sorted, so concurrent writers lock the rows in the same order
+    user_ids = sorted(user_ids)
+    insert = insert_for_dialect(session)
+    if insert is None:
+        for user_id in user_ids:
+            updated = session.execute(sa.update(table).where(table.c.user_id == user_id).values(written_at=now))
+            if updated.rowcount == 0:
+                session.execute(sa.insert(table).values(user_id=user_id, written_at=now))
+        return
+    stmt = insert(table).values([{'user_id': user_id, 'written_at': now} for user_id in user_ids])
+    session.execute(stmt.on_conflict_do_update(index_elements=[table.c.user_id],
+                                               set_={'written_at': stmt.excluded.written_at}))
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _collect_writers(session, flush_context):
+    # The acting user and every user whose rows changed (e.g. a refunded student).
+    # Scripts and CLI jobs don't read back through views, so only requests count.
+    if not has_request_context() or not _tracks_writes(session._db):
+        return
+    writers = session.info.setdefault('written_user_ids', set())
+    if getattr(request, 'user', None):
+        writers.add(request.user['user_id'])
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        user_id = obj.id if obj.__tablename__ == 'users' else getattr(obj, 'user_id', None)
+        if user_id is not None:
+            writers.add(user_id)
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _remember_writers(session):
+    # Committed together with the writes themselves
+    if not has_request_context() or not _tracks_writes(session._db):
+        return
+    session.flush()
+    writers = session.info.pop('written_user_ids', None)
+    if writers:
+        mark_written(session, writers)
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writers(session):
+    session.info.pop('written_user_ids', None)
+
+def configure_engines(app, db):
+    """
+    Apply SQLITE_PRAGMAS to every connection the app's SQLite engines open.
+
+    Must run inside an app context, before the first connection is made.
+    """
+    # The read bind serves the primary's tables and has none of its own; keep
+    # create_all()/drop_all() off it, including for later apps without one
+    db.metadatas.pop(READ_BIND, None)
+
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    for key, engine in db.engines.items():
+        if engine.dialect.name != 'sqlite' or not pragmas:
+            continue
+        # The read engine opens the file read-only and can't switch journal mode
+        read_engine = key == READ_BIND
+        event.listen(engine, 'connect', _pragma_listener(pragmas, read_engine))
+
+def _pragma_listener(pragmas, read_engine):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if read_engine and name == 'journal_mode':
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+        if read_engine:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return set_pragmas
@@ -0,0 +1,191 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+
+# Events buffered per open stream; a client that falls further behind loses
+# the oldest ones (every event carries the full balance, so it catches up)
+STREAM_QUEUE_SIZE = 100
+
+class MemoryBroker:
+    """In-process pub/sub: events reach the streams open on this worker."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        q = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues:
+                queues.discard(q)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id, event):
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        for q in queues:
+            while True:
+                try:
+                    q.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+class DatabaseBroker(MemoryBroker):
+    """
+    Stand-in for an external broker when running several workers.
+
+    Publishing appends to the wallet_events table; a thread in each worker
+    polls it and fans new rows out to that worker's streams.
+    """
+
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+        self._last_id = None
+        self._pruned_at = None
+        self._thread = None
+        self._poller_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def subscribe(self, user_id):
+        self._ensure_poller()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        from models import db, WalletEvent
+
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(WalletEvent).values(
+                user_id=user_id, payload=json.dumps(event), created_at=datetime.utcnow()
+            ))
+            # Publishers prune too: the poller only runs while someone listens
+            self._prune(conn)
+
+    def poll(self):
+        """Deliver rows added since the last poll and prune expired ones."""
+        from models import db, WalletEvent
+
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                if self._last_id is None:
+                    self._last_id = conn.execute(db.select(db.func.coalesce(db.func.max(WalletEvent.id), 0))).scalar()
+                    return 0
+                rows = conn.execute(
+                    db.select(WalletEvent.id, WalletEvent.user_id, WalletEvent.payload)
+                    .where(WalletEvent.id > self._last_id).order_by(WalletEvent.id)
+                ).all()
+                self._prune(conn)
+
+        for event_id, user_id, payload in rows:
+            self._last_id = event_id
+            self._deliver(user_id, json.loads(payload))
+        return len(rows)
+
+    def _prune(self, conn):
+        # Rows older than EVENT_RETENTION, at most once per retention period per worker
+        from models import db, WalletEvent
+
+        retention = self._app.config['EVENT_RETENTION']
+        now = time.monotonic()
+        if self._pruned_at is not None and now - self._pruned_at < retention:
+            return
+        self._pruned_at = now
+        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+        conn.execute(db.delete(WalletEvent).where(WalletEvent.created_at < cutoff))
+
+    def close(self):
+        """Stop this worker's poll thread."""
+        self._stopped.set()
+
+    def _ensure_poller(self):
+        with self._poller_lock:
+            if self._thread is not None:
+                return
+            self.poll() # start from the current tail, not the whole table
+            self._thread = threading.Thread(target=self._run, name='wallet-events', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = self._app.config['EVENT_POLL_INTERVAL']
+        while not self._stopped.wait(interval):
+            try:
+                self.poll()
+            except Exception:
+                self._app.logger.exception("wallet event poll failed")
+
+BROKERS = {
+    'memory': lambda app: MemoryBroker(),
+    'database': DatabaseBroker,
+}
+
+def init_events(app):
+    name = app.config['EVENT_BROKER']
+    if name not in BROKERS:
+        raise ValueError(f"Unknown EVENT_BROKER {name!r}; expected one of {', '.join(BROKERS)}")
+    if app.config['WALLET_STREAM_ENABLED']:
+        # Each open stream holds its worker (sync) or an executor thread
+        # (uvicorn) until the client goes away
+        if app.config['WORKER_PROFILE'] != 'gevent':
+            raise ValueError(f"WALLET_STREAM_ENABLED needs WORKER_PROFILE=gevent, "
+                             f"not {app.config['WORKER_PROFILE']!r}")
+        if name == 'memory' and app.config['WEB_CONCURRENCY'] > 1:
+            raise ValueError("WALLET_STREAM_ENABLED with several workers needs EVENT_BROKER=database; "
+                             "'memory' only reaches the publishing worker's streams")
+    app.extensions['wallet_events'] = BROKERS[name](app)
+
+def get_broker():
+    return current_app.extensions['wallet_events']
+
+def wallet_event(balance, transactions):
+    """
+    Build the event pushed to a user's open streams.
+
+    Serialize before committing: after commit every row would be reloaded.
+
+    Args:
+        balance: The wallet balance in rupees after the write
+        transactions: The Transaction rows the write added
+
+    Returns:
+        dict: JSON-ready event body
+    """
+    return {'balance': balance, 'transactions': [t.to_dict() for t in transactions]}
+
+def publish_wallet_event(user_id, event):
+    """
+    Push an event to the user's streams. Call only after the write commits.
+
+    The money has moved by then, so a failed publish is logged rather than
+    raised: an error response would make POS terminals retry the charge.
+    Streams catch up on the next event, which carries the full balance.
+    """
+    if not current_app.config['WALLET_STREAM_ENABLED']:
+        return
+    try:
+        get_broker().publish(user_id, event)
+    except Exception:
+        current_app.logger.exception("wallet event publish failed")
+
+def format_sse(event, name='wallet'):
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
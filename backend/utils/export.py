@@ -0,0 +1,169 @@
+import csv
+import heapq
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import literal
+from models import db, User, Transaction, ArchivedTransaction
+from utils.archive import archive_cutoff, OPENING_BALANCE
+from utils.money import to_rupees
+
+EXPORT_COLUMNS = ('id', 'timestamp', 'user_id', 'email', 'transaction_type', 'amount', 'venue', 'source',
+                  'status', 'description', 'term')
+BATCH_SIZE = 1000
+# Output is buffered and written (and compressed) in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+def parse_range(start, end):
+    """
+    Parse the export window from ISO dates or timestamps.
+
+    A date-only `end` is inclusive: to=2026-04-30 exports the whole of that day.
+    Bounds with an offset (or Z) are converted to the naive UTC the ledger stores.
+
+    Returns:
+        tuple: (start, end) datetimes, either may be None
+
+    Raises:
+        ValueError: If a bound doesn't parse or the window is empty
+    """
+    start_at = _parse_bound(start) if start else None
+    end_at = None
+    if end:
+        end_at = _parse_bound(end)
+        if len(end) == len(date.min.isoformat()):
+            end_at += timedelta(days=1)
+    if start_at and end_at and start_at >= end_at:
+        raise ValueError('from must be before to')
+    return start_at, end_at
+
+def _parse_bound(value):
+    bound = datetime.fromisoformat(value)
+    if bound.tzinfo is not None:
+        bound = bound.astimezone(timezone.utc).replace(tzinfo=None)
+    return bound
+
+def ledger_rows(start=None, end=None, venue=None):
+    """
+    Stream ledger rows in [start, end), oldest first, from server-side cursors.
+
+    Archived terms are merged in when the window reaches before the archive
+    cutoff. Carried-forward opening balances are left out: they restate
+    archived rows rather than move money.
+
+    Yields:
+        Row: One row per transaction in EXPORT_COLUMNS order, amount in paise
+    """
+    streams = [_rows(model, start, end, venue) for model in _sources(start)]
+    return heapq.merge(*streams, key=lambda row: (row.timestamp, row.id))
+
+def count_rows(start=None, end=None, venue=None):
+    """Number of rows ledger_rows() would yield for the same window."""
+    return sum(_in_window(model, db.session.query(db.func.count(model.id)), start, end, venue).scalar()
+               for model in _sources(start))
+
+def _sources(start):
+    # The archive only holds rows from before its cutoff
+    cutoff = archive_cutoff()
+    if cutoff is not None and (start is None or start < cutoff):
+        return (Transaction, ArchivedTransaction)
+    return (Transaction,)
+
+def _in_window(model, query, start, end, venue):
+    query = query.filter(model.transaction_type != OPENING_BALANCE)
+    if start:
+        query = query.filter(model.timestamp >= start)
+    if end:
+        query = query.filter(model.timestamp < end)
+    if venue:
+        query = query.filter(model.venue == venue)
+    return query
+
+def _rows(model, start, end, venue):
+    term = model.term if model is ArchivedTransaction else literal(None)
+    query = db.session.query(
+        model.id, model.timestamp, model.user_id, User.email, model.transaction_type, model.amount_paise,
+        model.venue, model.source, model.status, model.description, term.label('term')
+    ).join(User, User.id == model.user_id)
+    query = _in_window(model, query, start, end, venue)
+    return query.order_by(model.timestamp, model.id).execution_options(stream_results=True).yield_per(BATCH_SIZE)
+
+class Settlement:
+    """Per-venue meal takings and per-type totals, accumulated row by row during an export."""
+
+    def __init__(self):
+        self.venues = {}
+        self.types = {}
+
+    def add(self, tx_type, status, venue, amount_paise):
+        count, amount = self.types.get(tx_type, (0, 0))
+        self.types[tx_type] = (count + 1, amount + amount_paise)
+        # Vendors are paid for meals actually charged
+        if tx_type == 'deduction' and status == 'success':
+            meals, takings = self.venues.get(venue or '', (0, 0))
+            self.venues[venue or ''] = (meals + 1, takings - amount_paise)
+
+    def to_dict(self):
+        return {
+            'venues': {venue: {'meals': meals, 'amount': to_rupees(takings)}
+                       for venue, (meals, takings) in sorted(self.venues.items())},
+            'totals': {tx_type: {'count': count, 'amount': to_rupees(amount)}
+                       for tx_type, (count, amount) in sorted(self.types.items())}
+        }
+
+def _records(rows, settlement):
+    # Rows come in EXPORT_COLUMNS order; each is folded into the settlement
+    # on its way out
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        settlement.add(record['transaction_type'], record['status'], record['venue'], record['amount'])
+        record['timestamp'] = record['timestamp'].isoformat()
+        record['amount'] = to_rupees(record['amount'])
+        yield record
+
+def export_csv(rows, settlement):
+    """
+    CSV of the rows, then a blank line and a settlement section with its own
+    header (venue, meals, amount). Yields text in ~64 KB chunks.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for record in _records(rows, settlement):
+        writer.writerow(record.values())
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    writer.writerow([])
+    writer.writerow(('settlement_venue', 'meals', 'amount'))
+    for venue, totals in settlement.to_dict()['venues'].items():
+        writer.writerow((venue, totals['meals'], totals['amount']))
+    yield buffer.getvalue()
+
+def export_ndjson_gzip(rows, settlement):
+    """
+    Gzipped NDJSON, one object per row and a final {"record": "settlement"}
+    object. Compressed in ~64 KB chunks, so memory stays flat.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip container
+    lines, size = [], 0
+    for record in _records(rows, settlement):
+        line = json.dumps(record) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            data = compressor.compress(''.join(lines).encode('utf-8'))
+            lines, size = [], 0
+            if data:
+                yield data
+
+    lines.append(json.dumps({'record': 'settlement', **settlement.to_dict()}) + '\n')
+    yield compressor.compress(''.join(lines).encode('utf-8')) + compressor.flush()
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'ndjson': (export_ndjson_gzip, 'application/gzip', 'ndjson.gz'),
+}
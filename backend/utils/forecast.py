@@ -0,0 +1,177 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
+from models import db, Transaction, MealSkip
+from utils.cache import TTLCache
+
+MEAL_SLOTS = ('BREAKFAST', 'LUNCH', 'DINNER')
+# Menu prices (rupees) for a slot with no deduction history yet
+DEFAULT_SLOT_COSTS = {'BREAKFAST': 30, 'LUNCH': 70, 'DINNER': 60}
+
+# Kitchen tablets poll this every few seconds; writes to meal_skips invalidate it
+_forecast_cache = TTLCache(maxsize=64, ttl=300)
+
+def campus_zone():
+    return ZoneInfo(current_app.config.get('CAMPUS_TIMEZONE', 'Asia/Kolkata'))
+
+def campus_time(timestamp=None):
+    """Campus wall-clock time of a naive UTC timestamp (default now)."""
+    timestamp = timestamp or datetime.utcnow()
+    return timestamp.replace(tzinfo=timezone.utc).astimezone(campus_zone())
+
+def campus_today():
+    return campus_time().date()
+
+def campus_to_utc(local):
+    """Naive UTC timestamp of a naive campus wall-clock time."""
+    return local.replace(tzinfo=campus_zone()).astimezone(timezone.utc).replace(tzinfo=None)
+
+def meal_slot_for_hour(hour):
+    if hour < 10:
+        return 'BREAKFAST'
+    if hour < 15:
+        return 'LUNCH'
+    return 'DINNER'
+
+def get_forecast(days):
+    """
+    Cached expected headcount per (date, meal_slot, venue) for the next N days.
+
+    Args:
+        days: Forecast horizon starting tomorrow
+
+    Returns:
+        dict: Forecast rows and the projected waste reduction
+    """
+    key = (campus_today(), days)
+    forecast = _forecast_cache.get(key)
+    if forecast is None:
+        forecast = compute_forecast(days)
+        _forecast_cache.set(key, forecast, ttl=current_app.config.get('FORECAST_CACHE_TTL', 300))
+    return forecast
+
+def get_slot_costs():
+    """
+    Cached average meal price per slot across all venues, in paise.
+
+    Returns:
+        dict: meal_slot -> average deduction over the lookback window
+    """
+    key = ('slot_costs', campus_today())
+    costs = _forecast_cache.get(key)
+    if costs is None:
+        costs = compute_slot_costs()
+        _forecast_cache.set(key, costs, ttl=current_app.config.get('FORECAST_CACHE_TTL', 300))
+    return costs
+
+def compute_slot_costs():
+    lookback_days = current_app.config.get('FORECAST_LOOKBACK_DAYS', 28)
+    since = datetime.utcnow() - timedelta(days=lookback_days)
+
+    totals = {slot: [0, 0] for slot in MEAL_SLOTS}
+    for served_at, count, amount in _served_quarters(since):
+        slot_total = totals[meal_slot_for_hour(served_at.hour)]
+        slot_total[0] += count
+        slot_total[1] -= amount or 0
+
+    return {
+        slot: total / count if count else DEFAULT_SLOT_COSTS[slot] * 100
+        for slot, (count, total) in totals.items()
+    }
+
+def _served_quarters(since, *columns):
+    """
+    Deductions since a time, counted and summed per quarter hour.
+
+    Ledger timestamps are naive UTC. A quarter hour lies within one campus
+    slot and date whatever the zone's offset (e.g. +05:30), so buckets are
+    grouped in SQL and converted to campus time here.
+
+    Args:
+        since: Naive UTC start of the window
+        columns: Extra Transaction columns to group by
+
+    Returns:
+        list: (*columns, campus served_at, count, amount_paise) tuples
+    """
+    minute = db.extract('minute', Transaction.timestamp)
+    served = db.session.query(
+        *columns,
+        db.func.date(Transaction.timestamp).label('day'),
+        db.extract('hour', Transaction.timestamp).label('hour'),
+        db.case((minute < 15, 0), (minute < 30, 15), (minute < 45, 30), else_=45).label('minute'),
+        Transaction.amount_paise
+    ).filter(Transaction.transaction_type == 'deduction', Transaction.timestamp >= since).subquery()
+
+    keys = [served.c[column.key] for column in columns] + [served.c.day, served.c.hour, served.c.minute]
+    rows = db.session.query(*keys, db.func.count(), db.func.sum(served.c.amount_paise)).group_by(*keys).all()
+
+    buckets = []
+    for *grouped, day, hour, minute, count, amount in rows:
+        # SQLite returns date() as text
+        day = day if isinstance(day, date) else date.fromisoformat(day)
+        served_at = campus_time(datetime(day.year, day.month, day.day, int(hour), int(minute)))
+        buckets.append((*grouped, served_at, count, amount))
+    return buckets
+
+def invalidate_forecast():
+    _forecast_cache.invalidate()
+
+def forecast_cache_stats():
+    return _forecast_cache.stats()
+
+def compute_forecast(days):
+    lookback_days = current_app.config.get('FORECAST_LOOKBACK_DAYS', 28)
+    since = datetime.utcnow() - timedelta(days=lookback_days)
+    served = _served_quarters(since, Transaction.venue)
+
+    # Days the canteens were actually serving, so closures don't dilute the average
+    active_days = len({served_at.date() for _, served_at, _, _ in served})
+
+    # Average daily headcount per (meal_slot, venue)
+    baseline = {slot: {} for slot in MEAL_SLOTS}
+    for venue, served_at, count, _ in served:
+        per_slot = baseline[meal_slot_for_hour(served_at.hour)]
+        per_slot[venue] = per_slot.get(venue, 0.0) + count / active_days
+
+    start = campus_today() + timedelta(days=1)
+    end = start + timedelta(days=days - 1)
+    skips = db.session.query(
+        MealSkip.skip_date, MealSkip.meal_slot, db.func.count(MealSkip.id)
+    ).filter(MealSkip.skip_date >= start, MealSkip.skip_date <= end)\
+     .group_by(MealSkip.skip_date, MealSkip.meal_slot).all()
+    skip_counts = {(d, slot): count for d, slot, count in skips}
+
+    rows = []
+    total_baseline = 0.0
+    total_skipped = 0.0
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for slot in MEAL_SLOTS:
+            venues = baseline[slot]
+            slot_total = sum(venues.values())
+            skipped = skip_counts.get((day, slot), 0)
+            for venue, expected in sorted(venues.items(), key=lambda v: v[0] or ''):
+                # Skips aren't tied to a venue; spread them by each venue's share
+                venue_skips = skipped * expected / slot_total
+                venue_skips = min(venue_skips, expected)
+                total_baseline += expected
+                total_skipped += venue_skips
+                rows.append({
+                    'date': day.isoformat(),
+                    'meal_slot': slot,
+                    'venue': venue,
+                    'baseline_headcount': round(expected, 1),
+                    'skips': round(venue_skips, 1),
+                    'expected_headcount': round(expected - venue_skips)
+                })
+
+    waste_reduction = round(total_skipped / total_baseline * 100, 1) if total_baseline else 0.0
+
+    return {
+        'days': days,
+        'lookback_days': lookback_days,
+        'generated_at': datetime.utcnow().isoformat(),
+        'forecast': rows,
+        'waste_reduction_pct': waste_reduction
+    }
@@ -0,0 +1,62 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from datetime import datetime
+from flask import current_app, has_app_context
+
+logger = logging.getLogger('campuseats')
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, event and the event's fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            'level': record.levelname.lower(),
+            'event': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        return json.dumps(entry, default=str)
+
+def init_logging(app):
+    """
+    Route the 'campuseats' logger through a queue so request threads never
+    block on stdout; a single background thread does the writing.
+    """
+    global _listener
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def log_event(event, level=logging.INFO, sample_rate=None, **fields):
+    """
+    Log a structured event, keeping only a sample of routine ones.
+
+    Args:
+        event: Dotted event name, e.g. 'wallet.topup'
+        level: Logging level; warnings and above are never sampled out
+        sample_rate: Fraction of events kept, defaults to LOG_SAMPLE_RATE
+        **fields: Event attributes written as JSON keys
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        if sample_rate is None:
+            sample_rate = current_app.config.get('LOG_SAMPLE_RATE', 1.0) if has_app_context() else 1.0
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return
+        fields['sample_rate'] = sample_rate
+    logger.log(level, event, extra={'fields': fields})
@@ -0,0 +1,136 @@
+import bisect
+import threading
+import time
+from flask import Response, g, request, current_app, has_request_context, jsonify
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, Prometheus style."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}
+                    for labels, s in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.snapshot().items()):
+            base = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            sep = ',' if base else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {series["count"]}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Per-process registry; each gunicorn worker exposes its own series
+REQUEST_LATENCY = Histogram('campuseats_request_duration_seconds',
+                            'Request latency by blueprint, endpoint, method and status',
+                            ('blueprint', 'endpoint', 'method', 'status'), LATENCY_BUCKETS)
+SQL_QUERIES = Histogram('campuseats_request_sql_queries',
+                        'SQL statements issued per request',
+                        ('blueprint', 'endpoint'), QUERY_BUCKETS)
+SQL_TIME = Histogram('campuseats_request_sql_seconds',
+                     'Time spent executing SQL per request',
+                     ('blueprint', 'endpoint'), LATENCY_BUCKETS)
+LOCK_WAIT = Histogram('campuseats_lock_wait_seconds',
+                      'Time in row-locking statements (FOR UPDATE and wallet updates) per request',
+                      ('blueprint', 'endpoint'), LATENCY_BUCKETS)
+HISTOGRAMS = (REQUEST_LATENCY, SQL_QUERIES, SQL_TIME, LOCK_WAIT)
+
+def init_metrics(app, db):
+    """
+    Install request timing, SQL hooks on every engine and the /metrics route.
+
+    Must run inside an app context (the engines are looked up there).
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+def _start_request():
+    g.metrics = {'start': time.perf_counter(), 'queries': 0, 'sql': 0.0, 'lock_wait': 0.0}
+
+def _finish_request(response):
+    stats = g.pop('metrics', None)
+    if stats is None or request.endpoint == 'metrics':
+        return response
+    blueprint = request.blueprint or ''
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.observe((blueprint, endpoint, request.method, str(response.status_code)),
+                            time.perf_counter() - stats['start'])
+    SQL_QUERIES.observe((blueprint, endpoint), stats['queries'])
+    SQL_TIME.observe((blueprint, endpoint), stats['sql'])
+    if stats['lock_wait']:
+        LOCK_WAIT.observe((blueprint, endpoint), stats['lock_wait'])
+    return response
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context: a statement that raises
+    # never reaches after_cursor_execute, and its start time goes with it
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if not has_request_context() or 'metrics' not in g:
+        return
+    stats = g.metrics
+    stats['queries'] += 1
+    stats['sql'] += elapsed
+    # Row locks are taken by SELECT ... FOR UPDATE and by statements tagged
+    # lock_wait (the conditional wallet UPDATE); their time is mostly waiting
+    tagged = context.execution_options.get('lock_wait')
+    if tagged or 'FOR UPDATE' in statement:
+        stats['lock_wait'] += elapsed
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'message': 'Invalid metrics token'}), 401
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
@@ -0,0 +1,30 @@
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+# Money is stored as integer paise; rupee floats only exist at the API edge
+PAISE_PER_RUPEE = 100
+
+def to_paise(rupees):
+    """Convert a rupee amount from the API (int, float or str) to integer paise."""
+    paise = Decimal(str(rupees)) * PAISE_PER_RUPEE
+    return int(paise.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def positive_paise(rupees):
+    """
+    Validate a rupee amount from a JSON body and convert it to paise.
+
+    Checked after rounding, so 0.001 (0 paise) is rejected like 0.
+
+    Returns:
+        int: The amount in paise, or None unless it is a number worth at least one paisa
+    """
+    if isinstance(rupees, bool) or not isinstance(rupees, (int, float)) or not math.isfinite(rupees):
+        return None
+    paise = to_paise(rupees)
+    return paise if paise > 0 else None
+
+def to_rupees(paise):
+    """Convert integer paise to the rupee float the API returns."""
+    if paise is None:
+        return None
+    return paise / PAISE_PER_RUPEE
@@ -0,0 +1,97 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from flask import current_app, has_request_context
+
+class HashingBusy(Exception):
+    """Raised when the password hashing queue is full; callers answer 429."""
+    retry_after = 1
+
+# bcrypt burns ~250 ms of CPU per call at the default cost. Workers that
+# serve many requests at once (gevent, uvicorn) run it in a separate bounded
+# process pool so payments keep flowing; a sync worker serves one request at
+# a time and would only wait on the pool, so it hashes inline
+CONCURRENT_PROFILES = ('gevent', 'uvicorn')
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def _offloaded():
+    if current_app.config['BCRYPT_POOL_SIZE'] <= 0:
+        return False
+    # Offline jobs (bulk_import.py) have the whole process to themselves
+    return not has_request_context() or current_app.config['WORKER_PROFILE'] in CONCURRENT_PROFILES
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    size = current_app.config['BCRYPT_POOL_SIZE']
+    queue = current_app.config['BCRYPT_QUEUE_SIZE'] or size * 4
+    with _pool_lock:
+        # A pool inherited through fork (gunicorn workers) is not usable
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=size)
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(queue)
+        return _pool, _slots
+
+def _run(fn, *args):
+    if not _offloaded():
+        return fn(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def hash_password(password):
+    hashed = _run(_hashpw, password.encode('utf-8'), current_app.config['BCRYPT_ROUNDS'])
+    return hashed.decode('utf-8')
+
+def check_password(password, hashed):
+    return _run(_checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_passwords(passwords):
+    """
+    Hash many passwords in parallel across the pool (bulk provisioning).
+
+    Each job waits for a free queue slot instead of failing, so a batch
+    never holds more than BCRYPT_QUEUE_SIZE slots; logins arriving
+    meanwhile may get 429. Keep request batches to BULK_IMPORT_USERS_MAX_ROWS.
+    """
+    rounds = current_app.config['BCRYPT_ROUNDS']
+    encoded = [p.encode('utf-8') for p in passwords]
+    if not _offloaded():
+        return [_hashpw(p, rounds).decode('utf-8') for p in encoded]
+
+    pool, slots = _get_pool()
+    futures = []
+    for password in encoded:
+        slots.acquire()
+        try:
+            future = pool.submit(_hashpw, password, rounds)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    return [future.result().decode('utf-8') for future in futures]
+
+def needs_rehash(hashed):
+    """True when the stored hash was made with a different cost than configured."""
+    try:
+        rounds = int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return False
+    return rounds != current_app.config['BCRYPT_ROUNDS']
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import io
+import os
+import struct
+import time
+import qrcode
+import qrcode.image.svg
+from flask import current_app
+from utils.cache import TTLCache
+
+QR_VALIDITY_SECONDS = 5 * 60
+# Hand out a fresh code once less than this is left, so students
+# never walk up to the counter with a code about to expire
+QR_REFRESH_MARGIN = 60
+
+QR_FORMATS = ('png', 'svg', 'payload')
+
+# Signed token layout: version | user_id | expires | nonce, then a truncated
+# HMAC-SHA256 tag. 25 bytes -> 40 base32 characters, which fit the QR
+# alphanumeric mode and keep the code at a low version.
+QR_TOKEN_VERSION = 1
+_TOKEN_HEADER = struct.Struct('>BII')
+_NONCE_BYTES = 6
+_MAC_BYTES = 10
+_BODY_BYTES = _TOKEN_HEADER.size + _NONCE_BYTES
+_TOKEN_BYTES = _BODY_BYTES + _MAC_BYTES
+
+# (qr_data, format) -> data URI
+_image_cache = TTLCache(maxsize=50000)
+
+def get_qr_payload(user_id):
+    """
+    Current QR payload for a user, the same on every worker until it is
+    close to expiry or redeemed.
+
+    The expiry is aligned to a refresh window and the nonce is derived from
+    it and the user's latest redemption, so no per-process state can go
+    stale: once a code is spent, every worker hands out a new one.
+
+    Returns:
+        tuple: (qr_data string, expires timestamp)
+    """
+    from models import db, QrRedemption
+
+    period = QR_VALIDITY_SECONDS - QR_REFRESH_MARGIN
+    # CRITICAL: Use time.time() for correct UTC timestamp
+    expires = int(time.time()) // period * period + QR_VALIDITY_SECONDS
+    last_redemption = db.session.query(db.func.max(QrRedemption.id))\
+        .filter(QrRedemption.user_id == user_id).scalar() or 0
+
+    key = current_app.config['QR_SECRET_KEY']
+    nonce = _sign(b'nonce' + struct.pack('>IIQ', user_id, expires, last_redemption), key)[:_NONCE_BYTES]
+    return encode_qr_token(user_id, expires, key, nonce=nonce), expires
+
+def render_qr(qr_data, expires, fmt):
+    """
+    Render a QR payload as a data URI, cached for the payload's lifetime.
+
+    Args:
+        qr_data: String encoded in the QR
+        expires: Payload expiry timestamp, used as the cache expiry
+        fmt: 'png' or 'svg'
+    """
+    key = (qr_data, fmt)
+    image = _image_cache.get(key)
+    if image is None:
+        image = _render(qr_data, fmt)
+        _image_cache.set(key, image, expires_at=expires)
+    return image
+
+def _render(qr_data, fmt):
+    buffered = io.BytesIO()
+    if fmt == 'svg':
+        # Vector path output: no Pillow rasterising or PNG compression
+        qrcode.make(qr_data, image_factory=qrcode.image.svg.SvgPathImage).save(buffered)
+        mime = 'image/svg+xml'
+    else:
+        qrcode.make(qr_data).save(buffered, format="PNG")
+        mime = 'image/png'
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+    return f"data:{mime};base64,{img_str}"
+
+def encode_qr_token(user_id, expires, key, nonce=None):
+    """
+    Build a compact HMAC-signed QR token.
+
+    Args:
+        user_id: Wallet owner
+        expires: Expiry as a UTC unix timestamp
+        key: Signing secret (str or bytes)
+        nonce: 6 bytes that make the token unique, random by default
+
+    Returns:
+        str: 40-character base32 token
+    """
+    body = _TOKEN_HEADER.pack(QR_TOKEN_VERSION, user_id, int(expires)) + (nonce or os.urandom(_NONCE_BYTES))
+    return base64.b32encode(body + _sign(body, key)).decode()
+
+def verify_qr_token(token, key, now=None):
+    """
+    Check a QR token's format, signature and expiry without touching the database.
+
+    Args:
+        token: Token string scanned from the QR
+        key: Signing secret (str or bytes)
+        now: Current UTC unix timestamp, defaults to time.time()
+
+    Returns:
+        dict: user_id, expires and the 16-char qr_hash used for idempotency,
+        or an error message string
+    """
+    try:
+        raw = base64.b32decode(token.strip().upper())
+    except (binascii.Error, ValueError, AttributeError):
+        return 'Malformed QR code'
+    if len(raw) != _TOKEN_BYTES or raw[0] != QR_TOKEN_VERSION:
+        return 'Malformed QR code'
+
+    body, mac = raw[:_BODY_BYTES], raw[_BODY_BYTES:]
+    if not hmac.compare_digest(mac, _sign(body, key)):
+        return 'Invalid QR signature'
+
+    _, user_id, expires = _TOKEN_HEADER.unpack_from(body)
+    if (time.time() if now is None else now) > expires:
+        return 'QR code expired. Please generate a new QR code.'
+
+    return {
+        'user_id': user_id,
+        'expires': expires,
+        'qr_hash': hashlib.sha256(body).hexdigest()[:16]
+    }
+
+def _sign(body, key):
+    if isinstance(key, str):
+        key = key.encode()
+    return hmac.new(key, body, hashlib.sha256).digest()[:_MAC_BYTES]
+
+def qr_cache_stats():
+    return {'images': _image_cache.stats()}
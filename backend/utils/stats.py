@@ -0,0 +1,145 @@
+from datetime import date, datetime
+from flask import current_app
+from models import db, DailyStat, SpendStat, Transaction, ArchivedTransaction
+from utils.forecast import campus_time, meal_slot_for_hour
+from utils.archive import OPENING_BALANCE
+from utils.db import insert_for_dialect
+
+KEY_COLUMNS = ('stat_date', 'venue', 'transaction_type', 'source')
+
+def record_daily_stat(transaction, tx_count=1):
+    """
+    Add a ledger row to the daily rollup inside the caller's transaction.
+
+    Args:
+        transaction: The Transaction being written
+        tx_count: Ledger rows it stands for (bulk imports pass one summed row)
+    """
+    timestamp = transaction.timestamp or datetime.utcnow()
+    values = {
+        'stat_date': timestamp.date(),
+        'venue': transaction.venue or '',
+        'transaction_type': transaction.transaction_type,
+        'source': transaction.source or '',
+        'tx_count': tx_count,
+        'amount_sum_paise': transaction.amount_paise
+    }
+
+    insert = insert_for_dialect(db.session)
+    if insert is None:
+        # Generic fallback: read-modify-write under the caller's transaction
+        stat = DailyStat.query.filter_by(**{k: values[k] for k in KEY_COLUMNS}).first()
+        if stat is None:
+            db.session.add(DailyStat(**values))
+        else:
+            stat.tx_count += tx_count
+            stat.amount_sum_paise += transaction.amount_paise
+        return
+
+    table = DailyStat.__table__
+    columns = DailyStat.__mapper__.columns
+    stmt = insert(table).values({columns[k]: v for k, v in values.items()})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[columns[k] for k in KEY_COLUMNS],
+        set_={
+            table.c.tx_count: table.c.tx_count + stmt.excluded.tx_count,
+            table.c.amount_sum: table.c.amount_sum + stmt.excluded.amount_sum
+        }
+    )
+    db.session.execute(stmt)
+
+def rebuild_daily_stats():
+    """
+    Recompute the whole rollup from the transactions table and its archive.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    rows = []
+    # Archived terms still count; carried-forward opening balances are not new money
+    for model in (Transaction, ArchivedTransaction):
+        day = db.func.date(model.timestamp)
+        rows += db.session.query(
+            day, model.venue, model.transaction_type, model.source,
+            db.func.count(model.id), db.func.sum(model.amount_paise)
+        ).filter(model.transaction_type != OPENING_BALANCE)\
+         .group_by(day, model.venue, model.transaction_type, model.source).all()
+
+    # Rows whose venue/source differ only by NULL vs '' share a rollup key
+    merged = {}
+    for d, venue, tx_type, source, count, total in rows:
+        key = (d if isinstance(d, date) else date.fromisoformat(d), venue or '', tx_type, source or '')
+        prev_count, prev_total = merged.get(key, (0, 0))
+        merged[key] = (prev_count + count, prev_total + (total or 0))
+
+    DailyStat.query.delete()
+    db.session.bulk_insert_mappings(DailyStat, [
+        dict(zip(KEY_COLUMNS, key), tx_count=count, amount_sum_paise=total)
+        for key, (count, total) in merged.items()
+    ])
+    db.session.commit()
+    return len(merged)
+
+def slot_column(slot):
+    return f'{slot.lower()}_ewma_paise'
+
+def record_spend(transaction):
+    """
+    Fold a meal into the user's rolling spend stats, inside the caller's transaction.
+
+    Meals move the EWMA of their campus-time slot; other rows don't affect
+    the stats.
+
+    Args:
+        transaction: The Transaction being written
+    """
+    if transaction.transaction_type != 'deduction':
+        return
+    alpha = current_app.config['SPEND_EWMA_ALPHA']
+    column = slot_column(meal_slot_for_hour(campus_time(transaction.timestamp).hour))
+    values = {'user_id': transaction.user_id, column: float(-transaction.amount_paise), 'deduction_count': 1}
+
+    insert = insert_for_dialect(db.session)
+    if insert is None:
+        stat = db.session.get(SpendStat, transaction.user_id)
+        if stat is None:
+            db.session.add(SpendStat(**values))
+            return
+        previous = getattr(stat, column)
+        setattr(stat, column, values[column] if previous is None else previous + alpha * (values[column] - previous))
+        stat.deduction_count += 1
+        return
+
+    table = SpendStat.__table__
+    stmt = insert(table).values(values)
+    current, new = table.c[column], stmt.excluded[column]
+    updates = {
+        table.c.deduction_count: table.c.deduction_count + stmt.excluded.deduction_count,
+        current: db.case((current.is_(None), new), else_=current + alpha * (new - current))
+    }
+    db.session.execute(stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_=updates))
+
+def rebuild_spend_stats():
+    """
+    Recompute every user's spend stats by replaying their meals in order.
+
+    Returns:
+        int: Number of users with stats
+    """
+    alpha = current_app.config['SPEND_EWMA_ALPHA']
+    stats = {}
+    rows = db.session.query(Transaction.user_id, Transaction.amount_paise, Transaction.timestamp)\
+        .filter(Transaction.transaction_type == 'deduction')\
+        .order_by(Transaction.user_id, Transaction.timestamp, Transaction.id).yield_per(1000)
+
+    for user_id, amount, timestamp in rows:
+        stat = stats.setdefault(user_id, {'user_id': user_id, 'deduction_count': 0})
+        column = slot_column(meal_slot_for_hour(campus_time(timestamp).hour))
+        previous = stat.get(column)
+        stat[column] = float(-amount) if previous is None else previous + alpha * (-amount - previous)
+        stat['deduction_count'] += 1
+
+    SpendStat.query.delete()
+    db.session.bulk_insert_mappings(SpendStat, list(stats.values()))
+    db.session.commit()
+    return len(stats)
@@ -1,14 +1,22 @@
 import jwt
-import bcrypt
 import datetime
+import hashlib
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
+from utils.cache import TTLCache
+from utils.money import to_rupees
+from utils.passwords import hash_password, check_password, HashingBusy
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# Verified token digest -> claims; entries expire with the token itself
+_token_cache = TTLCache(maxsize=10000)
 
-def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+# Claim value of tokens good for /wallet/stream only
+STREAM_SCOPE = 'wallet-stream'
+
+def busy_response(exc):
+    response = jsonify({'message': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response, 429
 
 def create_token(user_id, role):
     payload = {
@@ -18,15 +26,55 @@ def create_token(user_id, role):
     }
     return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
 
+def create_stream_token(user_id):
+    """
+    Short-lived token that only opens /wallet/stream. EventSource sends it in
+    the query string, where it ends up in access logs.
+    """
+    payload = {
+        'user_id': user_id,
+        'scope': STREAM_SCOPE,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=current_app.config['STREAM_TOKEN_TTL'])
+    }
+    return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+
 def decode_token(token):
+    secret = current_app.config['JWT_SECRET_KEY']
+    # Dashboards re-send the same token on every poll; skip the HMAC check for
+    # tokens already verified. The secret is part of the key so rotating it
+    # invalidates everything cached.
+    digest = hashlib.sha256(f"{secret}:{token}".encode()).digest()
+    cached = _token_cache.get(digest)
+    if cached is not None:
+        return dict(cached)
+
     try:
-        payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        return payload
+        payload = jwt.decode(token, secret, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return 'Token expired'
     except jwt.InvalidTokenError:
         return 'Invalid token'
 
+    if 'exp' in payload:
+        _token_cache.set(digest, payload, expires_at=payload['exp'])
+    return dict(payload)
+
+def token_cache_stats():
+    return _token_cache.stats()
+
+def get_current_user():
+    """
+    The authenticated User row, loaded at most once per request.
+
+    Returns:
+        User: The user, or None if the account no longer exists
+    """
+    from models import db, User
+
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, request.user['user_id'])
+    return g.current_user
+
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -40,6 +88,9 @@ def require_auth(f):
         decoded = decode_token(token)
         if isinstance(decoded, str):
             return jsonify({'message': decoded}), 401
+        if decoded.get('scope'):
+            # Stream tokens travel in URLs; they never authorise an API call
+            return jsonify({'message': 'Invalid token'}), 401
             
         request.user = decoded
         return f(*args, **kwargs)
@@ -65,32 +116,134 @@ def require_role(*roles):
         return decorated
     return decorator
 
-def verify_wallet_consistency(user_id):
+def verify_wallet_consistency(user_id, user=None):
     """
     Verify user balance matches transaction ledger sum.
     For demo safety, auto-corrects mismatches.
-    
+
+    Only ledger rows written since the user's last checkpoint are summed, so
+    the check costs the same no matter how long the history is. Call it
+    before committing the wallet write: the checkpoint advances in the same
+    transaction, while the user row is still locked.
+
     Args:
         user_id: The user ID to verify
-        
+        user: The already-loaded User row, if the caller has it
+
     Returns:
         float: The verified/corrected balance
     """
-    from models import db, User, Transaction
-    
-    total = db.session.query(
-        db.func.sum(Transaction.amount)
-    ).filter(Transaction.user_id == user_id).scalar() or 0.0
-
-    user = User.query.get(user_id)
-    if user and round(user.balance, 2) != round(total, 2):
+    from models import db, User, Transaction, WalletCheckpoint
+
+    # Flush pending ledger rows first so they are part of the delta
+    db.session.flush()
+
+    if user is None:
+        user = db.session.get(User, user_id)
+    if not user:
+        return 0.0
+
+    checkpoint = db.session.get(WalletCheckpoint, user_id)
+    if checkpoint is None:
+        checkpoint = WalletCheckpoint(user_id=user_id, ledger_sum_paise=0, last_transaction_id=0)
+        db.session.add(checkpoint)
+
+    delta, last_id = db.session.query(
+        db.func.sum(Transaction.amount_paise), db.func.max(Transaction.id)
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.id > checkpoint.last_transaction_id
+    ).one()
+
+    if last_id is not None:
+        checkpoint.ledger_sum_paise = (checkpoint.ledger_sum_paise or 0) + (delta or 0)
+        checkpoint.last_transaction_id = last_id
+    checkpoint.verified_at = datetime.datetime.utcnow()
+
+    # Integer paise compare exactly; any mismatch is real drift
+    total = checkpoint.ledger_sum_paise
+    if user.balance_paise != total:
         current_app.logger.error(
             f"⚠️  BALANCE MISMATCH for user {user_id}: "
-            f"user.balance={user.balance}, ledger_sum={total}"
+            f"user.balance={user.balance}, ledger_sum={to_rupees(total)}"
         )
-        # For demo safety, force correction
-        user.balance = total
-        db.session.commit()
+        # For demo safety, force correction (committed with the caller's write)
+        user.balance_paise = total
         current_app.logger.info(f"✅ Auto-corrected balance for user {user_id}")
-    
-    return user.balance if user else 0.0
+
+    return user.balance
+
+def reconcile_wallets(fix=False, after=0, limit=None):
+    """
+    Ledger reconciliation for a page of users (by id) in one aggregate pass.
+    Rebuilds their wallet checkpoints from the ledger.
+
+    Args:
+        fix: Move mismatched balances by the difference to the ledger sum,
+            unless the balance changed since it was read
+        after: Only users with a higher id
+        limit: Page size; None sweeps every remaining user
+
+    Returns:
+        dict: Users checked, mismatches, the ids left uncorrected because their
+        balance moved, and next_after (the last id checked) if more users remain
+    """
+    from sqlalchemy import update
+    from models import db, User, Transaction, WalletCheckpoint
+
+    page = db.session.query(User.id).filter(User.id > after).order_by(User.id)
+    if limit is not None:
+        page = page.limit(limit + 1)
+    page = page.subquery()
+    rows = db.session.query(
+        User.id,
+        User.balance_paise,
+        db.func.coalesce(db.func.sum(Transaction.amount_paise), 0),
+        db.func.coalesce(db.func.max(Transaction.id), 0)
+    ).join(page, page.c.id == User.id)\
+     .outerjoin(Transaction, Transaction.user_id == User.id)\
+     .group_by(User.id, User.balance_paise).order_by(User.id).all()
+    more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return {'users_checked': 0, 'mismatches': [], 'skipped': [], 'corrected': fix, 'next_after': None}
+
+    now = datetime.datetime.utcnow()
+    mismatches = []
+    skipped = []
+    checkpoints = []
+    for user_id, balance, total, last_id in rows:
+        if (balance or 0) != total:
+            mismatches.append({'user_id': user_id, 'balance': to_rupees(balance or 0), 'ledger_sum': to_rupees(total)})
+            # Relative and guarded on the balance read above: a payment
+            # committed since then moves the balance and is never overwritten
+            if fix:
+                current = User.balance_paise == balance if balance is not None else User.balance_paise.is_(None)
+                stmt = update(User).where(User.id == user_id, current)\
+                    .values(balance_paise=db.func.coalesce(User.balance_paise, 0) + (total - (balance or 0)))
+                if not db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount:
+                    skipped.append(user_id)
+        checkpoints.append({
+            'user_id': user_id,
+            'ledger_sum_paise': total,
+            'last_transaction_id': last_id,
+            'verified_at': now
+        })
+
+    last_user_id = rows[-1][0]
+    WalletCheckpoint.query.filter(
+        WalletCheckpoint.user_id > after, WalletCheckpoint.user_id <= last_user_id
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(WalletCheckpoint, checkpoints)
+    db.session.commit()
+
+    if mismatches:
+        current_app.logger.error(f"⚠️  Reconciliation found {len(mismatches)} balance mismatch(es)")
+
+    return {
+        'users_checked': len(rows),
+        'mismatches': mismatches,
+        'skipped': skipped,
+        'corrected': fix,
+        'next_after': last_user_id if more else None
+    }
@@ -0,0 +1,79 @@
+from sqlalchemy import update
+from models import db, User, Transaction
+from utils.stats import record_daily_stat, record_spend
+
+class WalletError(Exception):
+    pass
+
+class UserNotFound(WalletError):
+    pass
+
+class InsufficientBalance(WalletError):
+    def __init__(self, balance_paise, required_paise):
+        super().__init__('Insufficient balance')
+        self.balance_paise = balance_paise
+        self.required_paise = required_paise
+
+def credit(user_id, amount_paise, **fields):
+    """
+    Add money to a wallet and write the ledger row, inside the caller's transaction.
+
+    Args:
+        user_id: Wallet owner
+        amount_paise: Positive amount to add
+        **fields: Transaction columns (transaction_type, description, source, ...)
+
+    Returns:
+        tuple: (Transaction, new balance in paise)
+    """
+    return _apply(user_id, amount_paise, fields)
+
+def debit(user_id, amount_paise, **fields):
+    """
+    Take money from a wallet if it can cover it, and write the ledger row.
+
+    The balance check and the update are one conditional UPDATE, so
+    concurrent debits can neither lose an update nor overdraw the wallet.
+
+    Args:
+        user_id: Wallet owner
+        amount_paise: Positive amount to take; stored as a negative ledger row
+        **fields: Transaction columns (transaction_type, description, venue, ...)
+
+    Returns:
+        tuple: (Transaction, new balance in paise)
+
+    Raises:
+        UserNotFound, InsufficientBalance
+    """
+    return _apply(user_id, -amount_paise, fields)
+
+def _apply(user_id, delta, fields):
+    stmt = update(User).where(User.id == user_id)
+    if delta < 0:
+        stmt = stmt.where(User.balance_paise >= -delta)
+    stmt = stmt.values(balance_paise=User.balance_paise + delta)
+
+    # 'fetch' expires the user row if it is already loaded in this session;
+    # lock_wait files the statement under the lock-wait metric
+    options = {'synchronize_session': 'fetch', 'lock_wait': True}
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(stmt.returning(User.balance_paise), execution_options=options).first()
+        new_balance = row[0] if row else None
+    else:
+        result = db.session.execute(stmt, execution_options=options)
+        new_balance = None
+        if result.rowcount:
+            new_balance = db.session.query(User.balance_paise).filter(User.id == user_id).scalar()
+
+    if new_balance is None:
+        balance = db.session.query(User.balance_paise).filter(User.id == user_id).scalar()
+        if balance is None:
+            raise UserNotFound()
+        raise InsufficientBalance(balance, -delta)
+
+    transaction = Transaction(user_id=user_id, amount_paise=delta, **fields)
+    db.session.add(transaction)
+    record_daily_stat(transaction)
+    record_spend(transaction)
+    return transaction, new_balance
@@ -5,6 +5,10 @@ import BottomNav from '../components/BottomNav';
 import dayjs from 'dayjs';
 import { Plus, CreditCard, ArrowRight, Wallet, User, TrendingUp, TrendingDown, Zap, CalendarX } from 'lucide-react';
 
+// Dashboard refresh when the server doesn't push wallet events
+const POLL_INTERVAL_MS = 30000;
+const STREAM_RETRY_MS = 15000;
+
 const AnimatedNumber = ({ value }) => {
   const [displayValue, setDisplayValue] = useState(value);
 
@@ -109,6 +113,85 @@ const StudentDashboard = () => {
     fetchData();
   }, []);
 
+  // Live wallet updates: pushed over /wallet/stream where the server has it
+  // enabled, otherwise (and while a stream is down) polled
+  useEffect(() => {
+    let stream = null;
+    let pollTimer = null;
+    let retryTimer = null;
+    let active = true;
+
+    const refresh = async () => {
+      try {
+        const [balRes, txRes, projRes] = await Promise.all([
+          api.get(`/wallet/balance?t=${Date.now()}`),
+          api.get(`/transactions?limit=5&t=${Date.now()}`),
+          api.get('/wallet/projection'),
+        ]);
+        setBalance(balRes.data.balance);
+        setTransactions(txRes.data.slice(0, 5));
+        setProjection(projRes.data);
+      } catch (err) {
+        console.error('Wallet refresh failed:', err);
+      }
+    };
+
+    const startPolling = () => {
+      if (!pollTimer) pollTimer = setInterval(refresh, POLL_INTERVAL_MS);
+    };
+
+    const stopPolling = () => {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    };
+
+    const openStream = async () => {
+      if (typeof EventSource === 'undefined') return startPolling();
+
+      // The stream URL carries a short-lived, stream-only token, never the login token
+      let token;
+      try {
+        const res = await api.post('/wallet/stream/token');
+        token = res.data.token;
+      } catch (err) {
+        token = null; // 404: streaming is switched off on this server
+      }
+      if (!active) return;
+      if (!token) return startPolling();
+
+      stream = new EventSource(`${api.defaults.baseURL}/wallet/stream?token=${encodeURIComponent(token)}`);
+      stream.onopen = stopPolling;
+      stream.onerror = () => {
+        // EventSource would retry with the same, soon expired, token
+        stream.close();
+        startPolling();
+        retryTimer = setTimeout(openStream, STREAM_RETRY_MS);
+      };
+      stream.addEventListener('wallet', async (e) => {
+        const event = JSON.parse(e.data);
+        setBalance(event.balance);
+        if (event.transactions.length === 0) return;
+
+        setTransactions(prev => [...[...event.transactions].reverse(), ...prev].slice(0, 5));
+        try {
+          const projRes = await api.get('/wallet/projection');
+          setProjection(projRes.data);
+        } catch (err) {
+          console.error('Projection fetch failed:', err);
+        }
+      });
+    };
+
+    openStream();
+
+    return () => {
+      active = false;
+      if (stream) stream.close();
+      stopPolling();
+      clearTimeout(retryTimer);
+    };
+  }, []);
+
   return (
     <div className="pb-32 pt-12 px-6 max-w-lg mx-auto overflow-hidden">
       <header className="flex justify-between items-center mb-10">
@@ -6,6 +6,12 @@ import { LogOut, MapPin, Coffee, Utensils, Moon, Candy, Camera, History, Shoppin
 import { useToast } from '../context/ToastContext';
 import jsQR from 'jsqr';
 
+// Signed QR tokens are plain text; older codes carried a JSON payload
+const parseQRPayload = (text) => {
+  const trimmed = text.trim();
+  return trimmed.startsWith('{') ? JSON.parse(trimmed) : trimmed;
+};
+
 const VendorPOS = () => {
   const [scanning, setScanning] = useState(false);
   const [venue, setVenue] = useState('Mess 1');
@@ -69,7 +75,7 @@ const VendorPOS = () => {
   const onScanSuccess = async (decodedText) => {
     setScanning(false);
     try {
-      const qrPayload = JSON.parse(decodedText);
+      const qrPayload = parseQRPayload(decodedText);
       await processQRPayment(qrPayload);
     } catch (err) {
       showToast('Invalid QR code format', 'error');
@@ -99,7 +105,7 @@ const VendorPOS = () => {
           
           if (code) {
             try {
-              const qrPayload = JSON.parse(code.data);
+              const qrPayload = parseQRPayload(code.data);
               processQRPayment(qrPayload);
             } catch (err) {
               showToast('Invalid QR code format', 'error');